@@ -0,0 +1,128 @@
+import logging
+
+import numpy as np
+
+import utils.formatting as form
+from constraints.constraints import ConstraintsList
+from routeparams import RouteParams
+from ship.ship import Boat
+from weather import WeatherCond
+
+logger = logging.getLogger('WRT.corridor')
+
+EARTH_RADIUS = 6371008.8    # mean earth radius (m)
+
+##
+# Corridor around a route that restricts the variants of a second routing pass.
+#
+# The corridor contains all points whose distance to the polyline of the route is smaller than 'half_width'. The distance
+# to every segment of the polyline is calculated in an equirectangular projection centered on the segment, which is
+# accurate to a few per cent of the distance for corridor widths that are small compared to the radius of the earth.
+
+class RouteCorridor():
+    lats: np.ndarray        # latitudes of the polyline (chronological)
+    lons: np.ndarray        # longitudes of the polyline (chronological)
+    half_width: float       # maximum distance to the polyline (m)
+    nominal_dist: float     # typical distance traveled per routing step along the route (m)
+
+    def __init__(self, route: RouteParams, half_width):
+        lats = np.asarray(route.lats_per_step, dtype=float)
+        lons = np.asarray(route.lons_per_step, dtype=float)
+
+        # the corridor always leads to the destination, also if the route did not arrive there
+        if not ((lats[-1] == route.finish[0]) and (lons[-1] == route.finish[1])):
+            lats = np.append(lats, route.finish[0])
+            lons = np.append(lons, route.finish[1])
+
+        self.lats = lats
+        self.lons = lons
+        self.half_width = half_width
+
+        dists = np.asarray(route.dists_per_step, dtype=float)
+        dists = dists[dists > 0]
+        self.nominal_dist = np.median(dists) if dists.shape[0] > 0 else half_width
+
+    def print_info(self):
+        logger.info(form.get_log_step('route corridor: ' + str(self.lats.shape[0]) + ' points, half width ' +
+                                      str(self.half_width) + 'm, nominal step ' + str(round(self.nominal_dist)) + 'm', 1))
+
+    ##
+    # returns the distance (m) of every point (lats, lons) to the polyline of the corridor
+    def get_distance(self, lats, lons):
+        lats = np.asarray(lats, dtype=float)[:, np.newaxis]
+        lons = np.asarray(lons, dtype=float)[:, np.newaxis]
+
+        lat_a = self.lats[np.newaxis, :-1]
+        lon_a = self.lons[np.newaxis, :-1]
+        lat_b = self.lats[np.newaxis, 1:]
+        lon_b = self.lons[np.newaxis, 1:]
+        cos_lat = np.cos(np.radians((lat_a + lat_b) / 2))
+
+        # (npoints, nsegments) coordinates relative to the first point of every segment
+        bx = np.radians(lon_b - lon_a) * cos_lat * EARTH_RADIUS
+        by = np.radians(lat_b - lat_a) * EARTH_RADIUS
+        px = np.radians(lons - lon_a) * cos_lat * EARTH_RADIUS
+        py = np.radians(lats - lat_a) * EARTH_RADIUS
+
+        seg_len2 = bx ** 2 + by ** 2
+        seg_len2[seg_len2 == 0] = 1
+        frac = np.clip((px * bx + py * by) / seg_len2, 0, 1)
+        dist = np.sqrt((px - frac * bx) ** 2 + (py - frac * by) ** 2)
+
+        return np.min(dist, axis=1)
+
+    def contains(self, lats, lons):
+        return self.get_distance(lats, lons) <= self.half_width
+
+##
+# Coarse-to-fine routing: a first routing pass with coarse heading and pruning settings determines a route, a second
+# pass with fine settings is restricted to a corridor around this route (see IsoBased.select_corridor_variants).
+
+class CoarseToFineRouting():
+    coarse: None                # RoutingAlg for the first pass
+    fine: None                  # RoutingAlg for the second pass
+    corridor_half_width: float  # (m)
+    coarse_route: RouteParams
+
+    def __init__(self, coarse, fine, corridor_half_width):
+        self.coarse = coarse
+        self.fine = fine
+        self.corridor_half_width = corridor_half_width
+        self.coarse_route = None
+
+    def init_fig(self, wt: WeatherCond):
+        self.fine.init_fig(wt)
+
+    def set_profiler(self, profiler):
+        self.coarse.set_profiler(profiler)
+        self.fine.set_profiler(profiler)
+
+    ##
+    # only the fine pass is checkpointed, the coarse pass is repeated on resumption to rebuild the corridor
+    def set_checkpointing(self, path, interval):
+        self.fine.set_checkpointing(path, interval)
+
+    def route_coarse_pass(self, boat: Boat, wt: WeatherCond, constraints_list: ConstraintsList, verbose=False):
+        logger.info('Coarse-to-fine routing: starting coarse pass')
+        self.coarse_route = self.coarse.recursive_routing(boat, wt, constraints_list, verbose)
+
+        logger.info('Coarse-to-fine routing: starting fine pass')
+        corridor = RouteCorridor(self.coarse_route, self.corridor_half_width)
+        corridor.print_info()
+        self.fine.set_corridor(corridor)
+        # a coarse route that arrived at the destination is an incumbent for the fuel-bound filter of the fine pass
+        arrived = (self.coarse_route.lats_per_step[-1] == self.coarse_route.finish[0]) and (
+                self.coarse_route.lons_per_step[-1] == self.coarse_route.finish[1])
+        if (self.fine.fuel_bound_min_fuel_per_dist is not None) and arrived:
+            incumbent = float(np.min(self.coarse.full_fuel_consumed))
+            if self.fine.fuel_incumbent is not None:
+                incumbent = min(incumbent, self.fine.fuel_incumbent)
+            self.fine.set_fuel_bound(self.fine.fuel_bound_min_fuel_per_dist, incumbent)
+
+    def recursive_routing(self, boat: Boat, wt: WeatherCond, constraints_list: ConstraintsList, verbose=False):
+        self.route_coarse_pass(boat, wt, constraints_list, verbose)
+        return self.fine.recursive_routing(boat, wt, constraints_list, verbose)
+
+    def resume_from(self, filename, boat: Boat, wt: WeatherCond, constraints_list: ConstraintsList, verbose=False):
+        self.route_coarse_pass(boat, wt, constraints_list, verbose)
+        return self.fine.resume_from(filename, boat, wt, constraints_list, verbose)
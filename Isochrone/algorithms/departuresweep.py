@@ -0,0 +1,120 @@
+import datetime as dt
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import config
+import utils.formatting as form
+from algorithms.routingalg_factory import RoutingAlgFactory
+from constraints.constraints import *
+from ship.ship import Tanker
+from weather import WeatherCondCMEMS
+
+logger = logging.getLogger('WRT.departuresweep')
+
+##
+# Search for the fuel-optimal departure time within a time window.
+#
+# The minimum-fuel route (IsoFuel) is calculated for every departure time of a grid on a pool of worker processes. The
+# weather and depth data are read and preprocessed only once and are written to a memory-mapped environment cache
+# (utils.envcache) which all workers open read-only instead of reading the netCDF files again. Every worker writes its
+# requests to mariPower to its own 'courses netCDF'.
+#
+# The results are returned as pandas DataFrame with one row per departure time:
+#   departure, arrival, fuel (kg), time (h), count (number of routing steps)
+
+def get_departure_grid(first_departure, last_departure, delta_hours):
+    departure_times = []
+    departure = first_departure
+    while departure <= last_departure:
+        departure_times.append(departure)
+        departure = departure + dt.timedelta(hours=delta_hours)
+    return departure_times
+
+##
+# calculates the minimum-fuel route for one departure time, executed by the worker processes
+def route_departure(departure, env_cache_path, courses_path):
+    lat1, lon1, lat2, lon2 = config.DEFAULT_MAP
+    r_la1, r_lo1, r_la2, r_lo2 = config.DEFAULT_ROUTE
+    start = (r_la1, r_lo1)
+    finish = (r_la2, r_lo2)
+
+    boat = Tanker(-99)
+    boat.init_hydro_model_Route(config.WEATHER_DATA, courses_path)
+    boat.set_boat_speed(config.BOAT_SPEED)
+
+    wt = WeatherCondCMEMS(env_cache_path, config.START_TIME, departure, config.TIME_FORECAST, 3)
+    wt.set_map_size(lat1, lon1, lat2, lon2)
+    wt.init_wind_functions()
+
+    water_depth = WaterDepth(wt)
+    water_depth.set_drought(config.BOAT_DROUGHT)
+    constraint_list = ConstraintsList(ConstraintPars())
+    constraint_list.add_neg_constraint(LandCrossing())
+    constraint_list.add_neg_constraint(water_depth)
+
+    ra = RoutingAlgFactory().get_routing_alg_for_voyage('ISOFUEL', start, finish, departure)
+    route = ra.recursive_routing(boat, wt, constraint_list)
+
+    return {
+        'departure': departure,
+        'arrival': route.starttime_per_step[-1],
+        'fuel': route.ship_params_per_step.get_full_fuel(),
+        'time': route.time,
+        'count': route.count
+    }
+
+class DepartureSweep():
+    departure_times: list
+    env_cache_path: str     # directory of the environment cache (see utils.envcache)
+    courses_path: str       # path to the 'courses netCDF', is extended by the index of the departure time per worker
+    nworkers: int           # number of worker processes, None: number of CPUs
+
+    def __init__(self, departure_times, env_cache_path, courses_path, nworkers=None):
+        self.departure_times = departure_times
+        self.env_cache_path = env_cache_path
+        self.courses_path = courses_path
+        self.nworkers = nworkers
+
+    def print_init(self):
+        logger.info('Initialising departure-time sweep:')
+        logger.info(form.get_log_step('departure times ' + str(self.departure_times[0]) + ' to ' +
+                                      str(self.departure_times[-1]) + ' (' + str(len(self.departure_times)) + ')', 1))
+        logger.info(form.get_log_step('environment cache ' + str(self.env_cache_path), 1))
+
+    def get_courses_path(self, idep):
+        base, ext = os.path.splitext(self.courses_path)
+        return base + '_' + str(idep) + ext
+
+    def run(self):
+        self.print_init()
+        results = []
+
+        with ProcessPoolExecutor(max_workers=self.nworkers) as executor:
+            futures = []
+            for idep in range(0, len(self.departure_times)):
+                futures.append(executor.submit(route_departure, self.departure_times[idep], self.env_cache_path,
+                                               self.get_courses_path(idep)))
+
+            for idep in range(0, len(futures)):
+                try:
+                    results.append(futures[idep].result())
+                except Exception as err:
+                    logger.error('Routing failed for departure ' + str(self.departure_times[idep]) + ': ' + str(err))
+                    results.append({'departure': self.departure_times[idep], 'arrival': None, 'fuel': np.nan,
+                                    'time': np.nan, 'count': -99})
+
+        return pd.DataFrame(results, columns=['departure', 'arrival', 'fuel', 'time', 'count'])
+
+    ##
+    # returns the row of the departure time with the lowest fuel consumption, None if the routing failed for all
+    # departure times
+    def get_best_departure(self, results):
+        fuel = results['fuel'].astype(float)
+        if not fuel.notna().any():
+            logger.warning('Routing failed for all ' + str(results.shape[0]) + ' departure times, no best departure')
+            return None
+        return results.loc[fuel.idxmin()]
@@ -5,13 +5,13 @@ import cartopy.crs as ccrs
 import cartopy.feature as cf
 import numpy as np
 import matplotlib.pyplot as plt
-from geovectorslib import geod
 from global_land_mask import globe
-from scipy.stats import binned_statistic
 
 import utils.graphics as graphics
 import utils.formatting as form
+import utils.geodesic as geodesic
 from ship.ship import Boat
+from algorithms.pruning import AzimuthBinPruning, get_bin_argmax, get_fuel_bound_idxs
 from algorithms.routingalg import RoutingAlg
 from routeparams import RouteParams
 from weather import WeatherCond
@@ -24,56 +24,56 @@ class IsoBased(RoutingAlg):
         RoutingAlg.__init__(self, start, finish, time, figurepath)
         self.current_variant=self.current_azimuth
         self.is_last_step = False
+        self.pruning_strategy = AzimuthBinPruning()
 
     def print_init(self):
         RoutingAlg.print_init(self)
 
     def check_variant_def(self):
-        if (not ((self.lats_per_step.shape[1] == self.lons_per_step.shape[1]) and
-                 (self.lats_per_step.shape[1] == self.azimuth_per_step.shape[1]) and
-                 (self.lats_per_step.shape[1] == self.dist_per_step.shape[1]))):
-            raise 'define_variants: number of columns not matching!'
-
-        if (not ((self.lats_per_step.shape[0] == self.lons_per_step.shape[0]) and
-                 (self.lats_per_step.shape[0] == self.azimuth_per_step.shape[0]) and
-                 (self.lats_per_step.shape[0] == self.dist_per_step.shape[0]) and
-                 (self.lats_per_step.shape[0] == (self.count+1)))):
+        # all fields share the variant indices of the route tree, thus only the number of rows needs to be checked
+        nrows = self.store.nrows
+        if (not ((nrows['lats'] == nrows['lons']) and
+                 (nrows['lats'] == nrows['azimuth']) and
+                 (nrows['lats'] == nrows['dist']) and
+                 (nrows['lats'] == (self.count+1)))):
             raise ValueError(
                 'define_variants: number of rows not matching! count = ' + str(self.count) + ' lats per step ' + str(
-                    self.lats_per_step.shape[0]))
+                    nrows['lats']))
 
     def pruning(self, trim, bins):
+        idxs, occupancy = self.get_bin_pruning_idxs(trim, bins)
+        self.apply_pruning(idxs, occupancy)
+
+    ##
+    # returns the indices of the longest variant per azimuth bin and the fraction of the bins touched by the front that
+    # contain an unconstrained variant
+    def get_bin_pruning_idxs(self, trim, bins):
         debug = False
-        valid_pruning_segments = -99
 
         if (debug):
             print('binning for pruning', bins)
             print('current courses', self.current_azimuth)
 
-        idxs = []
-        bin_stat, bin_edges, bin_number = binned_statistic(
-            self.current_variant, self.full_dist_traveled, statistic=np.nanmax, bins=bins)
-
-        if trim:
-            for i in range(len(bin_edges) - 1):
-                try:
-                    if(bin_stat[i]==0):
-                        #form.print_step('Pruning: sector ' + str(i) + 'is null (binstat[i])=' + str(bin_stat[i]) + 'full_dist_traveled=' + str(self.full_dist_traveled))
-                        continue
-                    idxs.append(
-                        np.where(self.full_dist_traveled == bin_stat[i])[0][0])
-                except IndexError:
-                    pass
-            idxs = list(set(idxs))
-        else:
-            for i in range(len(bin_edges) - 1):
-                idxs.append(np.where(self.full_dist_traveled == bin_stat[i])[0])
-            idxs = list(set([item for subl in idxs for item in subl]))
+        # variants that are constrained have a full_dist_traveled of 0 and are skipped if trim=True
+        idxs = get_bin_argmax(self.current_variant, self.full_dist_traveled, bins, trim)
 
         if (debug):
             print('full_dist_traveled', self.full_dist_traveled)
             print('Indexes that passed', idxs)
 
+        # the occupancy counts the bins with an unconstrained variant, independent of the number of variants per bin that
+        # are kept without trimming
+        ibin = np.digitize(self.current_variant, bins) - 1
+        in_sector = (ibin >= 0) & (ibin < bins.shape[0] - 1)
+        is_reached = in_sector & (np.nan_to_num(self.full_dist_traveled) > 0)
+        touched_bins = np.unique(ibin[in_sector]).shape[0]
+        occupancy = np.unique(ibin[is_reached]).shape[0] / touched_bins if touched_bins > 0 else 0
+        return idxs, occupancy
+
+    def apply_pruning(self, idxs, occupancy):
+        if self.variant_scheduler is not None:
+            self.update_variant_settings(occupancy, idxs)
+
         valid_pruning_segments = len(idxs)
         if(valid_pruning_segments==0):
             logger.error(' All pruning segments fully constrained for step ' + str(self.count) + '!')
@@ -83,14 +83,12 @@ class IsoBased(RoutingAlg):
             logger.warning(' More than 50% of pruning segments constrained for step ' + str(self.count) + '!')
 
         # Return a trimmed isochrone
-        try:
-            self.lats_per_step = self.lats_per_step[:, idxs]
-            self.lons_per_step = self.lons_per_step[:, idxs]
-            self.azimuth_per_step = self.azimuth_per_step[:, idxs]
-            self.dist_per_step = self.dist_per_step[:, idxs]
-            self.shipparams_per_step.select(idxs)
+        self.select_variants(idxs)
 
-            self.starttime_per_step = self.starttime_per_step[:, idxs]
+    def select_variants(self, idxs):
+        try:
+            self.store.select_variants(idxs)
+            self.select_dest_geodesics(idxs)
 
             self.current_azimuth = self.current_variant[idxs]
             self.current_variant = self.current_variant[idxs]
@@ -101,37 +99,35 @@ class IsoBased(RoutingAlg):
         except IndexError:
             raise Exception('Pruned indices running out of bounds.')
 
-    def pruning_per_step(self,  trim=True):
+    def pruning_per_step(self, trim=True):
+        idxs, occupancy = self.pruning_strategy.get_idxs(self, trim)
+        self.apply_pruning(idxs, occupancy)
+
+    def get_pruning_bins(self):
         """
-              generate view of the iso that only contains the longests route per azimuth segment
-
-              Binned statistic.
-              +            iso2 = prune_isochrone(iso2, 'azi02', 's02', bins, True)
-              print('iso2 ',iso2)  #
-
-                    Parameters:
-                    iso: isochrone dictionary
-                    x: values to binarize
-                    y: values to apply max to
-                    bins: bins edges, dimension is n_bins + 1
-                    trim: whether return just one of max values
+              return the edges of the azimuth bins for the pruning of the current isochrone (AzimuthBinPruning)
+
+              The bins cover the prune sector around the azimuth toward the destination as seen from the point of the
+              mean distance traveled on the great circle.
+
                     Returns:
-                        pruned isochrone dictionary with max values in each bin
+                        bins: bin edges, dimension is n_bins + 1
                    """
         debug = False
         if(debug): print('Pruning...')
 
         mean_dist = np.mean(self.full_dist_traveled)
-        gcr_point = geod.direct(
+        gcr_point = geodesic.direct(
             [self.start[0]],
             [self.start[1]],
-            self.gcr_azi, mean_dist)
+            self.gcr_azi, mean_dist, self.geodesic_mode)
 
-        new_azi = geod.inverse(
+        new_azi = geodesic.inverse(
             gcr_point['lat2'],
             gcr_point['lon2'],
             [self.finish[0]],
-            [self.finish[1]]
+            [self.finish[1]],
+            self.geodesic_mode
         )
 
         if (debug): print('mean azimuth', new_azi['azi1'])
@@ -149,10 +145,72 @@ class IsoBased(RoutingAlg):
         bins = azi0s - delta_hdgs
         bins = np.sort(bins)
 
-        self.pruning(trim, bins)
+        return bins
 
     def define_variants_per_step(self):
         self.define_variants()
+        if self.corridor is not None:
+            self.select_corridor_variants()
+        if self.fuel_bound_min_fuel_per_dist is not None:
+            self.select_fuel_bound_variants()
+
+    def set_corridor(self, corridor):
+        self.corridor = corridor
+
+    def set_fuel_bound(self, min_fuel_per_dist, incumbent=None):
+        if not (min_fuel_per_dist >= 0):
+            raise ValueError('Lower bound of the fuel per metre needs to be >= 0, got ' + str(min_fuel_per_dist))
+        self.fuel_bound_min_fuel_per_dist = min_fuel_per_dist
+        self.fuel_incumbent = incumbent
+
+    ##
+    # discards the variants that can not beat the incumbent route (see algorithms.pruning.get_fuel_bound_idxs). Nothing is
+    # discarded as long as no incumbent is known. Is called before the power estimation for the new variants.
+    #
+    # If all variants exceed the incumbent (e.g. if the fine pass of the coarse-to-fine routing can not reproduce the
+    # coarse route), the front is kept and the filter is switched off: the lower bound of the branches of a variant never
+    # drops below its own lower bound, thus the filter would discard every following front as well.
+    def select_fuel_bound_variants(self):
+        debug = False
+
+        if self.fuel_incumbent is None:
+            return
+
+        dist_remaining = self.get_dest_geodesics()['s12']
+        idxs = get_fuel_bound_idxs(self.full_fuel_consumed, dist_remaining, self.fuel_bound_min_fuel_per_dist,
+                                   self.fuel_incumbent)
+        if (debug):
+            print('variants within fuel bound:', idxs.shape[0], 'of', dist_remaining.shape[0])
+
+        if idxs.shape[0] == 0:
+            logger.warning('All variants exceed the fuel of the incumbent route (' + str(self.fuel_incumbent) +
+                           ') at step ' + str(self.count) + ', switching off the fuel-bound filter')
+            self.fuel_incumbent = None
+        elif idxs.shape[0] < dist_remaining.shape[0]:
+            self.select_variants(idxs)
+
+    ##
+    # discards the variants whose nominal move for the current step leaves the corridor. The nominal move is
+    # RouteCorridor.nominal_dist along the heading of the variant, but not further than the destination. Is called before
+    # the power estimation and the constraints are evaluated for the new variants.
+    def select_corridor_variants(self):
+        debug = False
+
+        lats = self.get_current_lats()
+        lons = self.get_current_lons()
+        dist_to_dest = self.get_dest_geodesics()
+        dist = np.minimum(self.corridor.nominal_dist, dist_to_dest['s12'])
+        move = geodesic.direct(lats, lons, self.current_variant, dist, self.geodesic_mode)
+
+        idxs = np.flatnonzero(self.corridor.contains(move['lat2'], move['lon2']))
+        if (debug):
+            print('variants in corridor:', idxs.shape[0], 'of', lats.shape[0])
+
+        if idxs.shape[0] == 0:
+            logger.warning(' All variants are leaving the corridor for step ' + str(self.count) + ', keeping all of them!')
+            return
+
+        self.select_variants(idxs)
 
     def set_pruning_settings(self, sector_deg_half, seg):
         self.prune_sector_deg_half = sector_deg_half
@@ -162,24 +220,51 @@ class IsoBased(RoutingAlg):
         self.variant_segments = seg
         self.variant_increments_deg = inc
 
+    def set_pruning_strategy(self, strategy):
+        self.pruning_strategy = strategy
+        logger.info(form.get_log_step('pruning strategy: ' + strategy.name, 1))
+
+    def set_variant_scheduler(self, scheduler):
+        self.variant_scheduler = scheduler
+
+    ##
+    # passes the occupancy of the front (see PruningStrategy) and the spread of the pruned front to the VariantScheduler and sets the
+    # heading fan for the next routing step
+    def update_variant_settings(self, occupancy, idxs):
+        debug = False
+
+        spread = np.ptp(self.current_variant[idxs]) if len(idxs) > 0 else 0
+
+        self.variant_segments, self.variant_increments_deg = self.variant_scheduler.update(occupancy, spread)
+        if (debug):
+            print('occupancy=' + str(occupancy) + ', spread=' + str(spread) + ' -> variant_segments=' +
+                  str(self.variant_segments) + ', variant_increments_deg=' + str(self.variant_increments_deg))
+
+    def get_max_variants(self):
+        variant_segments = self.variant_segments
+        if self.variant_scheduler is not None:
+            variant_segments = max(variant_segments, self.variant_scheduler.get_max_variant_segments())
+        return (variant_segments + 1) * max(self.prune_segments, 1)
+
     def get_current_azimuth(self):
         return self.current_variant
 
     def get_current_lats(self):
-        return self.lats_per_step[0, :]
+        return self.store.get_current('lats')
 
     def get_current_lons(self):
-        return self.lons_per_step[0, :]
+        return self.store.get_current('lons')
 
     def get_current_speed(self):
-        return self.speed_per_step[0]
+        return self.store.get_current('speed')
 
     def get_wind_functions(self, wt):
         debug = False
-        winds = wt.get_wind_function((self.get_current_lats(), self.get_current_lons()), self.time[0])
+        # the variants of the front have different times since start, the wind is read at the time of every variant
+        winds = wt.get_wind_function((self.get_current_lats(), self.get_current_lons()), self.time)
         if (debug):
             print('obtaining wind function for position: ', self.get_current_lats(), self.get_current_lons())
-            print('time', self.time[0])
+            print('time', self.time)
             print('winds', winds)
         return winds
 
@@ -195,18 +280,15 @@ class IsoBased(RoutingAlg):
             raise ValueError(
                 'Please provide an even number of prune segments, you chose: ' + str(self.prune_segments))
 
+        if self.variant_scheduler is not None:
+            self.variant_segments, self.variant_increments_deg = self.variant_scheduler.init(
+                self.variant_segments, self.variant_increments_deg, self.prune_sector_deg_half)
+
     def get_final_index(self):
         idx = np.argmax(self.full_dist_traveled)
         return idx
 
     def terminate(self, boat : Boat, wt: WeatherCond):
-        self.lats_per_step=np.flip(self.lats_per_step,0)
-        self.lons_per_step=np.flip(self.lons_per_step,0)
-        self.azimuth_per_step=np.flip(self.azimuth_per_step,0)
-        self.dist_per_step=np.flip(self.dist_per_step,0)
-        self.starttime_per_step=np.flip(self.starttime_per_step,0)
-        self.shipparams_per_step.flip()
-
         route = RoutingAlg.terminate(self, boat, wt)
 
         self.check_isochrones(route)
@@ -220,12 +302,7 @@ class IsoBased(RoutingAlg):
         debug = True
 
         nvariants = self.get_current_lons().shape[0]
-        dist_to_dest =  geod.inverse(
-            self.get_current_lats(),
-            self.get_current_lons(),
-            np.full(nvariants, self.finish[0]),
-            np.full(nvariants, self.finish[1])
-        )
+        dist_to_dest = self.get_dest_geodesics()
         if(debug):
             print('dist_to_dest:', dist_to_dest['s12'])
             print('dist traveled:', dist)
@@ -241,25 +318,27 @@ class IsoBased(RoutingAlg):
             new_lon = np.full(nvariants, self.finish[1])
             return {'azi2': dist_to_dest['azi1'], 'lat2': new_lat, 'lon2': new_lon, 'iterations' : -99}     #compare to  'return {'lat2': lat2, 'lon2': lon2, 'azi2': azi2, 'iterations': iterations}' by geod.direct
 
-        move = geod.direct(self.get_current_lats(), self.get_current_lons(), self.current_variant, dist)   
+        move = geodesic.direct(self.get_current_lats(), self.get_current_lons(), self.current_variant, dist,
+                               self.geodesic_mode)
         #form.print_step('move=' + str(move),1)
         return move
 
     def check_constraints(self, move, constraint_list):
         debug = False
 
-        is_constrained = [False for i in range(0, self.lats_per_step.shape[1])]
+        is_constrained = [False for i in range(0, self.store.nvariants)]
         if(debug): form.print_step('shape is_constraint before checking:' + str(len(is_constrained)),1)
-        is_constrained = constraint_list.safe_crossing(self.lats_per_step[0], move['lat2'], self.lons_per_step[0], move['lon2'], self.time, is_constrained)
+        is_constrained = constraint_list.safe_crossing(self.get_current_lats(), move['lat2'], self.get_current_lons(), move['lon2'], self.time, is_constrained)
         if(debug): form.print_step('is_constrained after checking' + str(is_constrained),1)
         return is_constrained
 
     def update_position(self, move, is_constrained, dist):
         debug = False
-        self.lats_per_step = np.vstack((move['lat2'], self.lats_per_step))
-        self.lons_per_step = np.vstack((move['lon2'], self.lons_per_step))
-        self.dist_per_step = np.vstack((dist, self.dist_per_step))
-        self.azimuth_per_step = np.vstack((self.current_variant, self.azimuth_per_step))
+        self.store.push('lats', move['lat2'])
+        self.store.push('lons', move['lon2'])
+        self.store.push('dist', dist)
+        self.store.push('azimuth', self.current_variant)
+        self.dest_geodesics = None
 
         if (debug):
             print('path of this step' +
@@ -270,9 +349,9 @@ class IsoBased(RoutingAlg):
             print('dist', dist)
             print('bs=', self.speed_per_step)
 
-        start_lats = np.repeat(self.start[0], self.lats_per_step.shape[1])
-        start_lons = np.repeat(self.start[1], self.lons_per_step.shape[1])
-        gcrs = geod.inverse(start_lats, start_lons, move['lat2'], move['lon2'])       #calculate full distance traveled, azimuth of gcr connecting start and new position
+        start_lats = np.repeat(self.start[0], self.store.nvariants)
+        start_lons = np.repeat(self.start[1], self.store.nvariants)
+        gcrs = geodesic.inverse(start_lats, start_lons, move['lat2'], move['lon2'], self.geodesic_mode)       #calculate full distance traveled, azimuth of gcr connecting start and new position
         self.current_variant = gcrs['azi1']
         self.current_azimuth = gcrs['azi1']
 
@@ -282,7 +361,7 @@ class IsoBased(RoutingAlg):
             print('full_dist_traveled:', self.full_dist_traveled)
 
     def update_fuel(self, delta_fuel):
-        self.shipparams_per_step.set_fuel(np.vstack((delta_fuel,  self.shipparams_per_step.get_fuel())))
+        self.store.push('fuel', delta_fuel)
         for i in range(0,self.full_fuel_consumed.shape[0]):
             self.full_fuel_consumed[i] += delta_fuel[i]
 
@@ -324,8 +403,10 @@ class IsoBased(RoutingAlg):
         ax.plot( self.finish[1],self.finish[0], marker="o", markerfacecolor="orange", markeredgecolor="orange",markersize=10)
 
         self.route_ensemble = []
+        lats_per_step = self.lats_per_step
+        lons_per_step = self.lons_per_step
         for iRoute in  range(0,self.prune_segments * self.variant_segments):
-            route, = ax.plot(self.lons_per_step[:, 0], self.lats_per_step[:, 0], color = "firebrick")
+            route, = ax.plot(lons_per_step[:, 0], lats_per_step[:, 0], color = "firebrick")
             self.route_ensemble.append(route)
 
         gcr = graphics.get_gcr_points(self.start[0], self.start[1], self.finish[0], self.finish[1], n_points=10)
@@ -339,15 +420,21 @@ class IsoBased(RoutingAlg):
         plt.savefig(final_path)
 
     def update_fig(self, status):
+        # figures are only updated if they have been initialised by IsoBased.init_fig
+        if self.fig is None:
+            return
+
         fig = self.fig
+        lats_per_step = self.lats_per_step
+        lons_per_step = self.lons_per_step
 
-        for iRoute in range(0,self.prune_segments * self.variant_segments):
-            if iRoute>= self.lats_per_step.shape[1]:
+        for iRoute in range(0,len(self.route_ensemble)):
+            if iRoute>= lats_per_step.shape[1]:
                 self.route_ensemble[iRoute].set_xdata([0])
                 self.route_ensemble[iRoute].set_ydata([0])
             else:
-                self.route_ensemble[iRoute].set_xdata(self.lons_per_step[:,iRoute])
-                self.route_ensemble[iRoute].set_ydata(self.lats_per_step[:, iRoute])
+                self.route_ensemble[iRoute].set_xdata(lons_per_step[:,iRoute])
+                self.route_ensemble[iRoute].set_ydata(lats_per_step[:, iRoute])
 
             fig.canvas.draw()
             fig.canvas.flush_events()
@@ -0,0 +1,219 @@
+import numpy as np
+
+##
+# Container class for the per-step state of the isochrone routing (lats, lons, azimuths, distances, start times and ship
+# parameters per routing step).
+#
+# The routes are stored as a tree: row 'i' of every buffer only holds the front of routing step 'i', i.e. one entry per
+# variant that has been moved in this step, and the int32 array 'parents' points from every entry of row 'i' to the entry
+# of row 'i-1' that it has been branched out from. All buffers have the shape (max_rows, max_variants) and are allocated
+# once before the routing starts (IsochroneStore.reserve).
+#
+# The variants that are currently alive are described by 'variant_idx' which points to the entries of the latest row.
+# Branching out (IsochroneStore.repeat_variants) and pruning (IsochroneStore.select_variants) therefore only modify this
+# index array and never copy the history of the variants. The full history of the variants is rebuilt by back-tracking the
+# parent indices (IsochroneStore.get_history, IsochroneStore.get_route). The back-tracked entries of the current variants
+# are kept in 'ancestors' and shared by all fields until the variants or the tree change.
+#
+# IsochroneStore.get_history returns the rows in reversed order (last routing step first) which is the convention that
+# is used for all *_per_step arrays of RoutingAlg.
+
+class IsochroneStore():
+    buffers: dict           # field name -> (max_rows, max_variants) array, one front per row in chronological order
+    parents: np.ndarray     # (max_rows, max_variants) int32 array, index of the parent entry in the previous row
+    nfront: np.ndarray      # number of entries per row
+    nrows: dict             # field name -> number of rows that have been written
+    top_row: int            # latest row for which a front has been started
+    variant_idx: np.ndarray # entries of the latest row that correspond to the current variants
+    ancestors: np.ndarray   # (top_row + 1, nvariants) entries of every row on the routes of the current variants, None: not
+                            # back-tracked since the last change of the variants
+    max_rows: int
+    max_variants: int
+
+    def __init__(self, fields, max_rows=1, max_variants=1):
+        self.buffers = {}
+        self.nrows = {}
+        self.max_rows = max_rows
+        self.max_variants = max_variants
+        self.parents = np.zeros((max_rows, max_variants), dtype=np.int32)
+        self.nfront = np.zeros(max_rows, dtype=int)
+        self.top_row = -1
+        self.variant_idx = np.zeros(0, dtype=np.int32)
+        self.ancestors = None
+
+        for name, dtype in fields.items():
+            self.buffers[name] = np.zeros((max_rows, max_variants), dtype=dtype)
+            self.nrows[name] = 0
+
+    @property
+    def nvariants(self):
+        return self.variant_idx.shape[0]
+
+    def reserve(self, max_rows, max_variants):
+        max_rows = max(max_rows, self.max_rows)
+        max_variants = max(max_variants, self.max_variants)
+        if (max_rows == self.max_rows) and (max_variants == self.max_variants):
+            return
+
+        for name in self.buffers:
+            old = self.buffers[name]
+            self.buffers[name] = np.zeros((max_rows, max_variants), dtype=old.dtype)
+            self.buffers[name][:self.max_rows, :self.max_variants] = old
+
+        old = self.parents
+        self.parents = np.zeros((max_rows, max_variants), dtype=np.int32)
+        self.parents[:self.max_rows, :self.max_variants] = old
+        old = self.nfront
+        self.nfront = np.zeros(max_rows, dtype=int)
+        self.nfront[:self.max_rows] = old
+
+        self.max_rows = max_rows
+        self.max_variants = max_variants
+
+    def check_capacity(self, nrows, nvariants):
+        # grow geometrically if the routing runs out of the reserved space, e.g. for pruning without trimming
+        if nrows > self.max_rows:
+            nrows = max(nrows, 2 * self.max_rows)
+        if nvariants > self.max_variants:
+            nvariants = max(nvariants, 2 * self.max_variants)
+        self.reserve(nrows, nvariants)
+
+    def push(self, name, values):
+        values = np.atleast_1d(values)
+        row = self.nrows[name]
+
+        if row > self.top_row + 1:
+            raise ValueError('IsochroneStore.push: ' + name + ' is ahead of the other fields!')
+        if row == self.top_row + 1:
+            self.start_front(values.shape[0])
+        if not (values.shape[0] == self.nfront[row]):
+            raise ValueError('IsochroneStore.push: ' + name + ' has ' + str(values.shape[0]) + ' variants but ' +
+                             str(self.nfront[row]) + ' are expected!')
+
+        self.buffers[name][row, :values.shape[0]] = values
+        self.nrows[name] += 1
+
+    def start_front(self, nvariants):
+        if (self.top_row >= 0) and not (nvariants == self.nvariants):
+            raise ValueError('IsochroneStore.start_front: front of ' + str(nvariants) + ' entries for ' +
+                             str(self.nvariants) + ' variants!')
+
+        row = self.top_row + 1
+        self.check_capacity(row + 1, nvariants)
+        if row > 0:
+            self.parents[row, :nvariants] = self.variant_idx
+        self.nfront[row] = nvariants
+        self.top_row = row
+        self.set_variant_idx(np.arange(nvariants, dtype=np.int32))
+
+    def set_variant_idx(self, variant_idx):
+        self.variant_idx = variant_idx
+        self.ancestors = None
+
+    def get_ancestors(self):
+        if self.ancestors is None:
+            ancestors = np.zeros((self.top_row + 1, self.nvariants), dtype=np.int32)
+            idx = self.variant_idx
+            for row in range(self.top_row, -1, -1):
+                ancestors[row] = idx
+                if row > 0:
+                    idx = self.parents[row, idx]
+            self.ancestors = ancestors
+        return self.ancestors
+
+    def get_history(self, name):
+        nrows = self.nrows[name]
+        ancestors = self.get_ancestors()[:nrows]
+        history = self.buffers[name][np.arange(nrows)[:, np.newaxis], ancestors]
+        return history[::-1]
+
+    ##
+    # returns the latest row of a field for the current variants. Fields that have not yet been written for the latest
+    # front lag behind by one row which costs one step through the parents, the cost does not depend on the number of
+    # rows of the route.
+    def get_current(self, name):
+        nrows = self.nrows[name]
+        if nrows == 0:
+            return np.zeros(self.nvariants, dtype=self.buffers[name].dtype)
+        idx = self.variant_idx
+        for row in range(self.top_row, nrows - 1, -1):
+            idx = self.parents[row, idx]
+        return self.buffers[name][nrows - 1, idx]
+
+    def get_route(self, name, ivariant=0):
+        nrows = self.nrows[name]
+        route = np.zeros(nrows, dtype=self.buffers[name].dtype)
+
+        idx = self.variant_idx[ivariant]
+        for row in range(self.top_row, -1, -1):
+            if row < nrows:
+                route[row] = self.buffers[name][row, idx]
+            if row > 0:
+                idx = self.parents[row, idx]
+        return route
+
+    def set_history(self, name, history):
+        history = np.asarray(history)
+        if history.ndim == 1:
+            history = history.reshape(1, history.shape[0])
+        nrows, nvariants = history.shape
+
+        self.flatten()
+        if not (nvariants == self.nvariants):
+            self.set_variant_idx(np.arange(nvariants, dtype=np.int32))
+        top_row = max(self.top_row, nrows - 1)
+        self.check_capacity(top_row + 1, nvariants)
+        self.parents[:top_row + 1, :nvariants] = np.arange(nvariants, dtype=np.int32)
+        self.nfront[:top_row + 1] = nvariants
+        self.top_row = top_row
+
+        self.buffers[name][:nrows, :nvariants] = history[::-1]
+        self.nrows[name] = nrows
+        self.ancestors = None
+
+    def flatten(self):
+        # rewrite the tree such that every row holds the history of the current variants in the same columns
+        histories = {}
+        for name in self.buffers:
+            histories[name] = self.get_history(name)
+
+        nvariants = self.nvariants
+        self.check_capacity(self.top_row + 1, nvariants)
+        for name in self.buffers:
+            self.buffers[name][:self.nrows[name], :nvariants] = histories[name][::-1]
+        self.parents[:self.top_row + 1, :nvariants] = np.arange(nvariants, dtype=np.int32)
+        self.nfront[:self.top_row + 1] = nvariants
+        self.set_variant_idx(np.arange(nvariants, dtype=np.int32))
+
+    ##
+    # Position of the current variants in the tree. Rows are only appended during the routing, so the snapshot stays
+    # valid until the tree is rewritten (set_history, flatten) and restoring it truncates the tree to the rows of the
+    # snapshot without copying any history.
+    def get_snapshot(self):
+        return {'top_row': self.top_row, 'variant_idx': self.variant_idx.copy(), 'nrows': dict(self.nrows)}
+
+    def set_snapshot(self, snapshot):
+        if snapshot['top_row'] > self.top_row:
+            raise ValueError('IsochroneStore.set_snapshot: snapshot of row ' + str(snapshot['top_row']) +
+                             ' is beyond the latest row ' + str(self.top_row) + '!')
+        self.top_row = snapshot['top_row']
+        self.nrows = dict(snapshot['nrows'])
+        self.set_variant_idx(snapshot['variant_idx'].copy())
+
+    def repeat_variants(self, nrepeat):
+        self.set_variant_idx(np.repeat(self.variant_idx, nrepeat))
+
+    def select_variants(self, idxs):
+        self.set_variant_idx(self.variant_idx[np.asarray(idxs, dtype=int)])
+
+
+def per_step_property(name):
+    """Return a property that maps a *_per_step attribute of RoutingAlg to the corresponding field of its
+    IsochroneStore."""
+    def getter(self):
+        return self.store.get_history(name)
+
+    def setter(self, history):
+        self.store.set_history(name, history)
+
+    return property(getter, setter)
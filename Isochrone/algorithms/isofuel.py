@@ -1,7 +1,6 @@
 import datetime as dt
 import logging
 
-from geovectorslib import geod
 import numpy as np
 
 import utils.formatting as form
@@ -64,7 +63,7 @@ class IsoFuel(IsoBased):
     #returns fuel (= power) [W], dist [m], delta_time [s], delta_fuel [Ws]
     def get_delta_variables_netCDF_last_step(self, ship_params,bs):
         fuel = ship_params.get_fuel()
-        dist = geod.inverse(self.get_current_lats(), self.get_current_lons(), np.full(self.get_current_lats().shape,self.finish[0]) , np.full(self.get_current_lons().shape, self.finish[1]))
+        dist = self.get_dest_geodesics()
         delta_time = self.get_time(bs, dist['s12'])
         delta_fuel = fuel * delta_time
 
@@ -81,7 +80,7 @@ class IsoFuel(IsoBased):
         for i in range(0,self.full_time_traveled.shape[0]):
             self.full_time_traveled[i] += delta_time[i]
             self.time[i] += dt.timedelta(seconds=delta_time[i])
-        self.starttime_per_step = np.vstack((self.time, self.starttime_per_step))
+        self.store.push('starttime', self.time)
 
     def final_pruning(self):
         debug = False
@@ -95,12 +94,8 @@ class IsoFuel(IsoBased):
 
         # Return a trimmed isochrone
         try:
-            self.lats_per_step = self.lats_per_step[:, idxs]
-            self.lons_per_step = self.lons_per_step[:, idxs]
-            self.azimuth_per_step = self.azimuth_per_step[:, idxs]
-            self.dist_per_step = self.dist_per_step[:, idxs]
-            self.starttime_per_step = self.starttime_per_step[:, idxs]
-            self.shipparams_per_step.select(idxs)
+            self.store.select_variants([idxs])
+            self.select_dest_geodesics([idxs])
 
             self.current_azimuth = self.current_variant[idxs]
             self.current_variant = self.current_variant[idxs]
@@ -0,0 +1,203 @@
+import numpy as np
+from scipy.spatial import ConvexHull, QhullError
+
+import utils.geodesic as geodesic
+
+##
+# Kernels for the pruning of the isochrone front.
+
+def get_bin_argmax(keys, values, bins, trim=True):
+    """
+        Return the indices of the variants with the maximum value per bin in a single vectorised pass.
+
+        The variants are sorted by bin, value (descending) and index such that the first entry of each bin is its maximum.
+        Variants with a key or value of NaN and variants outside of the bins are ignored. Bins follow the convention
+        of scipy.stats.binned_statistic, i.e. the last bin also contains its right edge.
+
+            Parameters:
+                keys (array): values that are binned (e.g. azimuth of the variants)
+                values (array): values that are maximised per bin (e.g. distance traveled)
+                bins (array): monotonically increasing bin edges, dimension is n_bins + 1
+                trim (bool): if True, return only the first of several maxima per bin and skip bins whose maximum
+                    is 0 (constrained variants); if False, return all variants that share the maximum of their bin
+
+            Returns:
+                idxs (array): sorted indices of the selected variants
+    """
+    keys = np.asarray(keys, dtype=float)
+    values = np.asarray(values, dtype=float)
+    nbins = len(bins) - 1
+
+    ibin = np.digitize(keys, bins) - 1
+    ibin[keys == bins[-1]] = nbins - 1
+    valid = (ibin >= 0) & (ibin < nbins) & ~np.isnan(keys) & ~np.isnan(values)
+
+    candidates = np.flatnonzero(valid)
+    order = np.lexsort((candidates, -values[candidates], ibin[candidates]))
+    candidates = candidates[order]
+    candidate_bins = ibin[candidates]
+
+    is_first = np.ones(candidates.shape[0], dtype=bool)
+    is_first[1:] = candidate_bins[1:] != candidate_bins[:-1]
+
+    if trim:
+        idxs = candidates[is_first]
+        idxs = idxs[values[idxs] != 0]
+    else:
+        bin_max = values[candidates[is_first]]
+        nof_candidates = np.diff(np.append(np.flatnonzero(is_first), candidates.shape[0]))
+        idxs = candidates[values[candidates] == np.repeat(bin_max, nof_candidates)]
+
+    return np.sort(idxs)
+
+def get_fuel_bound_idxs(fuel, dist_remaining, min_fuel_per_dist, incumbent):
+    """
+        Return the indices of the variants that can still beat the incumbent route.
+
+        The total fuel of every variant is bounded from below by its fuel consumption so far plus the great-circle
+        distance to the destination times a lower bound of the fuel per metre of the boat. No route to the destination is
+        shorter than the great circle and no way is sailed with less fuel per metre than this bound, thus the bound is
+        admissible: a variant whose lower bound exceeds the total fuel of the incumbent route can not lead to a better
+        route and is dropped.
+
+            Parameters:
+                fuel (array): fuel consumed so far per variant (kg)
+                dist_remaining (array): great-circle distance to the destination per variant (m)
+                min_fuel_per_dist (float): lower bound of the fuel per metre of the boat in all conditions (kg/m)
+                incumbent (float): total fuel of a known route to the destination (kg)
+
+            Returns:
+                idxs (array): sorted indices of the variants that are kept
+    """
+    if not (min_fuel_per_dist >= 0):
+        raise ValueError('get_fuel_bound_idxs: lower bound of the fuel per metre needs to be >= 0, got ' +
+                         str(min_fuel_per_dist))
+
+    fuel = np.asarray(fuel, dtype=float)
+    dist_remaining = np.asarray(dist_remaining, dtype=float)
+
+    lower_bound = fuel + dist_remaining * min_fuel_per_dist
+    return np.flatnonzero(~(lower_bound > incumbent))
+
+def get_upper_hull_chain(x, y):
+    """
+        Return the corners of the upper convex hull of a set of points, sorted by x.
+
+        The convex hull is determined by scipy.spatial.ConvexHull (Quickhull, O(n log n)). The upper hull consists of the
+        corners on or above the line from the leftmost to the rightmost point (the highest point for equal x), the
+        corners of the lower hull are below this line. If all points lie on a line, the upper hull consists of its end
+        points.
+    """
+    ileft = np.lexsort((-y, x))[0]
+    iright = np.lexsort((-y, -x))[0]
+    try:
+        corners = ConvexHull(np.column_stack((x, y))).vertices
+    except QhullError:
+        return np.array([ileft]) if ileft == iright else np.array([ileft, iright])
+
+    # the cross product with the line from the leftmost to the rightmost point is >= 0 for the upper hull
+    cross = (x[iright] - x[ileft]) * (y[corners] - y[ileft]) - (y[iright] - y[ileft]) * (x[corners] - x[ileft])
+    tolerance = 1e-9 * max(np.ptp(x), np.ptp(y), 1.) ** 2
+    chain = corners[cross >= -tolerance]
+    return chain[np.argsort(x[chain], kind='stable')]
+
+def get_convex_front_idxs(x, y, valid, trim=True):
+    """
+        Return the indices of the variants on the outer envelope of the isochrone front.
+
+        The front is given in a local frame in which y points toward the destination and x is perpendicular to it. The
+        outer envelope is the upper convex hull of the front in this frame (see get_upper_hull_chain). For equal x, only
+        the variant with the largest y can be part of the envelope.
+
+            Parameters:
+                x (array): cross-track coordinate of the variants
+                y (array): along-track coordinate of the variants
+                valid (array): boolean mask of the variants that are considered (e.g. unconstrained variants)
+                trim (bool): if True, return only the corners of the envelope; if False, also return variants that lie
+                    on an edge of the envelope or share a corner
+
+            Returns:
+                idxs (array): sorted indices of the selected variants
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.asarray(valid, dtype=bool) & ~np.isnan(x) & ~np.isnan(y)
+
+    candidates = np.flatnonzero(valid)
+    if trim:
+        # keep only the first of several variants at the same position
+        order = np.lexsort((candidates, y[candidates], x[candidates]))
+        candidates = candidates[order]
+        is_first = np.ones(candidates.shape[0], dtype=bool)
+        is_first[1:] = (x[candidates[1:]] != x[candidates[:-1]]) | (y[candidates[1:]] != y[candidates[:-1]])
+        candidates = candidates[is_first]
+    if candidates.shape[0] == 0:
+        return candidates
+
+    chain = candidates[get_upper_hull_chain(x[candidates], y[candidates])]
+    if trim:
+        return np.sort(chain)
+
+    # variants on an edge of the envelope: y equals the envelope at their x (up to rounding)
+    envelope = np.interp(x[candidates], x[chain], y[chain])
+    tolerance = 1e-9 * max(np.ptp(x[candidates]), np.ptp(y[candidates]), 1.)
+    return np.sort(candidates[y[candidates] >= envelope - tolerance])
+
+##
+# Pruning strategies of IsoBased (see IsoBased.set_pruning_strategy).
+#
+# A pruning strategy returns the indices of the variants that survive the pruning of the current isochrone front and the
+# occupancy of the front, i.e. the fraction of the front that has not been stopped by constraints. The selection of the
+# variants, the warnings about constrained fronts and the update of the VariantScheduler are left to IsoBased.
+
+class PruningStrategy():
+    name: str
+
+    def __init__(self):
+        self.name = 'undefined'
+
+    def get_idxs(self, ra, trim=True):
+        pass
+
+##
+# Keeps the variant with the longest distance to the start per azimuth bin. The bins cover the prune sector around the
+# direction toward the destination as seen from the point of the mean distance on the great circle.
+
+class AzimuthBinPruning(PruningStrategy):
+    def __init__(self):
+        PruningStrategy.__init__(self)
+        self.name = 'azimuth bins'
+
+    def get_idxs(self, ra, trim=True):
+        return ra.get_bin_pruning_idxs(trim, ra.get_pruning_bins())
+
+##
+# Keeps the variants on the outer (convex) envelope of the front. The front is projected to the local frame at the start
+# which is aligned with the great circle toward the destination, using the azimuth and distance of every variant as seen
+# from the start. The number of survivors adapts to the shape of the front instead of being fixed by a number of bins.
+# Constrained variants are not part of the envelope, the occupancy is the fraction of the corners of the envelope of all
+# variants which are unconstrained.
+
+class ConvexFrontPruning(PruningStrategy):
+    def __init__(self):
+        PruningStrategy.__init__(self)
+        self.name = 'convex front'
+
+    def get_local_frame(self, azi, dist, gcr_azi):
+        angle = np.radians(azi - gcr_azi)
+        return dist * np.sin(angle), dist * np.cos(angle)
+
+    def get_idxs(self, ra, trim=True):
+        is_reached = ra.full_dist_traveled > 0
+        x, y = self.get_local_frame(ra.current_variant, ra.full_dist_traveled, ra.gcr_azi)
+        idxs = get_convex_front_idxs(x, y, is_reached, trim)
+
+        # constrained variants keep the position they would have reached, only their full_dist_traveled is set to 0
+        nvariants = ra.current_variant.shape[0]
+        gcrs = geodesic.inverse(np.repeat(ra.start[0], nvariants), np.repeat(ra.start[1], nvariants),
+                                ra.get_current_lats(), ra.get_current_lons(), ra.geodesic_mode)
+        x_all, y_all = self.get_local_frame(gcrs['azi1'], gcrs['s12'], ra.gcr_azi)
+        envelope_all = get_convex_front_idxs(x_all, y_all, np.ones(nvariants, dtype=bool), True)
+        occupancy = np.count_nonzero(is_reached[envelope_all]) / envelope_all.shape[0] if envelope_all.shape[0] > 0 else 0
+
+        return idxs, occupancy
@@ -1,18 +1,21 @@
 import datetime as dt
 import logging
+import os
 import time
 
 import numpy as np
 import matplotlib
-from geovectorslib import geod
 from matplotlib.axes import Axes
 from matplotlib.figure import Figure
 
 import utils.formatting as form
+import utils.geodesic as geodesic
+from algorithms.isochronestore import IsochroneStore, per_step_property
 from constraints.constraints import *
 from ship.ship import Boat
 from routeparams import RouteParams
 from ship.shipparams import ShipParams
+from utils.profiling import Profiler
 from weather import WeatherCond
 
 logger = logging.getLogger('WRT.routingalg')
@@ -39,7 +42,9 @@ class RoutingAlg():
 
     '''
         All variables that are named *_per_step constitute (M,N) arrays, whereby N corresponds to the number of variants (plus 1) and
-        M corresponds to the number of routing steps.
+        M corresponds to the number of routing steps. They are rebuilt from the route tree of the IsochroneStore 'store' by
+        back-tracking the parents of the current variants and are returned with the last routing step first. Every access
+        creates a copy, use IsochroneStore.get_current to obtain the values of the latest routing step.
     
         At the start of each routing step 'count', the element(s) at the position 'count' of the following arrays correspond to
         properties of the point of departure of the respective routing step. This means that for 'count = 0' the elements of
@@ -50,12 +55,12 @@ class RoutingAlg():
             - speed_per_step
         are 0 to satisfy this definition.
     '''
-    lats_per_step: np.ndarray  # lats: (M,N) array, N=headings+1, M=steps (M decreasing)    #
-    lons_per_step: np.ndarray  # longs: (M,N) array, N=headings+1, M=steps
-    azimuth_per_step: np.ndarray    # heading
-    dist_per_step: np.ndarray  # geodesic distance traveled per time stamp:
-    shipparams_per_step: ShipParams
-    starttime_per_step: np.ndarray
+    store: IsochroneStore
+    lats_per_step = per_step_property('lats')           # lats: (M,N) array, N=headings+1, M=steps (M decreasing)
+    lons_per_step = per_step_property('lons')           # longs: (M,N) array, N=headings+1, M=steps
+    azimuth_per_step = per_step_property('azimuth')     # heading
+    dist_per_step = per_step_property('dist')           # geodesic distance traveled per time stamp
+    starttime_per_step = per_step_property('starttime')
 
     current_azimuth: np.ndarray  # current azimuth
     current_variant: np.ndarray  # current variant
@@ -72,6 +77,19 @@ class RoutingAlg():
     prune_sector_deg_half: int  # angular range of azimuth that is considered for pruning (only one half)
     prune_segments: int  # number of azimuth bins that are used for pruning
 
+    corridor: None      # RouteCorridor that restricts the variants (optional, see algorithms.corridor)
+    variant_scheduler: None     # VariantScheduler that adapts the heading fan per step (optional)
+    fuel_bound_min_fuel_per_dist: float # lower bound of the fuel per metre of the fuel-bound filter (kg/m), None: filter disabled
+    fuel_incumbent: float       # total fuel of a known route to the destination (kg), None: the fuel-bound filter keeps all variants
+    profiler: Profiler          # timing of the phases of every routing step (see utils.profiling), disabled by default
+    checkpoint_path: str        # file to which the routing state is written (see RoutingAlg.write_checkpoint)
+    checkpoint_interval: int    # number of routing steps between two checkpoints, None: no checkpoints
+    keep_snapshots: bool        # keep the state of every routing step in memory for re-routing (see RoutingAlg.reroute)
+    snapshots: list             # snapshots after the pruning of every routing step (see RoutingAlg.get_snapshot),
+                                # snapshots[0]: snapshot before step 0
+    geodesic_mode: str          # solution of the geodesics of the variants, see utils.geodesic
+    dest_geodesics: dict        # geodesics (s12, azi1) from the current variants to the destination, None: not yet known
+
     fig: matplotlib.figure
     route_ensemble : list
     figure_path : str
@@ -80,27 +98,65 @@ class RoutingAlg():
         self.count = 0
         self.start = start
         self.finish = finish
-        self.lats_per_step = np.array([[start[0]]])
-        self.lons_per_step = np.array([[start[1]]])
-        self.azimuth_per_step = np.array([[None]])
-        self.dist_per_step = np.array([[0]])
-        sp = ShipParams.set_default_array()
-        self.shipparams_per_step = sp
-        self.starttime_per_step = np.array([[time]])
+        self.store = IsochroneStore({
+            'lats': float,
+            'lons': float,
+            'azimuth': float,
+            'dist': float,
+            'starttime': object,
+            'fuel': float,
+            'power': float,
+            'rpm': float,
+            'speed': float
+        })
+        self.store.push('lats', start[0])
+        self.store.push('lons', start[1])
+        self.store.push('azimuth', 0)
+        self.store.push('dist', 0)
+        self.store.push('starttime', time)
+        self.shipparams_per_step = ShipParams.set_default_array()
 
         self.time = np.array([time])
         self.full_time_traveled = np.array([0])
         self.full_fuel_consumed = np.array([0])
         self.full_dist_traveled = np.array([0])
+        self.geodesic_mode = 'vincenty'
+        self.dest_geodesics = None
 
         gcr = self.calculate_gcr(start, finish)
         self.current_azimuth = gcr
         self.gcr_azi = gcr
 
         self.figure_path = figure_path
+        self.fig = None
+        self.corridor = None
+        self.variant_scheduler = None
+        self.fuel_bound_min_fuel_per_dist = None
+        self.fuel_incumbent = None
+        self.profiler = Profiler(False)
+        self.checkpoint_path = None
+        self.checkpoint_interval = None
+        self.keep_snapshots = False
+        self.snapshots = []
 
         self.print_init()
 
+    @property
+    def shipparams_per_step(self):
+        return ShipParams(
+            fuel = self.store.get_history('fuel'),
+            power = self.store.get_history('power'),
+            rpm = self.store.get_history('rpm'),
+            speed = self.store.get_history('speed')
+        )
+
+    @shipparams_per_step.setter
+    def shipparams_per_step(self, ship_params):
+        self.store.set_history('fuel', ship_params.get_fuel())
+        self.store.set_history('power', ship_params.get_power())
+        self.store.set_history('rpm', ship_params.get_rpm())
+        self.store.set_history('speed', ship_params.get_speed())
+
     def init_fig(self):
         pass
 
@@ -158,9 +214,200 @@ class RoutingAlg():
     def set_steps(self, steps):
         self.ncount = steps
 
+    def set_profiler(self, profiler):
+        self.profiler = profiler
+
+    def set_checkpointing(self, path, interval):
+        if not (interval > 0):
+            raise ValueError('Checkpoint interval needs to be positive, got ' + str(interval))
+        self.checkpoint_path = path
+        self.checkpoint_interval = interval
+        logger.info(form.get_log_step('checkpoint every ' + str(interval) + ' routing steps to ' + str(path), 1))
+
+    def set_keep_snapshots(self, keep_snapshots):
+        self.keep_snapshots = keep_snapshots
+
+    def set_geodesic_mode(self, mode):
+        geodesic.check_mode(mode)
+        self.geodesic_mode = mode
+        self.dest_geodesics = None
+        logger.info(form.get_log_step('geodesic mode: ' + mode, 1))
+
+    ##
+    # Returns the geodesics from the current variants to the destination. They are needed several times per routing
+    # step (heading fan, corridor, fuel bound, bearing, last step) and are therefore calculated once per front. The
+    # geodesics are calculated in define_variants for the parents of the new variants, follow the selection of variants
+    # and are discarded as soon as the variants move (update_position).
+    def get_dest_geodesics(self):
+        if self.dest_geodesics is None:
+            lats = self.get_current_lats()
+            lons = self.get_current_lons()
+            dest = geodesic.inverse(lats, lons, np.full(lats.shape, self.finish[0]),
+                                    np.full(lons.shape, self.finish[1]), self.geodesic_mode)
+            self.dest_geodesics = {'s12': dest['s12'], 'azi1': dest['azi1']}
+        return self.dest_geodesics
+
+    def select_dest_geodesics(self, idxs):
+        if self.dest_geodesics is not None:
+            self.dest_geodesics = {key: value[idxs] for key, value in self.dest_geodesics.items()}
+
+    ##
+    # State of the routing after the pruning of a routing step, as written to a checkpoint.
+    #
+    # The state contains the history of the current variants for all fields of the IsochroneStore (i.e. the per-step
+    # arrays and the ship parameters), the per-variant arrays (time, fuel, distance, current_variant), the routing step
+    # 'count' and the heading settings including the state of the VariantScheduler (if any). All arrays have numeric
+    # types, times are stored as datetime64, such that the state can be written by numpy without pickling.
+    #
+    # The settings of the routing algorithm (steps, pruning, corridor, fuel bound, ...) are not part of the state. They
+    # need to be set for the RoutingAlg object before a state is restored, as for recursive_routing.
+    def get_state(self):
+        state = {
+            'count': self.count,
+            'start': np.asarray(self.start, dtype=float),
+            'finish': np.asarray(self.finish, dtype=float),
+            'variant_segments': self.variant_segments,
+            'variant_increments_deg': self.variant_increments_deg,
+            'current_azimuth': np.array(self.current_azimuth, dtype=float),
+            'current_variant': np.array(self.current_variant, dtype=float),
+            'full_dist_traveled': np.array(self.full_dist_traveled, dtype=float),
+            'full_time_traveled': np.array(self.full_time_traveled, dtype=float),
+            'full_fuel_consumed': np.array(self.full_fuel_consumed, dtype=float),
+            'time': np.asarray(self.time, dtype='datetime64[us]')
+        }
+        for name in self.store.buffers:
+            history = self.store.get_history(name)
+            if name == 'starttime':
+                history = history.astype('datetime64[us]')
+            state['store_' + name] = history
+        if self.variant_scheduler is not None:
+            for key, value in self.variant_scheduler.get_state().items():
+                state['scheduler_' + key] = value
+        return state
+
+    def set_state(self, state, source='state'):
+        if not (np.allclose(state['start'], self.start) and np.allclose(state['finish'], self.finish)):
+            raise ValueError(source + ' has been obtained for a route from ' + str(tuple(state['start'])) + ' to ' +
+                             str(tuple(state['finish'])) + '!')
+        departure = state['store_starttime'][-1, 0].astype(dt.datetime)
+        if not (departure == self.store.get_route('starttime')[0]):
+            raise ValueError(source + ' has been obtained for the departure time ' + str(departure) + '!')
+        if (self.variant_scheduler is not None) and not ('scheduler_half_deg' in state):
+            raise ValueError(source + ' has been obtained without an adaptive heading fan (VariantScheduler)!')
+        if (self.variant_scheduler is None) and ('scheduler_half_deg' in state):
+            raise ValueError(source + ' has been obtained with an adaptive heading fan (VariantScheduler)!')
+
+        # the state replaces the route tree, also if the routing has advanced beyond it
+        self.store = IsochroneStore({name: buffer.dtype for name, buffer in self.store.buffers.items()},
+                                    self.store.max_rows, self.store.max_variants)
+        for name in self.store.buffers:
+            history = state['store_' + name]
+            if name == 'starttime':
+                history = history.astype(dt.datetime)
+            self.store.set_history(name, history)
+
+        self.count = int(state['count'])
+        self.is_last_step = False
+        # restore the heading settings with the type they have been saved with
+        self.variant_segments = np.asarray(state['variant_segments']).item()
+        self.variant_increments_deg = np.asarray(state['variant_increments_deg']).item()
+        if self.variant_scheduler is not None:
+            self.variant_scheduler.set_state({key: state['scheduler_' + key]
+                                              for key in self.variant_scheduler.get_state()})
+        self.current_azimuth = np.array(state['current_azimuth'])
+        self.current_variant = np.array(state['current_variant'])
+        self.full_dist_traveled = np.array(state['full_dist_traveled'])
+        self.full_time_traveled = np.array(state['full_time_traveled'])
+        self.full_fuel_consumed = np.array(state['full_fuel_consumed'])
+        self.time = state['time'].astype(dt.datetime)
+        self.dest_geodesics = None
+
+    ##
+    # Snapshot of the routing after the pruning of a routing step, used for re-routing.
+    #
+    # In contrast to get_state, the snapshot does not copy the history of the variants but only keeps their position in
+    # the route tree (IsochroneStore.get_snapshot) together with the per-variant arrays and the routing step. The rows of
+    # the tree are never overwritten during the routing, so restoring a snapshot truncates the tree to the routing step
+    # of the snapshot.
+    def get_snapshot(self):
+        return {
+            'count': self.count,
+            'variant_segments': self.variant_segments,
+            'variant_increments_deg': self.variant_increments_deg,
+            'current_azimuth': np.array(self.current_azimuth),
+            'current_variant': np.array(self.current_variant),
+            'full_dist_traveled': np.array(self.full_dist_traveled),
+            'full_time_traveled': np.array(self.full_time_traveled),
+            'full_fuel_consumed': np.array(self.full_fuel_consumed),
+            'time': np.asarray(self.time, dtype='datetime64[us]'),
+            'store': self.store.get_snapshot(),
+            'variant_scheduler': None if self.variant_scheduler is None else self.variant_scheduler.get_state()
+        }
+
+    def set_snapshot(self, snapshot):
+        self.store.set_snapshot(snapshot['store'])
+        self.count = snapshot['count']
+        self.is_last_step = False
+        self.variant_segments = snapshot['variant_segments']
+        self.variant_increments_deg = snapshot['variant_increments_deg']
+        if snapshot['variant_scheduler'] is not None:
+            self.variant_scheduler.set_state(snapshot['variant_scheduler'])
+        self.current_azimuth = np.array(snapshot['current_azimuth'])
+        self.current_variant = np.array(snapshot['current_variant'])
+        self.full_dist_traveled = np.array(snapshot['full_dist_traveled'])
+        self.full_time_traveled = np.array(snapshot['full_time_traveled'])
+        self.full_fuel_consumed = np.array(snapshot['full_fuel_consumed'])
+        self.time = snapshot['time'].astype(dt.datetime)
+        self.dest_geodesics = None
+
+    ##
+    # A checkpoint is written after the pruning of every 'checkpoint_interval'-th routing step. The checkpoint is
+    # written to a temporary file which replaces the previous checkpoint only once it is complete, so a crash during
+    # writing keeps the last good checkpoint.
+    def write_checkpoint(self, filename):
+        base, ext = os.path.splitext(filename)
+        filename_tmp = base + '_tmp' + ext
+        with open(filename_tmp, 'wb') as file:
+            np.savez_compressed(file, **self.get_state())
+        os.replace(filename_tmp, filename)
+        logger.info(form.get_log_step('checkpoint of routing step ' + str(self.count) + ' written to ' + filename, 1))
+
+    def read_checkpoint(self, filename):
+        with np.load(filename, allow_pickle=False) as state:
+            self.set_state(state, 'Checkpoint ' + str(filename))
+        logger.info('Resuming routing from checkpoint ' + str(filename) + ' at routing step ' + str(self.count))
+
+    ##
+    # Re-routing for an updated weather forecast.
+    #
+    # Requires that the snapshots of the routing state have been kept for every routing step (set_keep_snapshots). The
+    # routing steps before the first step that reads weather data at or after 'changed_from' are reused unchanged, the
+    # routing is continued from the snapshot before this step with the new weather data. A step interpolates the weather
+    # at the departure time of every variant between the forecast steps before and after it, thus a step is affected if
+    # any of its variants departs later than one time step before 'changed_from'. Returns the index of the snapshot before
+    # this step.
+    def get_first_changed_step(self, changed_from, time_res):
+        for isnapshot in range(0, len(self.snapshots)):
+            departure = np.max(self.snapshots[isnapshot]['time']).astype(dt.datetime)
+            if departure + time_res > changed_from:
+                return isnapshot
+        return len(self.snapshots) - 1
+
+    def reroute(self, boat: Boat, wt : WeatherCond, constraints_list : ConstraintsList, changed_from):
+        if len(self.snapshots) == 0:
+            raise ValueError('Re-routing requires the snapshots of a previous routing, please call '
+                             'set_keep_snapshots(True) before recursive_routing!')
+
+        isnapshot = self.get_first_changed_step(changed_from, wt.time_res)
+        self.snapshots = self.snapshots[:isnapshot + 1]
+        self.set_snapshot(self.snapshots[isnapshot])
+        logger.info('Re-routing from routing step ' + str(self.count) + ' for weather changed from ' + str(changed_from))
+        self.store.reserve(self.ncount + 1, self.get_max_variants())
+        return self.continue_routing(boat, wt, constraints_list)
+
     def calculate_gcr(self, start, finish):
-        gcr = geod.inverse([start[0]], [start[1]], [finish[0]], [
-            finish[1]])  # calculate distance between start and end according to Vincents approach, return dictionary
+        gcr = geodesic.inverse([start[0]], [start[1]], [finish[0]], [
+            finish[1]], self.geodesic_mode)  # calculate distance between start and end, return dictionary
         return gcr['azi1']
 
     def get_current_lats(self):
@@ -192,10 +439,28 @@ class RoutingAlg():
                         iso (Isochrone) - next isochrone
             """
         self.check_settings()
+        self.store.reserve(self.ncount + 1, self.get_max_variants())
         self.define_initial_variants()
+        self.snapshots = []
+        if self.keep_snapshots:
+            self.snapshots.append(self.get_snapshot())
+        return self.continue_routing(boat, wt, constraints_list)
+
+    ##
+    # continues the routing from a checkpoint that has been written by RoutingAlg.write_checkpoint
+    def resume_from(self, filename, boat: Boat, wt : WeatherCond, constraints_list : ConstraintsList, verbose=False):
+        self.check_settings()
+        self.read_checkpoint(filename)
+        self.store.reserve(self.ncount + 1, self.get_max_variants())
+        self.snapshots = []
+        if self.keep_snapshots:
+            self.snapshots.append(self.get_snapshot())
+        return self.continue_routing(boat, wt, constraints_list)
+
+    def continue_routing(self, boat: Boat, wt : WeatherCond, constraints_list : ConstraintsList):
         #start_time=time.time()
         # self.print_shape()
-        for i in range(self.ncount):
+        for i in range(self.count, self.ncount):
             form.print_line()
             print('Step ', i)
 
@@ -207,10 +472,16 @@ class RoutingAlg():
 
             #if i>9:
             #self.update_fig('bp')
-            self.pruning_per_step(True)
+            with self.profiler.span('pruning', self.count, self.store.nvariants):
+                self.pruning_per_step(True)
             #form.print_current_time('move_boat: Step=' + str(i), start_time)
             #if i>9:
-            self.update_fig('p')
+            with self.profiler.span('figure', self.count, self.store.nvariants):
+                self.update_fig('p')
+            if (self.checkpoint_interval is not None) and (self.count % self.checkpoint_interval == 0):
+                self.write_checkpoint(self.checkpoint_path)
+            if self.keep_snapshots:
+                self.snapshots.append(self.get_snapshot())
 
         self.final_pruning()
         route = self.terminate(boat, wt)
@@ -219,25 +490,14 @@ class RoutingAlg():
 
     def define_variants(self):
         # branch out for multiple headings
-        nof_input_routes = self.lats_per_step.shape[1]
+        nof_input_routes = self.store.nvariants
 
-        new_finish_one = np.repeat(self.finish[0], nof_input_routes)
-        new_finish_two = np.repeat(self.finish[1], nof_input_routes)
+        # all variants of a parent share its position, the geodesics to the destination are calculated once per parent
+        new_azi = self.get_dest_geodesics()
+        self.dest_geodesics = {key: np.repeat(value, self.variant_segments + 1)
+                               for key, value in new_azi.items()}
 
-        new_azi = geod.inverse(
-            self.lats_per_step[0],
-            self.lons_per_step[0],
-            new_finish_one,
-            new_finish_two
-        )
-
-        self.lats_per_step = np.repeat(self.lats_per_step, self.variant_segments + 1, axis=1)
-        self.lons_per_step = np.repeat(self.lons_per_step, self.variant_segments + 1, axis=1)
-        self.dist_per_step = np.repeat(self.dist_per_step, self.variant_segments + 1, axis=1)
-        self.azimuth_per_step = np.repeat(self.azimuth_per_step, self.variant_segments + 1, axis=1)
-        self.starttime_per_step = np.repeat(self.starttime_per_step, self.variant_segments + 1, axis=1)
-
-        self.shipparams_per_step.define_variants(self.variant_segments)
+        self.store.repeat_variants(self.variant_segments + 1)
 
         self.full_time_traveled = np.repeat(self.full_time_traveled, self.variant_segments + 1, axis=0)
         self.full_fuel_consumed = np.repeat(self.full_fuel_consumed, self.variant_segments + 1, axis=0)
@@ -263,22 +523,39 @@ class RoutingAlg():
         """
                 calculate new boat position for current time step based on wind and boat function
             """
+        nvariants = self.store.nvariants
+        with self.profiler.span('weather', self.count, nvariants):
+            wind = self.get_wind(wt)
 
-        # get wind speed (tws) and angle (twa)
-        debug = True
+        # get boat speed
+        with self.profiler.span('boat_speed_function', self.count, nvariants):
+            bs = boat.boat_speed_function(wind)
 
+        with self.profiler.span('power', self.count, nvariants):
+            ship_params = boat.get_fuel_per_time_netCDF(self.get_current_azimuth(), self.get_current_lats(),
+                                                      self.get_current_lons(), self.time, wind)
+        ship_params.print()
+
+        move, delta_time, delta_fuel, dist = self.get_move(ship_params, bs)
+        with self.profiler.span('safe_crossing', self.count, nvariants):
+            is_constrained = self.check_constraints(move, constraint_list)
+        self.update_step(move, is_constrained, delta_time, delta_fuel, dist, ship_params)
+
+    ##
+    # returns wind speed (tws) and angle (twa) relative to the courses of the current variants
+    def get_wind(self, wt : WeatherCond):
         winds = self.get_wind_functions(wt) #wind is always a function of the variants
         twa = winds['twa']
         tws = winds['tws']
         wind = {'tws': tws, 'twa': twa - self.get_current_azimuth()}
         #if(debug) : print('wind in move_boat_direct', wind)
+        return wind
 
-        # get boat speed
-        bs = boat.boat_speed_function(wind)
-
-        ship_params = boat.get_fuel_per_time_netCDF(self.get_current_azimuth(), self.get_current_lats(),
-                                                  self.get_current_lons(), self.time, wind)
-        ship_params.print()
+    ##
+    # returns the move of the current variants as well as delta_time, delta_fuel and dist for the ship parameters that
+    # have been obtained from the power estimation
+    def get_move(self, ship_params, bs):
+        debug = True
 
         delta_time, delta_fuel, dist = self.get_delta_variables_netCDF(ship_params, bs)
         if (debug):
@@ -287,7 +564,8 @@ class RoutingAlg():
             print('dist: ', dist)
             print('is_last_step:', self.is_last_step)
 
-        move = self.check_bearing(dist)
+        with self.profiler.span('check_bearing', self.count, self.store.nvariants):
+            move = self.check_bearing(dist)
 
         if (debug):
             print('move:', move)
@@ -295,8 +573,9 @@ class RoutingAlg():
         if(self.is_last_step):
             delta_time, delta_fuel, dist = self.get_delta_variables_netCDF_last_step(ship_params, bs)
 
-        is_constrained = self.check_constraints(move, constraint_list)
+        return move, delta_time, delta_fuel, dist
 
+    def update_step(self, move, is_constrained, delta_time, delta_fuel, dist, ship_params):
         self.update_position(move, is_constrained, dist)
         self.update_time(delta_time)
         self.update_fuel(delta_fuel)
@@ -304,19 +583,22 @@ class RoutingAlg():
         self.count += 1
 
     def update_shipparams(self, ship_params_single_step):
-        new_rpm=np.vstack((ship_params_single_step.get_rpm(), self.shipparams_per_step.get_rpm()))
-        new_power=np.vstack((ship_params_single_step.get_power(), self.shipparams_per_step.get_power()))
-        new_speed=np.vstack((ship_params_single_step.get_speed(), self.shipparams_per_step.get_speed()))
-
-        self.shipparams_per_step.set_rpm(new_rpm)
-        self.shipparams_per_step.set_power(new_power)
-        self.shipparams_per_step.set_speed(new_speed)
+        self.store.push('rpm', ship_params_single_step.get_rpm())
+        self.store.push('power', ship_params_single_step.get_power())
+        self.store.push('speed', ship_params_single_step.get_speed())
 
     def terminate(self, boat: Boat, wt: WeatherCond):
         form.print_line()
         print('Terminating...')
 
+        # after the final pruning only one variant is left, its route is read in chronological order
         time = round(self.full_time_traveled / 3600,2 )
+        ship_params = ShipParams(
+            fuel = self.store.get_route('fuel'),
+            power = self.store.get_route('power'),
+            rpm = self.store.get_route('rpm'),
+            speed = self.store.get_route('speed')
+        )
         route = RouteParams(
             count = self.count,
             start = self.start,
@@ -324,15 +606,15 @@ class RoutingAlg():
             gcr = self.full_dist_traveled,
             route_type = 'min_time_route',
             time = time,
-            lats_per_step = self.lats_per_step[:],
-            lons_per_step = self.lons_per_step[:],
-            azimuths_per_step = self.azimuth_per_step[:],
-            dists_per_step = self.dist_per_step[:],
-            starttime_per_step = self.starttime_per_step[:],
-            ship_params_per_step = self.shipparams_per_step
+            lats_per_step = self.store.get_route('lats'),
+            lons_per_step = self.store.get_route('lons'),
+            azimuths_per_step = self.store.get_route('azimuth'),
+            dists_per_step = self.store.get_route('dist'),
+            starttime_per_step = self.store.get_route('starttime'),
+            ship_params_per_step = ship_params
         )
         #route.print_route()
-        self.check_destination()
+        self.check_destination(route)
         self.check_positive_power()
         self.check_gcr()
         return route
@@ -342,9 +624,9 @@ class RoutingAlg():
         if not gcr_equal_traveldist:
             logger.error('Gcr is not matching travel distance on great circel route summed for all routing steps.')
 
-    def check_destination(self):
-        destination_lats = self.lats_per_step[self.lats_per_step.shape[0]-1]
-        destination_lons = self.lons_per_step[self.lons_per_step.shape[0]-1]
+    def check_destination(self, route : RouteParams):
+        destination_lats = route.lats_per_step[route.lats_per_step.shape[0]-1]
+        destination_lons = route.lons_per_step[route.lons_per_step.shape[0]-1]
 
         arrived_at_destination = (destination_lats==self.finish[0]) & (destination_lons == self.finish[1])
         if not arrived_at_destination:
@@ -358,6 +640,9 @@ class RoutingAlg():
     def check_variant_def(self):
         pass
 
+    def get_max_variants(self):
+        return 1
+
     def define_variants_per_step(self):
         pass
 
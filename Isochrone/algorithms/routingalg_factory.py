@@ -1,7 +1,11 @@
 import datetime as dt
 
 import config
+from algorithms.corridor import CoarseToFineRouting
 from algorithms.isofuel import IsoFuel
+from algorithms.pruning import ConvexFrontPruning
+from algorithms.routingbatch import RoutingBatch
+from algorithms.variantscheduler import VariantScheduler
 
 class RoutingAlgFactory():
 
@@ -9,12 +13,19 @@ class RoutingAlgFactory():
         pass
 
     def get_routing_alg(self, alg_type):
-        ra = None
-
         r_la1, r_lo1, r_la2, r_lo2 = config.DEFAULT_ROUTE
         start = (r_la1, r_lo1)
         finish = (r_la2, r_lo2)
         start_time = dt.datetime.strptime(config.START_TIME, '%Y%m%d%H')
+
+        ra = self.get_routing_alg_for_voyage(alg_type, start, finish, start_time)
+        if ra is None:
+            raise ValueError('RoutingAlgFactory: unknown routing algorithm ' + str(alg_type))
+        return ra
+
+    def get_routing_alg_for_voyage(self, alg_type, start, finish, start_time):
+        ra = None
+
         delta_fuel = config.DELTA_FUEL
         fig_path = config.FIGURE_PATH
         routing_steps = config.ROUTING_STEPS
@@ -24,5 +35,38 @@ class RoutingAlgFactory():
             ra.set_steps(routing_steps)
             ra.set_pruning_settings(config.ISOCHRONE_PRUNE_SECTOR_DEG_HALF, config.ISOCHRONE_PRUNE_SEGMENTS)
             ra.set_variant_segments(config.ROUTER_HDGS_SEGMENTS, config.ROUTER_HDGS_INCREMENTS_DEG)
+            if config.ISOCHRONE_PRUNING_STRATEGY == 'CONVEX_FRONT':
+                ra.set_pruning_strategy(ConvexFrontPruning())
+            elif not (config.ISOCHRONE_PRUNING_STRATEGY == 'AZIMUTH_BINS'):
+                raise ValueError('RoutingAlgFactory: unknown pruning strategy ' + str(config.ISOCHRONE_PRUNING_STRATEGY))
+            if config.ROUTER_ADAPTIVE_HDGS:
+                min_half, max_half = config.ROUTER_ADAPTIVE_HDGS_HALF_DEG
+                min_inc, max_inc = config.ROUTER_ADAPTIVE_HDGS_INCREMENTS_DEG
+                ra.set_variant_scheduler(VariantScheduler(min_half, max_half, min_inc, max_inc))
+            if config.ISOCHRONE_FUEL_BOUND_MIN_FUEL_PER_DIST is not None:
+                ra.set_fuel_bound(config.ISOCHRONE_FUEL_BOUND_MIN_FUEL_PER_DIST, config.ISOCHRONE_FUEL_BOUND_INCUMBENT)
+            ra.set_geodesic_mode(config.ISOCHRONE_GEODESIC_MODE)
+
+        if alg_type=='ISOFUEL_COARSE_TO_FINE':
+            coarse = IsoFuel(start, finish, start_time, delta_fuel, fig_path)
+            coarse.set_steps(routing_steps)
+            coarse.set_pruning_settings(config.ISOCHRONE_PRUNE_SECTOR_DEG_HALF, config.ISOCHRONE_COARSE_PRUNE_SEGMENTS)
+            coarse.set_variant_segments(config.ROUTER_COARSE_HDGS_SEGMENTS, config.ROUTER_COARSE_HDGS_INCREMENTS_DEG)
+            coarse.set_geodesic_mode(config.ISOCHRONE_GEODESIC_MODE)
+            fine = self.get_routing_alg_for_voyage('ISOFUEL', start, finish, start_time)
+            ra = CoarseToFineRouting(coarse, fine, config.CORRIDOR_HALF_WIDTH)
 
         return ra
+
+    ##
+    # returns a RoutingBatch for a list of voyages, each voyage is a tuple (start, finish, departure time) with
+    # start = (lat, lon), finish = (lat, lon) and departure time as datetime
+    def get_routing_alg_batch(self, alg_type, voyages):
+        routes = []
+        for start, finish, start_time in voyages:
+            ra = self.get_routing_alg_for_voyage(alg_type, start, finish, start_time)
+            if ra is None:
+                raise ValueError('RoutingAlgFactory: unknown routing algorithm ' + str(alg_type))
+            routes.append(ra)
+
+        return RoutingBatch(routes)
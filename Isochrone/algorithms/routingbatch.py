@@ -0,0 +1,164 @@
+import logging
+
+import numpy as np
+
+import utils.formatting as form
+from constraints.constraints import ConstraintsList
+from ship.ship import Boat
+from ship.shipparams import ShipParams
+from weather import WeatherCond
+
+logger = logging.getLogger('WRT.routingbatch')
+
+##
+# Routing of several voyages (start, finish, departure time) against the same weather forecast, the same constraints
+# and the same boat.
+#
+# All voyages are advanced together step by step. Each voyage keeps its own RoutingAlg object (route tree, pruning,
+# termination), but the expensive parts of a routing step are requested for the stacked variants of all voyages:
+#   - the power estimation by one call of Boat.get_fuel_per_time_netCDF per step. As the 'courses netCDF' is indexed
+#     by latitude, voyages whose current latitudes coincide are requested in separate calls
+#       -> RoutingBatch.get_request_groups
+#   - the constraints by one call of ConstraintsList.safe_crossing per step
+# Voyages that reach their destination or their number of routing steps drop out of the stacked arrays. No figures are
+# drawn for batch routing.
+
+class RoutingBatch():
+    routes: list        # RoutingAlg objects, one per voyage
+    variant_segments: int
+
+    def __init__(self, routes):
+        if len(routes) == 0:
+            raise ValueError('RoutingBatch: no routes have been provided!')
+
+        # the 'courses netCDF' requires the same number of courses per space point
+        self.variant_segments = routes[0].variant_segments
+        for ra in routes:
+            if not (ra.variant_segments == self.variant_segments):
+                raise ValueError('RoutingBatch: all routes need the same number of variant segments! (' +
+                                 str(ra.variant_segments) + ' != ' + str(self.variant_segments) + ')')
+            if ra.variant_scheduler is not None:
+                raise ValueError('RoutingBatch: adaptive variant segments are not supported for batch routing!')
+        self.routes = routes
+
+    def print_init(self):
+        logger.info('Initialising batch routing for ' + str(len(self.routes)) + ' routes')
+
+    def recursive_routing(self, boat: Boat, wt: WeatherCond, constraints_list: ConstraintsList):
+        """
+            Progress all routes simultaneously and return the list of RouteParams (same order as the routes)
+        """
+        self.print_init()
+        for ra in self.routes:
+            ra.check_settings()
+            ra.store.reserve(ra.ncount + 1, ra.get_max_variants())
+            ra.define_initial_variants()
+
+        active = [ra for ra in self.routes if ra.ncount > 0]
+        istep = 0
+        while len(active) > 0:
+            form.print_line()
+            print('Step ', istep)
+
+            for ra in active:
+                ra.define_variants_per_step()
+
+            winds = [ra.get_wind(wt) for ra in active]
+            bs = [boat.boat_speed_function(wind) for wind in winds]
+            ship_params = self.get_ship_params(boat, active, winds)
+
+            moves = []
+            for iroute in range(0, len(active)):
+                moves.append(active[iroute].get_move(ship_params[iroute], bs[iroute]))
+
+            is_constrained = self.check_constraints(active, [move[0] for move in moves], constraints_list)
+
+            still_active = []
+            for iroute in range(0, len(active)):
+                ra = active[iroute]
+                move, delta_time, delta_fuel, dist = moves[iroute]
+                ra.update_step(move, is_constrained[iroute], delta_time, delta_fuel, dist, ship_params[iroute])
+
+                if ra.is_last_step:
+                    logger.info('Initiating last step at routing step ' + str(ra.count) + ' for route from ' +
+                                str(ra.start) + ' to ' + str(ra.finish))
+                    continue
+                ra.pruning_per_step(True)
+                if ra.count < ra.ncount:
+                    still_active.append(ra)
+
+            active = still_active
+            istep += 1
+
+        routes = []
+        for ra in self.routes:
+            ra.final_pruning()
+            routes.append(ra.terminate(boat, wt))
+        return routes
+
+    ##
+    # splits the routes into groups that can be sent to the power estimation in one request, i.e. the current latitudes
+    # of all routes of a group are distinct
+    def get_request_groups(self, routes):
+        groups = []
+        group_lats = []
+
+        for iroute in range(0, len(routes)):
+            lats = set(routes[iroute].get_current_lats().tolist())
+            for igroup in range(0, len(groups)):
+                if group_lats[igroup].isdisjoint(lats):
+                    groups[igroup].append(iroute)
+                    group_lats[igroup].update(lats)
+                    break
+            else:
+                groups.append([iroute])
+                group_lats.append(lats)
+
+        return groups
+
+    ##
+    # returns one ShipParams object per route, the power is requested for the stacked courses of all routes
+    def get_ship_params(self, boat: Boat, routes, winds):
+        ship_params = [None] * len(routes)
+
+        for group in self.get_request_groups(routes):
+            nvariants = [routes[iroute].store.nvariants for iroute in group]
+            split_idxs = np.cumsum(nvariants)[:-1]
+
+            courses = np.concatenate([routes[iroute].get_current_azimuth() for iroute in group])
+            lats = np.concatenate([routes[iroute].get_current_lats() for iroute in group])
+            lons = np.concatenate([routes[iroute].get_current_lons() for iroute in group])
+            time = np.concatenate([routes[iroute].time for iroute in group])
+            wind = {
+                'tws': np.concatenate([winds[iroute]['tws'] for iroute in group]),
+                'twa': np.concatenate([winds[iroute]['twa'] for iroute in group])
+            }
+
+            ship_params_stacked = boat.get_fuel_per_time_netCDF(courses, lats, lons, time, wind)
+            fuel = np.split(ship_params_stacked.get_fuel(), split_idxs)
+            power = np.split(ship_params_stacked.get_power(), split_idxs)
+            rpm = np.split(ship_params_stacked.get_rpm(), split_idxs)
+            speed = np.split(ship_params_stacked.get_speed(), split_idxs)
+
+            for igroup in range(0, len(group)):
+                ship_params[group[igroup]] = ShipParams(fuel=fuel[igroup], power=power[igroup], rpm=rpm[igroup],
+                                                        speed=speed[igroup])
+
+        return ship_params
+
+    ##
+    # checks the constraints for the stacked moves of all routes and returns is_constrained per route
+    def check_constraints(self, routes, moves, constraints_list: ConstraintsList):
+        nvariants = [ra.store.nvariants for ra in routes]
+        split_idxs = np.cumsum(nvariants)[:-1]
+
+        lats_start = np.concatenate([ra.get_current_lats() for ra in routes])
+        lons_start = np.concatenate([ra.get_current_lons() for ra in routes])
+        lats_end = np.concatenate([move['lat2'] for move in moves])
+        lons_end = np.concatenate([move['lon2'] for move in moves])
+        time = np.concatenate([ra.time for ra in routes])
+
+        is_constrained = [False for i in range(0, lats_start.shape[0])]
+        is_constrained = constraints_list.safe_crossing(lats_start, lats_end, lons_start, lons_end, time,
+                                                        is_constrained)
+        return np.split(np.asarray(is_constrained, dtype=bool), split_idxs)
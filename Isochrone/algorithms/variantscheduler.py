@@ -0,0 +1,115 @@
+import logging
+import math
+
+import utils.formatting as form
+
+logger = logging.getLogger('WRT.variantscheduler')
+
+##
+# Adaptive choice of the heading fan (variant_segments, variant_increments_deg) per routing step.
+#
+# After every pruning step, IsoBased passes two measures of the current isochrone front to VariantScheduler.update:
+#   - occupancy: fraction of the prune bins touched by the front that contain at least one unconstrained variant (or the
+#     equivalent measure of the pruning strategy, see algorithms/pruning.py). A low occupancy means that many variants
+#     have been stopped by constraints (e.g. coast lines).
+#   - spread: angular range of the azimuths of the pruned front, as seen from the start point.
+# The half angle of the heading fan is widened by 'widen_factor' if the occupancy drops below 'low_occupancy' and
+# narrowed by 'narrow_factor' if the occupancy is above 'high_occupancy' and the spread has changed by less than
+# 'spread_tol' (relative) compared to the previous step, i.e. in open water. The heading increments are refined by 1°
+# if the spread changes by more than 'spread_tol' and are coarsened by 1° otherwise.
+#
+# The half angle is kept within [min_half_deg, max_half_deg] and smaller than the prune sector, the increments are kept
+# within [min_inc_deg, max_inc_deg] and the number of segments is always even as required by IsoBased.check_settings.
+
+class VariantScheduler():
+    min_half_deg: float
+    max_half_deg: float
+    min_inc_deg: int
+    max_inc_deg: int
+    low_occupancy: float
+    high_occupancy: float
+    widen_factor: float
+    narrow_factor: float
+    spread_tol: float
+
+    half_deg: float         # current half angle of the heading fan
+    inc_deg: int            # current heading increment
+    prune_sector_deg_half: float
+    spread: float           # spread of the front of the previous step
+
+    def __init__(self, min_half_deg, max_half_deg, min_inc_deg, max_inc_deg, low_occupancy=0.6, high_occupancy=0.85,
+                 widen_factor=1.5, narrow_factor=0.75, spread_tol=0.2):
+        if not ((0 < min_half_deg <= max_half_deg) and (0 < min_inc_deg <= max_inc_deg)):
+            raise ValueError('VariantScheduler: please provide 0 < min_half_deg <= max_half_deg and 0 < min_inc_deg '
+                             '<= max_inc_deg')
+        self.min_half_deg = min_half_deg
+        self.max_half_deg = max_half_deg
+        self.min_inc_deg = min_inc_deg
+        self.max_inc_deg = max_inc_deg
+        self.low_occupancy = low_occupancy
+        self.high_occupancy = high_occupancy
+        self.widen_factor = widen_factor
+        self.narrow_factor = narrow_factor
+        self.spread_tol = spread_tol
+
+        self.half_deg = max_half_deg
+        self.inc_deg = max_inc_deg
+        self.prune_sector_deg_half = 180
+        self.spread = None
+
+    def print_init(self):
+        logger.info(form.get_log_step('adaptive heading fan: half angle ' + str(self.min_half_deg) + '° to ' +
+                                      str(self.max_half_deg) + '°, increments ' + str(self.min_inc_deg) + '° to ' +
+                                      str(self.max_inc_deg) + '°', 1))
+
+    ##
+    # starts the schedule from the variant settings of the routing algorithm
+    def init(self, variant_segments, variant_increments_deg, prune_sector_deg_half):
+        self.prune_sector_deg_half = prune_sector_deg_half
+        self.half_deg = min(max(variant_segments / 2 * variant_increments_deg, self.min_half_deg), self.max_half_deg)
+        self.inc_deg = min(max(variant_increments_deg, self.min_inc_deg), self.max_inc_deg)
+        self.spread = None
+        self.print_init()
+        return self.get_variant_settings()
+
+    def get_variant_settings(self):
+        # the fan needs to stay within the prune sector (IsoBased.check_settings)
+        max_half_segments = math.ceil(self.prune_sector_deg_half / self.inc_deg) - 1
+        half_segments = min(max(round(self.half_deg / self.inc_deg), 1), max_half_segments)
+        return 2 * half_segments, self.inc_deg
+
+    ##
+    # maximum number of variant segments that can be returned, used to reserve the IsochroneStore
+    def get_max_variant_segments(self):
+        max_half_segments = math.ceil(self.prune_sector_deg_half / self.min_inc_deg) - 1
+        return 2 * min(max(round(self.max_half_deg / self.min_inc_deg), 1), max_half_segments)
+
+    ##
+    # state of the schedule for checkpoints and snapshots of the routing, the spread is NaN before the first update
+    def get_state(self):
+        return {'half_deg': self.half_deg, 'inc_deg': self.inc_deg,
+                'spread': math.nan if self.spread is None else self.spread}
+
+    def set_state(self, state):
+        self.half_deg = float(state['half_deg'])
+        self.inc_deg = int(state['inc_deg'])
+        spread = float(state['spread'])
+        self.spread = None if math.isnan(spread) else spread
+
+    def update(self, occupancy, spread):
+        spread_change = 0
+        if (self.spread is not None) and (self.spread > 0):
+            spread_change = abs(spread - self.spread) / self.spread
+        self.spread = spread
+
+        if occupancy < self.low_occupancy:
+            self.half_deg = min(self.half_deg * self.widen_factor, self.max_half_deg)
+        elif (occupancy >= self.high_occupancy) and (spread_change < self.spread_tol):
+            self.half_deg = max(self.half_deg * self.narrow_factor, self.min_half_deg)
+
+        if spread_change >= self.spread_tol:
+            self.inc_deg = max(self.inc_deg - 1, self.min_inc_deg)
+        else:
+            self.inc_deg = min(self.inc_deg + 1, self.max_inc_deg)
+
+        return self.get_variant_settings()
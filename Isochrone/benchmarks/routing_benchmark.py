@@ -0,0 +1,187 @@
+import contextlib
+import datetime as dt
+import io
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+import utils.formatting as form
+from algorithms.isofuel import IsoFuel
+from benchmarks.synthetic import AnalyticTanker, get_synthetic_env_dataset
+from constraints.constraints import ConstraintPars, ConstraintsList, LandCrossing, WaterDepth
+from utils.envcache import write_env_cache
+from weather import WeatherCondCMEMS
+
+logger = logging.getLogger('WRT.benchmark')
+
+##
+# Benchmark of IsoFuel.recursive_routing on synthetic data (see benchmarks/synthetic.py).
+#
+# The routing is timed for every case of a matrix of settings:
+#   variant_segments: number of courses per variant and routing step
+#   prune_segments: number of azimuth bins of the pruning
+#   routing_steps: maximum number of routing steps
+#   constraints: 'none', 'land' (LandCrossing) or 'land_depth' (LandCrossing and WaterDepth)
+# Every case is routed 'repeats' times, the minimum and the median of the wall time are reported together with the
+# properties of the route which allow to check that two versions of the code calculate the same route. The results are
+# written as JSON together with the git revision and the versions of python and numpy.
+
+DEFAULT_MAP = [53, 11, 60, 22]
+DEFAULT_START = (54.87, 13.33)
+DEFAULT_FINISH = (58.28, 17.06)
+DEFAULT_DEPARTURE = dt.datetime(2023, 2, 10, 12)
+FORECAST_HOURS = 48
+
+CONSTRAINT_SETS = ['none', 'land', 'land_depth']
+
+def get_benchmark_matrix(variant_segments=(10, 30), prune_segments=(20, 40), routing_steps=(10, 20),
+                         constraints=('land',)):
+    cases = []
+    for seg, prune, steps, constraint_set in itertools.product(variant_segments, prune_segments, routing_steps,
+                                                               constraints):
+        if constraint_set not in CONSTRAINT_SETS:
+            raise ValueError('Unknown constraint set ' + str(constraint_set) + ', choose from ' + str(CONSTRAINT_SETS))
+        cases.append({'variant_segments': seg, 'prune_segments': prune, 'routing_steps': steps,
+                      'constraints': constraint_set})
+    return cases
+
+def get_git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+class RoutingBenchmark():
+    cases: list
+    env_path: str           # directory of the environment cache with the synthetic data
+    resolution_deg: float   # resolution of the synthetic data (°)
+    repeats: int            # number of routings per case
+    variant_increments_deg: int
+    delta_fuel: float       # amount of fuel per routing step (kg)
+
+    def __init__(self, cases, env_path, resolution_deg=0.1, repeats=3, variant_increments_deg=6, delta_fuel=3000):
+        self.cases = cases
+        self.env_path = env_path
+        self.resolution_deg = resolution_deg
+        self.repeats = repeats
+        self.variant_increments_deg = variant_increments_deg
+        self.delta_fuel = delta_fuel
+
+    def print_init(self):
+        logger.info('Initialising routing benchmark:')
+        logger.info(form.get_log_step(str(len(self.cases)) + ' cases, ' + str(self.repeats) + ' repeats', 1))
+        logger.info(form.get_log_step('synthetic data with resolution ' + str(self.resolution_deg) + '° in ' +
+                                      str(self.env_path), 1))
+
+    def write_env_data(self):
+        lat1, lon1, lat2, lon2 = DEFAULT_MAP
+        ds = get_synthetic_env_dataset(lat1, lon1, lat2, lon2, DEFAULT_DEPARTURE, FORECAST_HOURS, self.resolution_deg)
+        write_env_cache(ds, self.env_path)
+
+    def get_weather(self):
+        lat1, lon1, lat2, lon2 = DEFAULT_MAP
+        wt = WeatherCondCMEMS(self.env_path, DEFAULT_DEPARTURE, DEFAULT_DEPARTURE, FORECAST_HOURS, 3)
+        wt.set_map_size(lat1, lon1, lat2, lon2)
+        wt.init_wind_functions()
+        return wt
+
+    def get_constraints(self, constraint_set, wt):
+        constraint_list = ConstraintsList(ConstraintPars())
+        if constraint_set in ('land', 'land_depth'):
+            constraint_list.add_neg_constraint(LandCrossing())
+        if constraint_set == 'land_depth':
+            water_depth = WaterDepth(wt)
+            water_depth.set_drought(10)
+            constraint_list.add_neg_constraint(water_depth)
+        return constraint_list
+
+    def get_routing_alg(self, case):
+        ra = IsoFuel(DEFAULT_START, DEFAULT_FINISH, DEFAULT_DEPARTURE, self.delta_fuel, '')
+        ra.set_steps(case['routing_steps'])
+        ra.set_pruning_settings(91, case['prune_segments'])
+        ra.set_variant_segments(case['variant_segments'], self.variant_increments_deg)
+        return ra
+
+    def run_case(self, case, boat, wt):
+        constraint_list = self.get_constraints(case['constraints'], wt)
+        durations = []
+        route = None
+
+        result = dict(case)
+        try:
+            for irepeat in range(0, self.repeats):
+                ra = self.get_routing_alg(case)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    route = ra.recursive_routing(boat, wt, constraint_list)
+                    durations.append(time.perf_counter() - start)
+        except Exception as err:
+            # e.g. all variants constrained; the failure is part of the result, the other cases are still run
+            logger.error(form.get_log_step(str(case) + ': routing failed: ' + str(err), 1))
+            result.update({'time_min': np.nan, 'time_median': np.nan, 'count': -99, 'fuel': np.nan,
+                           'arrived': False, 'error': str(err)})
+            return result
+
+        result.update({
+            'time_min': float(np.min(durations)),
+            'time_median': float(np.median(durations)),
+            'count': int(route.count),
+            'fuel': float(route.ship_params_per_step.get_full_fuel()),
+            'arrived': bool((route.lats_per_step[-1] == DEFAULT_FINISH[0]) and
+                            (route.lons_per_step[-1] == DEFAULT_FINISH[1]))
+        })
+        logger.info(form.get_log_step(str(case) + ': ' + str(round(result['time_min'], 3)) + 's', 1))
+        return result
+
+    def run(self):
+        self.print_init()
+        self.write_env_data()
+        wt = self.get_weather()
+        boat = AnalyticTanker(-99)
+        boat.set_boat_speed(7.7)
+
+        return [self.run_case(case, boat, wt) for case in self.cases]
+
+    def write_results(self, results, filename):
+        output = {
+            'revision': get_git_revision(),
+            'date': dt.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'resolution_deg': self.resolution_deg,
+            'repeats': self.repeats,
+            'results': results
+        }
+        with open(filename, 'w') as file:
+            json.dump(output, file, indent=1)
+
+##
+# compares two result files and returns the cases which are slower than 'tolerance' (relative) or whose route differs
+def compare_results(filename_reference, filename, tolerance=0.1):
+    with open(filename_reference) as file:
+        reference = json.load(file)['results']
+    with open(filename) as file:
+        results = json.load(file)['results']
+
+    keys = ['variant_segments', 'prune_segments', 'routing_steps', 'constraints']
+    reference = {tuple(result[key] for key in keys): result for result in reference}
+
+    regressions = []
+    for result in results:
+        case = tuple(result[key] for key in keys)
+        if case not in reference:
+            continue
+        ref = reference[case]
+        ratio = result['time_min'] / ref['time_min'] if ref['time_min'] > 0 else np.inf
+        route_changed = (result['count'] != ref['count']) or not np.isclose(result['fuel'], ref['fuel'],
+                                                                             equal_nan=True)
+        if (ratio > 1 + tolerance) or route_changed:
+            regressions.append({'case': dict(zip(keys, case)), 'ratio': ratio, 'route_changed': route_changed})
+    return regressions
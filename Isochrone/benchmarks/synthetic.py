@@ -0,0 +1,103 @@
+import datetime as dt
+
+import numpy as np
+import xarray as xr
+
+from ship.ship import Tanker
+from ship.shipparams import ShipParams
+
+##
+# Synthetic stand-ins for the environmental data and the power estimation which allow to run the routing without
+# CMEMS/GFS files, ETOPO depth data and the mariPower package.
+#
+# The weather dataset has the format that is read by WeatherCondCMEMS (wind components at 10m height above ground). The
+# wind field is a large-scale vortex that drifts with time plus a small-scale modulation, the depth field is a basin that
+# shallows toward the edges of the map and contains a shallow bank. All fields are analytic and hence deterministic for
+# given map, resolution and time range.
+
+def get_synthetic_env_dataset(lat1, lon1, lat2, lon2, start_time, hours, resolution_deg=0.1, time_res_hours=1):
+    """
+        Return a synthetic dataset with wind and depth on a regular grid that spans the map (lat1, lon1, lat2, lon2).
+
+            Parameters:
+                start_time (datetime): time of the first forecast step, the dataset starts 3h earlier
+                hours (int): forecast hours, the dataset ends 3h after start_time + hours
+                resolution_deg (float): grid resolution (°)
+                time_res_hours (int): time resolution of the dataset (h)
+    """
+    nlat = int(round((lat2 - lat1) / resolution_deg)) + 1
+    nlon = int(round((lon2 - lon1) / resolution_deg)) + 1
+    lats = np.linspace(lat1, lat2, nlat)
+    lons = np.linspace(lon1, lon2, nlon)
+
+    first_time = start_time - dt.timedelta(hours=3)
+    ntimes = int((hours + 6) / time_res_hours) + 1
+    times = np.array([first_time + dt.timedelta(hours=time_res_hours * i) for i in range(0, ntimes)],
+                     dtype='datetime64[ns]')
+    hours_passed = np.arange(0, ntimes) * time_res_hours
+
+    # (time, latitude, longitude) coordinates relative to the centre of a vortex drifting eastwards
+    lat_grid = lats[np.newaxis, :, np.newaxis]
+    lon_grid = lons[np.newaxis, np.newaxis, :]
+    lat_centre = (lat1 + lat2) / 2
+    lon_centre = lon1 + (lon2 - lon1) * (0.25 + 0.5 * hours_passed[:, np.newaxis, np.newaxis] / (hours + 6))
+    dy = lat_grid - lat_centre
+    dx = (lon_grid - lon_centre) * np.cos(np.radians(lat_centre))
+    radius = (lat2 - lat1) / 3
+    envelope = 12 * np.exp(-(dx ** 2 + dy ** 2) / (2 * radius ** 2))
+
+    u = -envelope * dy / radius + 3 + np.sin(np.radians(lon_grid * 40)) * np.ones(dx.shape)
+    v = envelope * dx / radius + np.cos(np.radians(lat_grid * 40)) * np.ones(dx.shape)
+
+    # basin: deep in the centre of the map, shallow at the edges, with a bank of 5m depth
+    lat_rel = (lats[:, np.newaxis] - lat1) / (lat2 - lat1)
+    lon_rel = (lons[np.newaxis, :] - lon1) / (lon2 - lon1)
+    depth = -20 - 180 * np.sin(np.pi * lat_rel) * np.sin(np.pi * lon_rel)
+    bank = np.exp(-((lat_rel - 0.6) ** 2 + (lon_rel - 0.45) ** 2) / (2 * 0.05 ** 2))
+    depth = depth * (1 - bank) - 5 * bank
+
+    return xr.Dataset(
+        {
+            'u-component_of_wind_height_above_ground': (['time', 'height_above_ground2', 'latitude', 'longitude'],
+                                                        u[:, np.newaxis, :, :]),
+            'v-component_of_wind_height_above_ground': (['time', 'height_above_ground2', 'latitude', 'longitude'],
+                                                        v[:, np.newaxis, :, :]),
+            'depth': (['latitude', 'longitude'], depth)
+        },
+        coords={
+            'time': times,
+            'height_above_ground2': np.array([10.]),
+            'latitude': lats,
+            'longitude': lons
+        }
+    )
+
+##
+# Deterministic stand-in for the power estimation of Tanker. The fuel rate follows the cubic law of the calm-water
+# resistance for the boat speed plus an added resistance that grows with the square of the wind speed and is largest
+# for head wind. No 'courses netCDF' is written and mariPower is not needed.
+
+class AnalyticTanker(Tanker):
+    fuel_rate_calm: float       # fuel rate at the reference speed in calm water (kg/s)
+    reference_speed: float      # (m/s)
+    wind_factor: float          # added fuel rate per (m/s)^2 of head wind, relative to fuel_rate_calm
+    power_per_fuel: float       # (W/(kg/s))
+
+    def __init__(self, rpm, fuel_rate_calm=0.3, reference_speed=7.7, wind_factor=0.004, power_per_fuel=2.2e7):
+        Tanker.__init__(self, rpm)
+        self.fuel_rate_calm = fuel_rate_calm
+        self.reference_speed = reference_speed
+        self.wind_factor = wind_factor
+        self.power_per_fuel = power_per_fuel
+
+    def get_fuel_per_time_netCDF(self, courses, lats, lons, time, wind):
+        tws = np.asarray(wind['tws'], dtype=float)
+        twa = np.radians(np.asarray(wind['twa'], dtype=float))
+
+        # the wind direction is the direction the wind is coming from, twa = 0 is head wind
+        head_wind = (1 + np.cos(twa)) / 2
+        fuel = self.fuel_rate_calm * (self.speed / self.reference_speed) ** 3 * (
+                1 + self.wind_factor * tws ** 2 * head_wind)
+
+        return ShipParams(fuel=fuel, power=fuel * self.power_per_fuel, rpm=np.repeat(float(self.rpm), fuel.shape[0]),
+                          speed=np.repeat(self.speed, fuel.shape[0]))
@@ -11,6 +11,8 @@ DEFAULT_ROUTE =[54.87, 13.33, 58.28, 17.06]   #plotting of isochrone approach [5
 TIME_FORECAST = 20              # forecast hours weather
 ROUTING_STEPS = 11               # number of routing steps
 DELTA_TIME_FORECAST = 3600      # time resolution of weather forecast (seconds)
+WEATHER_MAX_TIME_SLICES = 16    # maximum number of forecast steps whose wind is kept in memory, steps are read on demand
+WEATHER_CHUNKS = None           # chunk sizes per dimension for reading WEATHER_DATA lazily with dask, e.g. {'time': 1}; None: no dask
 #DELTA_FUEL = 30000000*1000*1 # [Ws]
 DELTA_FUEL = 1*1500             # amount of fuel per routing step (kg)
 START_TIME = '2023021012'       # start time of travelling
@@ -26,9 +28,15 @@ INFO_LOG_FILE = os.environ['INFO_LOG_FILE'] # path to log file which logs inform
 FIGURE_PATH = os.environ['FIGURE_PATH']     # path to figure repository
 COURSES_FILE = os.environ['BASE_PATH'] + '/CoursesRoute.nc'     # path to file that acts as intermediate storage for courses per routing step
 ROUTE_PATH = os.environ['ROUTE_PATH']
+PROFILING_PATH = os.environ['BASE_PATH'] + '/Profiling'      # prefix of the files with the recorded spans (.json and _trace.json)
+CHECKPOINT_PATH = os.environ['BASE_PATH'] + '/checkpoint.npz'    # file to which the routing state is written
+ENV_CACHE_PATH = os.environ['BASE_PATH'] + '/EnvCache'     # directory of the memory-mapped cache of weather and depth data
+WAVE_DATA = os.environ.get('WAVE_DATA')     # path to wave data (optional, only written to the environment cache)
+RESTRICTED_AREAS = os.environ.get('RESTRICTED_AREAS')   # path to a GeoJSON file or shapefile with polygons that must not be crossed (optional, see constraints/restrictedareas.py)
 
 ##
 # Isochrone routing parameters
+ROUTING_ALGORITHM = 'ISOFUEL'            # 'ISOFUEL' or 'ISOFUEL_COARSE_TO_FINE' (see the coarse-to-fine settings below)
 ROUTER_HDGS_SEGMENTS =  30               # total number of courses : put even number!!
 ROUTER_HDGS_INCREMENTS_DEG = 6           # increment of headings
 ROUTER_RPM_SEGMENTS = 1                  # not used yet
@@ -36,6 +44,53 @@ ROUTER_RPM_INCREMENTS_DEG = 1            # not used yet
 ISOCHRONE_EXPECTED_SPEED_KTS = 8         # not used yet
 ISOCHRONE_PRUNE_SECTOR_DEG_HALF = 91     # angular range of azimuth angle that is considered for pruning (only one half!)
 ISOCHRONE_PRUNE_SEGMENTS = 20            # total number of azimuth bins that are used for pruning in prune sector which is 2x ISOCHRONE_PRUNE_SECTOR_DEG_HALF : put even number !
+ISOCHRONE_PRUNING_STRATEGY = 'AZIMUTH_BINS'     # 'AZIMUTH_BINS': longest variant per azimuth bin, 'CONVEX_FRONT': variants on the outer envelope of the front (see algorithms/pruning.py)
+ROUTER_ADAPTIVE_HDGS = False             # adapt the heading fan per routing step to the occupancy of the prune bins (see algorithms/variantscheduler.py)
+ROUTER_ADAPTIVE_HDGS_HALF_DEG = [12, 90]           # minimum and maximum half angle of the adaptive heading fan
+ROUTER_ADAPTIVE_HDGS_INCREMENTS_DEG = [2, 6]       # minimum and maximum increment of the adaptive heading fan
+ISOCHRONE_FUEL_BOUND_MIN_FUEL_PER_DIST = None  # lower bound of the fuel per metre of the boat in all conditions (kg/m) for the filter that drops variants which can not beat a known route before the power estimation; None: no filter
+ISOCHRONE_FUEL_BOUND_INCUMBENT = None    # total fuel of a known route (kg) for the fuel-bound filter, the coarse-to-fine routing uses the coarse route; None: no known route
+ISOCHRONE_GEODESIC_MODE = 'vincenty'     # geodesics of the variants: 'vincenty' (exact), 'andoyer' or 'spherical' (faster, see utils/geodesic.py for the error bounds)
+
+##
+# Constraints (see constraints/constraints.py)
+CONSTRAINT_SAMPLE_DIST = None            # distance between the points at which the constraints are checked on the way of a routing step (m), None: 10 points per way
+CONSTRAINT_NAVIGABILITY_RASTER = False   # check land and water depth by lookups in a precomputed raster instead of LandCrossing and WaterDepth (see constraints/navigability.py)
+CONSTRAINT_NAVIGABILITY_RESOLUTION_DEG = None   # resolution of the navigability raster (°), None: resolution of the depth data
+CONSTRAINT_NAVIGABILITY_LOOKUP = 'nearest'      # lookup in the navigability raster: 'nearest' (closest node) or 'bilinear'
+CONSTRAINT_HAZARD_DISTANCE = False       # check the ways of the navigability raster by the distance to the closest hazard instead of sample points
+CONSTRAINT_NAVIGABILITY_QUADTREE = False # check the ways by a quadtree over the navigability raster, i.e. all grid cells crossed by the ways (overrides CONSTRAINT_HAZARD_DISTANCE)
+CONSTRAINT_MAX_WAVE_HEIGHT = None        # maximum significant wave height (m) read from the variable VHM0 of the weather data, None: no limit
+CONSTRAINT_MAX_WIND_SPEED = None         # maximum wind speed (m/s), None: no limit
+
+##
+# Coarse-to-fine routing (routing algorithm 'ISOFUEL_COARSE_TO_FINE'): the coarse pass uses the following settings, the
+# fine pass uses the settings above and is restricted to a corridor around the route of the coarse pass
+ROUTER_COARSE_HDGS_SEGMENTS = 10         # total number of courses of the coarse pass : put even number!!
+ROUTER_COARSE_HDGS_INCREMENTS_DEG = 12   # increment of headings of the coarse pass
+ISOCHRONE_COARSE_PRUNE_SEGMENTS = 20     # total number of azimuth bins of the coarse pass : put even number !
+CORRIDOR_HALF_WIDTH = 30000              # maximum distance of the variants of the fine pass to the coarse route (m)
+
+##
+# Departure-time sweep (execute_departure_sweep.py), the first departure time is START_TIME
+SWEEP_LAST_DEPARTURE = '2023021100'      # last departure time of the sweep
+SWEEP_DELTA_HOURS = 3                    # time between two departure times (h)
+SWEEP_WORKERS = None                     # number of worker processes, None: number of CPUs
+
+##
+# Environment cache (see utils/envcache.py), written by execute_preprocessing.py
+ENV_CACHE_USE = False                    # read weather and depth from ENV_CACHE_PATH instead of WEATHER_DATA and DEPTH_DATA
+ENV_CACHE_RESOLUTION_DEG = None          # resolution of the common grid of the cache (°), None: resolution of the weather data
+
+##
+# Checkpoints of the routing state (see RoutingAlg.write_checkpoint)
+CHECKPOINT_INTERVAL = None               # number of routing steps between two checkpoints, None: no checkpoints
+CHECKPOINT_RESUME = False                # resume the routing from CHECKPOINT_PATH if the file exists
+
+##
+# Profiling (see utils/profiling.py)
+PROFILING = False                        # record the time spent in the phases of every routing step, summarised in PERFORMANCE_LOG_FILE
+PROFILING_MEMORY = False                 # additionally record the memory allocated per phase (slow)
 
 ##
 # boat settings
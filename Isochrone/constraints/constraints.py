@@ -1,6 +1,7 @@
 import datetime as dt
 import logging
 import time
+from collections import OrderedDict
 
 import cartopy.crs as ccrs
 import cartopy.feature as cf
@@ -9,6 +10,7 @@ import numpy as np
 import xarray as xr
 from global_land_mask import globe
 
+import utils.geodesic as geodesic
 import utils.graphics as graphics
 import utils.formatting as form
 from routeparams import RouteParams
@@ -25,13 +27,13 @@ logger = logging.getLogger('WRT.Constraints')
 # ConstraintList: list of constraints
 #
 # constraints implemented so far: LandCrossing (prohibit land crossing), WaterDepth (prohibit crossing of areas with too low water depth), StayOnMap (prohibit leaving the area
-#           for which the weather data has been obtained
+#           for which the weather data has been obtained, WaveHeight and WindSpeed (prohibit crossing of areas with too high waves or too strong wind)
 #
 # Inclusion in routing algorithm:
 #       1) initialise all individual constraints that shall be considered (for example check Isochrones/execute_routing.py)
 #       2) initialise ConstraintList object and add all constraints that shall be considered (for example check Isochrones/execute_routing.py)
 #       3) during the routing procedure, check for ConstraintList.safe_crossing(lat_start, lat_end, lon_start, lon_end, time) which looks for constraints in
-#           between starting point and destination;
+#           between starting point and destination (sampled along the great circle, see ConstraintPars.sample_dist);
 #           alternatively it can also be checked for a single point whether a constraint is hit via ConstraintList.safe_endpoint(lat, lon, time)
 
 class Constraint():
@@ -55,6 +57,13 @@ class Constraint():
     def constraint_on_point(self, lat, lon, time):
         pass
 
+    ##
+    # returns whether the ways from (lat_start, lon_start) to (lat_end, lon_end) cross the constraint for constraints
+    # which check whole ways, None for constraints which are checked at sample points of the ways
+    # (see ConstraintsList.safe_crossing)
+    def constraint_on_crossing(self, lat_start, lat_end, lon_start, lon_end, time):
+        return None
+
     def print_debug(self, message):
         print(self.name + str(': ') + str(message))
 
@@ -78,30 +87,87 @@ class NegativeContraint(Constraint):
         self.message = 'At least one point discarded as '
 
 
+##
+# Weather limits (e.g. WaveHeight, WindSpeed) are checked by lookups in rasters of the weather data: for every forecast
+# step, the values of the weather variable and whether they exceed the limit are read once on the grid of the weather
+# data (read_exceedance) and kept in a cache of the recently used forecast steps (see WeatherCond.get_cached_time_slice).
+# A point is assigned to the closest forecast step and the closest grid node by index arithmetic. Points beyond the
+# grid have no values (NaN) and do not exceed the limit.
 class NegativeConstraintFromWeather(NegativeContraint):
     wt: WeatherCond
+    exceedance: OrderedDict     # values and exceedance of the limit at the grid nodes per forecast step, read on demand
 
     def __init__(self, name, weather):
         NegativeContraint.__init__(self, name)
         self.wt = weather
+        self.exceedance = OrderedDict()
 
     def check_weather(self, lat, lon, time):
         pass
 
+    def get_limit(self):
+        pass
+
+    ##
+    # returns the values of the weather variable at the grid nodes of forecast step 'idx' and the latitudes and
+    # longitudes of the grid
+    def read_weather_slice(self, idx):
+        pass
+
+    def read_exceedance(self, idx):
+        values, lats, lons = self.read_weather_slice(idx)
+        for coord in (lats, lons):
+            if (coord.shape[0] > 1) and not np.allclose(np.diff(coord), coord[1] - coord[0]):
+                raise ValueError(self.name + ': weather data needs to be given on a regular grid!')
+        values = np.asarray(values, dtype=np.float32)
+        return {
+            'values': values,
+            'is_exceeded': values > self.get_limit(),
+            'lat0': lats[0],
+            'lon0': lons[0],
+            'dlat': lats[1] - lats[0] if lats.shape[0] > 1 else 1.,
+            'dlon': lons[1] - lons[0] if lons.shape[0] > 1 else 1.
+        }
+
+    def reset_exceedance(self):
+        self.exceedance = OrderedDict()
+
+    ##
+    # returns the entry 'key' ('values' or 'is_exceeded') of the weather raster at the points, times are either one
+    # time for all points or one time per point
+    def lookup_weather(self, lat, lon, time, key):
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        idxs = np.broadcast_to(self.wt.get_time_step_index(time)['idx'], lat.shape)
+
+        result = np.full(lat.shape, np.nan if key == 'values' else False)
+        for idx in np.unique(idxs):
+            sel = np.flatnonzero(idxs == idx)
+            raster = self.wt.get_cached_time_slice(self.exceedance, idx, self.read_exceedance)
+            nlat, nlon = raster['values'].shape
+            ilat = np.floor((lat[sel] - raster['lat0']) / raster['dlat'] + 0.5).astype(int)
+            ilon = np.floor((lon[sel] - raster['lon0']) / raster['dlon'] + 0.5).astype(int)
+            is_inside = (ilat >= 0) & (ilat < nlat) & (ilon >= 0) & (ilon < nlon)
+            result[sel[is_inside]] = raster[key][ilat[is_inside], ilon[is_inside]]
+        return result
+
 
 class ConstraintPars():
     resolution: int
+    sample_dist: float      # distance between two points at which the constraints are checked on the way (m), None: 1/resolution points per way
     bCheckEndPoints: bool
     bCheckCrossing: bool
 
     def __init__(self):
         self.resolution = 1. / 10
+        self.sample_dist = None
         self.bCheckEndPoints = True
         self.bCheckCrossing = True
 
     def print(self):
         logger.info('Print settings of Constraint Pars:')
         logger.info(form.get_log_step('resolution=' + str(self.resolution),1))
+        logger.info(form.get_log_step('sample_dist=' + str(self.sample_dist),1))
         logger.info(form.get_log_step('bCheckEndPoints=' + str(self.bCheckEndPoints),1))
 
 
@@ -168,30 +234,74 @@ class ConstraintsList():
         # if (is_constrained.any()) & (debug): self.print_constraints_crossed()
         return is_constrained
 
+    ##
+    # returns the fractions of the way from the starting point to the destination at which the constraints are checked,
+    # shape (nsamples, nvariants). Every way is divided into 1/ConstraintPars.resolution parts or, if
+    # ConstraintPars.sample_dist is set, into parts no longer than sample_dist. Ways with less parts than the longest way
+    # are filled up with the destination.
+    def get_sample_fractions(self, dist):
+        if self.pars.sample_dist is None:
+            nsamples = np.full(dist.shape, int(1. / self.pars.resolution))
+        else:
+            nsamples = np.maximum(np.ceil(dist / self.pars.sample_dist), 1).astype(int)
+        isample = np.arange(1, np.max(nsamples, initial=1) + 1)[:, np.newaxis]
+        return np.minimum(isample / nsamples, 1)
+
+    ##
+    # returns whether a constraint is hit at the sample points of the variants 'active' (shape (nsamples, nactive)) by
+    # checking the constraint for all sample points at once
+    def get_constrained_samples(self, constraint, lats, lons, time, active, nvariants):
+        is_constrained = np.asarray(constraint.constraint_on_point(lats.ravel(), lons.ravel(), time), dtype=bool)
+        if is_constrained.size == lats.size:
+            return is_constrained.reshape(lats.shape)
+        # constraints which do not depend on the position may return one value per variant, e.g. WaveHeight with a
+        # preset current_wave_height
+        if is_constrained.shape == (nvariants,):
+            is_constrained = is_constrained[active]
+        return np.broadcast_to(is_constrained, lats.shape)
+
     ##
     # Check whether there is a constraint on the way from a starting point (lat_start, lon_start) to the destination (lat_end, lon_end).
-    # To do so, the code segments the travel distance into steps (step length given by ConstraintPars.resolution) and loops through all these steps
-    # calling ConstraintList.safe_endpoint()
+    # To do so, the code samples the great circle between both points (see get_sample_fractions) for all variants at
+    # once and checks every constraint once for the sample points of all variants. Constraints which check whole ways
+    # (Constraint.constraint_on_crossing) are called with the ways instead. Variants which are already constrained (by
+    # is_constrained or a previous constraint) are not checked any more.
     def safe_crossing(self, lat_start, lat_end, lon_start, lon_end, current_time, is_constrained):
         debug = True
 
-        delta_lats = (lat_end - lat_start) * self.pars.resolution
-        delta_lons = (lon_end - lon_start) * self.pars.resolution
-        x0 = lat_start
-        y0 = lon_start
+        lat_start = np.asarray(lat_start, dtype=float)
+        lat_end = np.asarray(lat_end, dtype=float)
+        lon_start = np.asarray(lon_start, dtype=float)
+        lon_end = np.asarray(lon_end, dtype=float)
+        is_constrained = np.array(is_constrained, dtype=bool)
 
         # if (debug):
         # form.print_step('Constraints: Moving from (' + str(lat_start) + ',' + str(lon_start) + ') to (' + str(
         #        lat_end) + ',' + str(lon_end), 0)
 
-        nSteps = int(1. / self.pars.resolution)
-        for iStep in range(0, nSteps):
-            x = x0 + delta_lats
-            y = y0 + delta_lons
-
-            is_constrained = self.safe_endpoint(x, y, current_time, is_constrained)
-            x0 = x
-            y0 = y
+        for iConst in range(0, self.neg_size):
+            active = np.flatnonzero(~is_constrained)
+            if active.shape[0] == 0:
+                break
+            time = current_time
+            if np.size(current_time) == is_constrained.shape[0]:
+                time = np.ravel(current_time)[active]
+
+            constraint = self.negative_constraints[iConst]
+            is_constrained_temp = constraint.constraint_on_crossing(lat_start[active], lat_end[active],
+                                                                    lon_start[active], lon_end[active], time)
+            if is_constrained_temp is None:
+                dist = geodesic.inverse(lat_start[active], lon_start[active], lat_end[active], lon_end[active],
+                                        'spherical')['s12']
+                fractions = self.get_sample_fractions(dist)
+                lats, lons = geodesic.get_intermediate_points(lat_start[active], lon_start[active], lat_end[active],
+                                                              lon_end[active], fractions)
+                if np.ndim(time) > 0:
+                    time = np.broadcast_to(time, fractions.shape).ravel()
+                is_constrained_temp = self.get_constrained_samples(constraint, lats, lons, time, active,
+                                                                   is_constrained.shape[0]).any(axis=0)
+            if is_constrained_temp.any(): self.constraints_crossed.append(constraint.message)
+            is_constrained[active] = is_constrained_temp
 
         if (debug):
             lat_start_constrained = lat_start[is_constrained == 1]
@@ -204,15 +314,6 @@ class ConstraintsList():
                 form.print_step('[' + str(lat_start_constrained[i]) + ',' + str(lon_start_constrained[i]) + '] to [' +
                               str(lat_end_constrained[i]) + ',' + str(lon_end_constrained[i]) + ']', 2)
 
-        # if not ((round(x0.all,8) == round(self.lats_per_step[0, :].all) and (x0.all == self.lons_per_step[0, :].all)):
-        #    exc = 'Did not check destination, only checked lat=' + str(x0) + ', lon=' + str(y0)
-        #    raise ValueError(exc)
-
-        if not np.allclose(x, lat_end): raise Exception(
-            'Constraints.land_crossing(): did not reach latitude of destination!')
-        if not np.allclose(y, lon_end): raise Exception(
-            'Constraints.land_crossing(): did not reach longitude of destination!')
-
         return is_constrained
 
     def add_pos_constraint(self, constraint):
@@ -242,27 +343,84 @@ class LandCrossing(NegativeContraint):
         logger.info(form.get_log_step('no land crossing',1))
 
 
+##
+# The significant wave height is read from the variable 'VHM0' of the weather data (e.g. the environment cache with
+# waves, see utils/envcache.py). Without weather data, the wave heights current_wave_height that have been set from
+# outside are compared to the limit.
 class WaveHeight(NegativeConstraintFromWeather):
     current_wave_height: np.ndarray
     max_wave_height: float
 
-    def __init__(self):
-        NegativeContraint.__init__(self, 'WaveHeight')
+    def __init__(self, weather=None):
+        if (weather is not None) and ('VHM0' not in weather.ds):
+            raise ValueError('WaveHeight needs the significant wave height (VHM0) in the weather data, e.g. from an '
+                             'environment cache with waves')
+        NegativeConstraintFromWeather.__init__(self, 'WaveHeight', weather)
         self.message += 'waves are to high!'
         #self.resource_type = 0
         self.current_wave_height = np.array([-99])
         self.max_wave_height = 10
 
+    def set_max_wave_height(self, height):
+        self.max_wave_height = height
+        self.reset_exceedance()
+
+    def get_limit(self):
+        return self.max_wave_height
+
+    def read_weather_slice(self, idx):
+        wave_height = self.wt.ds['VHM0'].sel(time=self.wt.time_axis[idx])
+        return wave_height.to_numpy(), wave_height['latitude'].to_numpy(), wave_height['longitude'].to_numpy()
+
     def constraint_on_point(self, lat, lon, time):
         # self.print_debug('checking point: ' + str(lat) + ',' + str(lon))
-        self.check_weather(lat, lon, time)
-        # print('current_wave_height:', self.current_wave_height)
-        return self.current_wave_height > self.max_wave_height
+        if self.wt is None:
+            # print('current_wave_height:', self.current_wave_height)
+            return self.current_wave_height > self.max_wave_height
+        return self.lookup_weather(lat, lon, time, 'is_exceeded')
+
+    def check_weather(self, lat, lon, time):
+        if self.wt is not None:
+            self.current_wave_height = self.lookup_weather(lat, lon, time, 'values')
 
     def print_info(self):
         logger.info(form.get_log_step('maximum wave height=' + str(self.max_wave_height) + 'm', 1))
 
 
+##
+# The wind speed is calculated from the wind components that are used for the routing (WeatherCond.read_wind_components)
+class WindSpeed(NegativeConstraintFromWeather):
+    current_wind_speed: np.ndarray
+    max_wind_speed: float
+
+    def __init__(self, weather):
+        NegativeConstraintFromWeather.__init__(self, 'WindSpeed', weather)
+        self.message += 'wind is too strong!'
+        self.current_wind_speed = np.array([-99])
+        self.max_wind_speed = 20
+
+    def set_max_wind_speed(self, speed):
+        self.max_wind_speed = speed
+        self.reset_exceedance()
+
+    def get_limit(self):
+        return self.max_wind_speed
+
+    def read_weather_slice(self, idx):
+        wind = self.wt.read_wind_components(idx)
+        twa, tws = self.wt.get_twatws_from_uv(wind['u'], wind['v'])
+        return tws, wind['lats'], wind['lons']
+
+    def constraint_on_point(self, lat, lon, time):
+        return self.lookup_weather(lat, lon, time, 'is_exceeded')
+
+    def check_weather(self, lat, lon, time):
+        self.current_wind_speed = self.lookup_weather(lat, lon, time, 'values')
+
+    def print_info(self):
+        logger.info(form.get_log_step('maximum wind speed=' + str(self.max_wind_speed) + 'm/s', 1))
+
+
 class WaterDepth(NegativeConstraintFromWeather):
     current_depth: np.ndarray
     min_depth: float
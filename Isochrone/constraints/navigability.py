@@ -0,0 +1,338 @@
+import logging
+
+import numpy as np
+from global_land_mask import globe
+from scipy.ndimage import distance_transform_edt
+
+import utils.formatting as form
+import utils.geodesic as geodesic
+from constraints.constraints import NegativeContraint
+from weather import WeatherCond
+
+logger = logging.getLogger('WRT.Constraints')
+
+##
+# Rasterised constraints.
+#
+# RasterGrid: regular lat/lon grid whose nodes span the map; points are assigned to the grid by index arithmetic
+#       (nearest node or the four surrounding nodes for a bilinear interpolation) without any search or xarray call
+# NavigabilityRaster: uint8 mask of the navigable nodes (no land and deep enough for a given draught), built once per
+#       map and draught from the land mask (global_land_mask) and the depth of the weather dataset
+# HazardDistanceField: signed distance of the nodes of a NavigabilityRaster to the closest node that is not navigable
+# Navigability: negative constraint that replaces LandCrossing and WaterDepth by lookups in a NavigabilityRaster
+# NavigabilityQuadtree: pyramid of the combined masks of several NavigabilityRasters whose nodes are free, blocked or
+#       mixed
+# QuadtreeCrossing: negative constraint that checks whole ways by descending into the mixed nodes of a
+#       NavigabilityQuadtree only
+#
+# The lookup of a point costs a few integer operations instead of a call of globe.is_land and an interpolation of the
+# depth with xarray for every sample point of ConstraintsList.safe_crossing. Points outside of the raster are not
+# navigable. With a HazardDistanceField, Navigability checks whole ways instead of sample points: ways in open water
+# are accepted from the clearance at their end points, only ways close to hazards are divided further. The quadtree
+# finds all grid cells that a way crosses, its costs scale with the length of the coastline close to the way.
+
+class RasterGrid():
+    lat1: float
+    lon1: float
+    resolution_deg: float   # distance of two grid nodes (°)
+    lats: np.ndarray        # latitudes of the grid nodes, ascending
+    lons: np.ndarray        # longitudes of the grid nodes, ascending
+
+    def __init__(self, lat1, lon1, lat2, lon2, resolution_deg):
+        if resolution_deg <= 0:
+            raise ValueError('Resolution of the raster needs to be positive, got ' + str(resolution_deg))
+        nlat = int(round((lat2 - lat1) / resolution_deg)) + 1
+        nlon = int(round((lon2 - lon1) / resolution_deg)) + 1
+        self.lat1 = lat1
+        self.lon1 = lon1
+        self.resolution_deg = resolution_deg
+        self.lats = lat1 + np.arange(0, nlat) * resolution_deg
+        self.lons = lon1 + np.arange(0, nlon) * resolution_deg
+
+    def get_shape(self):
+        return self.lats.shape[0], self.lons.shape[0]
+
+    ##
+    # returns the position of points in units of grid nodes
+    def get_grid_position(self, lats, lons):
+        return (np.asarray(lats, dtype=float) - self.lat1) / self.resolution_deg, \
+               (np.asarray(lons, dtype=float) - self.lon1) / self.resolution_deg
+
+    ##
+    # returns the indices of the grid nodes closest to the points and whether the points are on the raster
+    def get_nearest_indices(self, lats, lons):
+        nlat, nlon = self.get_shape()
+        ilat, ilon = self.get_grid_position(lats, lons)
+        ilat = np.floor(ilat + 0.5).astype(int)
+        ilon = np.floor(ilon + 0.5).astype(int)
+        is_inside = (ilat >= 0) & (ilat < nlat) & (ilon >= 0) & (ilon < nlon)
+        return np.clip(ilat, 0, nlat - 1), np.clip(ilon, 0, nlon - 1), is_inside
+
+    ##
+    # returns the bilinear interpolation of 'values' (shape of the grid) at the points and whether the points are on the
+    # raster
+    def get_bilinear(self, values, lats, lons):
+        nlat, nlon = self.get_shape()
+        xlat, xlon = self.get_grid_position(lats, lons)
+        is_inside = (xlat >= 0) & (xlat <= nlat - 1) & (xlon >= 0) & (xlon <= nlon - 1)
+
+        ilat = np.clip(np.floor(xlat).astype(int), 0, max(nlat - 2, 0))
+        ilon = np.clip(np.floor(xlon).astype(int), 0, max(nlon - 2, 0))
+        wlat = np.clip(xlat - ilat, 0, 1)
+        wlon = np.clip(xlon - ilon, 0, 1)
+        ilat_next = np.minimum(ilat + 1, nlat - 1)
+        ilon_next = np.minimum(ilon + 1, nlon - 1)
+
+        interpolated = (1 - wlat) * (1 - wlon) * values[ilat, ilon] + (1 - wlat) * wlon * values[ilat, ilon_next] + \
+                       wlat * (1 - wlon) * values[ilat_next, ilon] + wlat * wlon * values[ilat_next, ilon_next]
+        return interpolated, is_inside
+
+
+class NavigabilityRaster(RasterGrid):
+    draught: float          # minimum water depth (m)
+    mask: np.ndarray        # 1: navigable, 0: land or too shallow, shape of the grid (uint8)
+
+    def __init__(self, lat1, lon1, lat2, lon2, resolution_deg, draught):
+        RasterGrid.__init__(self, lat1, lon1, lat2, lon2, resolution_deg)
+        self.draught = draught
+        self.mask = np.zeros(self.get_shape(), dtype=np.uint8)
+
+    ##
+    # sets the mask from the land mask and the depth (m, negative below sea level) at the grid nodes. Nodes without
+    # depth information (NaN) are navigable unless they are on land, as for WaterDepth.
+    def set_mask(self, depth, is_land):
+        is_shallow = np.asarray(depth) > -self.draught
+        self.mask = (~(np.asarray(is_land, dtype=bool) | is_shallow)).astype(np.uint8)
+
+    def build_from_weather(self, wt: WeatherCond):
+        lat_grid, lon_grid = np.meshgrid(self.lats, self.lons, indexing='ij')
+        depth = wt.ds['depth'].interp(latitude=self.lats, longitude=self.lons, method='linear').to_numpy()
+        self.set_mask(depth, globe.is_land(lat_grid, lon_grid))
+
+    ##
+    # returns whether the points are navigable, either for the closest grid node ('nearest') or if the bilinear
+    # interpolation of the mask exceeds 0.5 ('bilinear')
+    def is_navigable(self, lats, lons, method='nearest'):
+        if method == 'nearest':
+            ilat, ilon, is_inside = self.get_nearest_indices(lats, lons)
+            return (self.mask[ilat, ilon] == 1) & is_inside
+        if method == 'bilinear':
+            navigable, is_inside = self.get_bilinear(self.mask, lats, lons)
+            return (navigable > 0.5) & is_inside
+        raise ValueError('Unknown lookup method ' + str(method) + ' of the navigability raster')
+
+    def print_info(self):
+        nlat, nlon = self.get_shape()
+        logger.info(form.get_log_step('navigability raster with ' + str(nlat) + 'x' + str(nlon) + ' nodes, resolution ' +
+                                      str(self.resolution_deg) + '°, ' +
+                                      str(round(100 * np.mean(self.mask), 1)) + '% navigable', 2))
+
+
+class HazardDistanceField(RasterGrid):
+    distance: np.ndarray    # distance of the grid nodes to the closest node that is not navigable (m), negative for nodes that are not navigable (float32)
+    cell_diagonal: float    # diagonal of a grid cell (m)
+    min_spacing: float      # smaller distance of two neighbouring nodes (m)
+
+    ##
+    # The distances are calculated by a Euclidean distance transform with the node distances in latitude and longitude
+    # at the latitude of the map that is farthest from the equator, i.e. they underestimate the true distances. The
+    # surrounding of the raster counts as not navigable.
+    def __init__(self, raster: NavigabilityRaster):
+        RasterGrid.__init__(self, raster.lats[0], raster.lons[0], raster.lats[-1], raster.lons[-1],
+                            raster.resolution_deg)
+        spacing_lat = np.radians(self.resolution_deg) * geodesic.EARTH_RADIUS
+        spacing_lon = spacing_lat * np.cos(np.radians(np.max(np.abs(self.lats))))
+        self.cell_diagonal = np.sqrt(spacing_lat ** 2 + spacing_lon ** 2)
+        self.min_spacing = min(spacing_lat, spacing_lon)
+
+        is_navigable = np.pad(raster.mask == 1, 1, constant_values=False)
+        distance = distance_transform_edt(is_navigable, sampling=(spacing_lat, spacing_lon))
+        if is_navigable.any():
+            distance -= distance_transform_edt(~is_navigable, sampling=(spacing_lat, spacing_lon))
+        else:
+            distance -= self.cell_diagonal
+        self.distance = distance[1:-1, 1:-1].astype(np.float32)
+
+    ##
+    # returns the distance from the points within which all points are navigable (m), negative if there is no such
+    # distance. The distance of the closest node is reduced by one and a half cell diagonals: half a diagonal from the
+    # point to its closest node and one diagonal for the extent of the hazard for both lookups of NavigabilityRaster.
+    def get_clearance(self, lats, lons):
+        ilat, ilon, is_inside = self.get_nearest_indices(lats, lons)
+        return np.where(is_inside, self.distance[ilat, ilon] - 1.5 * self.cell_diagonal, -np.inf)
+
+
+##
+# returns the navigability raster for the map of the weather data and the draught. The default resolution is the one of
+# the depth data of the weather dataset.
+def get_navigability_raster(wt: WeatherCond, draught, resolution_deg=None):
+    map_size = wt.get_map_size()
+    if resolution_deg is None:
+        lats = wt.ds['depth']['latitude'].to_numpy()
+        resolution_deg = float(np.abs(lats[1] - lats[0]))
+
+    raster = NavigabilityRaster(map_size.x1, map_size.y1, map_size.x2, map_size.y2, resolution_deg, draught)
+    raster.build_from_weather(wt)
+    return raster
+
+
+class Navigability(NegativeContraint):
+    raster: NavigabilityRaster
+    method: str             # lookup in the raster: 'nearest' or 'bilinear'
+    distance_field: HazardDistanceField     # None: the ways are checked at sample points by ConstraintsList
+
+    def __init__(self, raster, method='nearest', distance_field=None):
+        NegativeContraint.__init__(self, 'Navigability')
+        self.message += 'crossing land or water not deep enough!'
+        self.raster = raster
+        self.method = method
+        self.distance_field = distance_field
+
+    def constraint_on_point(self, lat, lon, time):
+        return ~self.raster.is_navigable(lat, lon, self.method)
+
+    ##
+    # A way whose end points are navigable is free if it is shorter than the clearance at one of its end points or
+    # shorter than twice the clearance at both end points (every point of the way is at most half of its length away
+    # from one of the end points). Other ways are divided at their midpoint (great circle), which is looked up in the
+    # raster, and both parts are checked again until they are shorter than a quarter of the node distance.
+    def constraint_on_crossing(self, lat_start, lat_end, lon_start, lon_end, time):
+        if self.distance_field is None:
+            return None
+
+        is_constrained = ~(self.raster.is_navigable(lat_start, lon_start, self.method) &
+                           self.raster.is_navigable(lat_end, lon_end, self.method))
+        ivariant = np.flatnonzero(~is_constrained)
+        lat1, lon1 = lat_start[ivariant], lon_start[ivariant]
+        lat2, lon2 = lat_end[ivariant], lon_end[ivariant]
+        min_length = self.distance_field.min_spacing / 4
+
+        while ivariant.shape[0] > 0:
+            length = geodesic.inverse(lat1, lon1, lat2, lon2, 'spherical')['s12']
+            clearance1 = self.distance_field.get_clearance(lat1, lon1)
+            clearance2 = self.distance_field.get_clearance(lat2, lon2)
+            is_free = (length < np.maximum(clearance1, clearance2)) | (length < 2 * np.minimum(clearance1, clearance2))
+            divide = np.flatnonzero(~is_free & (length >= min_length))
+
+            lat_mid, lon_mid = geodesic.get_intermediate_points(lat1[divide], lon1[divide], lat2[divide], lon2[divide],
+                                                                0.5)
+            is_constrained[ivariant[divide][~self.raster.is_navigable(lat_mid, lon_mid, self.method)]] = True
+
+            # both halves of the divided ways of the variants that are not constrained yet
+            keep = ~is_constrained[ivariant[divide]]
+            divide, lat_mid, lon_mid = divide[keep], lat_mid[keep], lon_mid[keep]
+            ivariant = np.concatenate((ivariant[divide], ivariant[divide]))
+            lat1, lat2 = np.concatenate((lat1[divide], lat_mid)), np.concatenate((lat_mid, lat2[divide]))
+            lon1, lon2 = np.concatenate((lon1[divide], lon_mid)), np.concatenate((lon_mid, lon2[divide]))
+
+        return is_constrained
+
+    def print_info(self):
+        logger.info(form.get_log_step('no land crossing and minimum water depth=' + str(self.raster.draught) +
+                                      'm (raster lookup)', 1))
+        self.raster.print_info()
+
+
+##
+# returns whether the segments from (x0, y0) to (x1, y1) intersect the boxes [xmin, xmax] x [ymin, ymax] (slab method of
+# Liang-Barsky)
+def get_box_intersection(x0, y0, x1, y1, xmin, xmax, ymin, ymax):
+    t_enter = np.zeros(np.shape(x0))
+    t_exit = np.ones(np.shape(x0))
+    for p0, p1, low, high in ((x0, x1, xmin, xmax), (y0, y1, ymin, ymax)):
+        delta = p1 - p0
+        is_parallel = delta == 0
+        delta = np.where(is_parallel, 1, delta)
+        t_low = (low - p0) / delta
+        t_high = (high - p0) / delta
+        t_enter = np.where(is_parallel, np.where((p0 >= low) & (p0 <= high), t_enter, np.inf),
+                           np.maximum(t_enter, np.minimum(t_low, t_high)))
+        t_exit = np.where(is_parallel, t_exit, np.minimum(t_exit, np.maximum(t_low, t_high)))
+    return t_enter <= t_exit
+
+
+class NavigabilityQuadtree(RasterGrid):
+    draught: float          # maximum of the minimum water depths of the rasters (m)
+    levels: list            # states of the nodes per level, from single grid cells (level 0) to the root node; 0: blocked, 1: free, 2: mixed (uint8)
+
+    ##
+    # The quadtree is built over the combination of the masks of several NavigabilityRasters on the same grid: a grid
+    # cell is free if it is navigable for all rasters. The grid is padded with blocked cells to a square of 2^n cells.
+    def __init__(self, rasters):
+        RasterGrid.__init__(self, rasters[0].lats[0], rasters[0].lons[0], rasters[0].lats[-1], rasters[0].lons[-1],
+                            rasters[0].resolution_deg)
+        self.draught = max([raster.draught for raster in rasters])
+
+        mask = np.ones(self.get_shape(), dtype=np.uint8)
+        for raster in rasters:
+            if raster.get_shape() != self.get_shape():
+                raise ValueError('Rasters of the quadtree need to have the same grid!')
+            mask = np.minimum(mask, raster.mask)
+
+        size = 2 ** int(np.ceil(np.log2(max(self.get_shape()))))
+        state = np.zeros((size, size), dtype=np.uint8)
+        state[:mask.shape[0], :mask.shape[1]] = mask
+        self.levels = [state]
+        while state.shape[0] > 1:
+            children = state.reshape(state.shape[0] // 2, 2, state.shape[1] // 2, 2)
+            is_free = (children == 1).all(axis=(1, 3))
+            is_blocked = (children == 0).all(axis=(1, 3))
+            state = np.where(is_free, 1, np.where(is_blocked, 0, 2)).astype(np.uint8)
+            self.levels.append(state)
+
+    def is_navigable(self, lats, lons):
+        ilat, ilon, is_inside = self.get_nearest_indices(lats, lons)
+        return (self.levels[0][ilat, ilon] == 1) & is_inside
+
+    ##
+    # The ways are traced through the quadtree from the root node: blocked nodes constrain the way, free nodes are
+    # skipped and only the children of mixed nodes that intersect the way are visited. The cell of a grid node is the
+    # area for which the node is the closest one (lookup 'nearest' of NavigabilityRaster). The ways are straight lines in
+    # latitude and longitude; for the ways of a routing step the deviation from the great circle is far below the node
+    # distance.
+    def is_crossing_blocked(self, lat_start, lat_end, lon_start, lon_end):
+        x0, y0 = self.get_grid_position(lat_start, lon_start)
+        x1, y1 = self.get_grid_position(lat_end, lon_end)
+        is_blocked = ~(self.is_navigable(lat_start, lon_start) & self.is_navigable(lat_end, lon_end))
+
+        iway = np.flatnonzero(~is_blocked)
+        inode_lat = np.zeros(iway.shape, dtype=int)
+        inode_lon = np.zeros(iway.shape, dtype=int)
+        for level in range(len(self.levels) - 1, -1, -1):
+            state = self.levels[level][inode_lat, inode_lon]
+            is_blocked[iway[state == 0]] = True
+            keep = (state == 2) & ~is_blocked[iway]
+            iway, inode_lat, inode_lon = iway[keep], inode_lat[keep], inode_lon[keep]
+            if (level == 0) or (iway.shape[0] == 0):
+                break
+
+            # children of the mixed nodes that are crossed by the ways
+            iway = np.repeat(iway, 4)
+            inode_lat = np.repeat(2 * inode_lat, 4) + np.tile([0, 0, 1, 1], inode_lat.shape[0])
+            inode_lon = np.repeat(2 * inode_lon, 4) + np.tile([0, 1, 0, 1], inode_lon.shape[0])
+            size = 2 ** (level - 1)
+            is_crossed = get_box_intersection(x0[iway], y0[iway], x1[iway], y1[iway],
+                                              inode_lat * size - 0.5, (inode_lat + 1) * size - 0.5,
+                                              inode_lon * size - 0.5, (inode_lon + 1) * size - 0.5)
+            iway, inode_lat, inode_lon = iway[is_crossed], inode_lat[is_crossed], inode_lon[is_crossed]
+
+        return is_blocked
+
+
+class QuadtreeCrossing(NegativeContraint):
+    quadtree: NavigabilityQuadtree
+
+    def __init__(self, quadtree):
+        NegativeContraint.__init__(self, 'QuadtreeCrossing')
+        self.message += 'crossing land or water not deep enough!'
+        self.quadtree = quadtree
+
+    def constraint_on_point(self, lat, lon, time):
+        return ~self.quadtree.is_navigable(lat, lon)
+
+    def constraint_on_crossing(self, lat_start, lat_end, lon_start, lon_end, time):
+        return self.quadtree.is_crossing_blocked(lat_start, lat_end, lon_start, lon_end)
+
+    def print_info(self):
+        logger.info(form.get_log_step('no land crossing and minimum water depth=' + str(self.quadtree.draught) +
+                                      'm (quadtree with ' + str(len(self.quadtree.levels)) + ' levels)', 1))
@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+
+import numpy as np
+import shapefile
+import shapely
+from shapely.geometry import shape
+
+import utils.formatting as form
+import utils.geodesic as geodesic
+from constraints.constraints import NegativeContraint
+
+logger = logging.getLogger('WRT.Constraints')
+
+##
+# Restricted areas given as polygons, e.g. traffic separation schemes, wind farms or military areas.
+#
+# The polygons are read from GeoJSON files (Polygon and MultiPolygon geometries, as FeatureCollection, Feature or plain
+# geometry) or shapefiles with coordinates in longitude and latitude (WGS84) and are indexed by a Sort-Tile-Recursive
+# tree (shapely.STRtree). The ways of all variants of a routing step are checked at once: the tree selects the
+# candidate polygons by the bounding boxes of the ways and the intersection of the ways with these candidates is
+# calculated in one vectorised call, such that thousands of polygons only cost for the ways close to them.
+
+def read_polygons(path):
+    """
+        Return the polygons and their names from a GeoJSON file (.geojson, .json) or a shapefile (.shp).
+
+        The name of a polygon is the property 'name' (any case), the index of the polygon otherwise.
+    """
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension in ('.geojson', '.json'):
+        with open(path) as file:
+            content = json.load(file)
+        if content.get('type') == 'FeatureCollection':
+            features = content['features']
+        elif content.get('type') == 'Feature':
+            features = [content]
+        else:
+            features = [{'geometry': content, 'properties': {}}]
+        records = [(feature['geometry'], feature.get('properties') or {}) for feature in features]
+    elif extension == '.shp':
+        with shapefile.Reader(str(path)) as reader:
+            records = [(record.shape.__geo_interface__, record.record.as_dict()) for record in reader.shapeRecords()]
+    else:
+        raise ValueError('Restricted areas need to be given as GeoJSON or shapefile, got ' + str(path))
+
+    polygons = []
+    names = []
+    for geometry, properties in records:
+        polygon = shape(geometry)
+        if polygon.geom_type not in ('Polygon', 'MultiPolygon'):
+            raise ValueError('Restricted areas need to be polygons, got ' + polygon.geom_type + ' in ' + str(path))
+        name = [value for key, value in properties.items() if key.lower() == 'name']
+        polygons.append(polygon)
+        names.append(str(name[0]) if name else str(len(names)))
+    return polygons, names
+
+
+class RestrictedAreas(NegativeContraint):
+    polygons: np.ndarray    # shapely polygons with coordinates (lon, lat)
+    names: list
+    tree: shapely.STRtree
+    npoints_way: int        # number of points on the great circle by which a way is approximated
+
+    def __init__(self, polygons, names=None, npoints_way=5):
+        NegativeContraint.__init__(self, 'RestrictedAreas')
+        self.message += 'crossing restricted area!'
+        if npoints_way < 2:
+            raise ValueError('A way needs to be approximated by at least 2 points, got ' + str(npoints_way))
+        self.polygons = np.array(polygons, dtype=object)
+        self.names = names if names is not None else [str(i) for i in range(0, len(polygons))]
+        self.tree = shapely.STRtree(self.polygons)
+        self.npoints_way = npoints_way
+
+    @classmethod
+    def from_file(cls, path, npoints_way=5):
+        polygons, names = read_polygons(path)
+        return cls(polygons, names, npoints_way)
+
+    ##
+    # returns for every geometry whether it intersects one of the polygons
+    def get_intersecting(self, geometries):
+        is_intersecting = np.zeros(geometries.shape[0], dtype=bool)
+        igeometry, ipolygon = self.tree.query(geometries, predicate='intersects')
+        is_intersecting[igeometry] = True
+        return is_intersecting
+
+    def constraint_on_point(self, lat, lon, time):
+        lat, lon = np.broadcast_arrays(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float))
+        return self.get_intersecting(shapely.points(lon, lat))
+
+    ##
+    # The ways are approximated by npoints_way points on the great circle, i.e. by line strings in longitude and
+    # latitude.
+    def constraint_on_crossing(self, lat_start, lat_end, lon_start, lon_end, time):
+        fractions = np.linspace(0, 1, self.npoints_way)[:, np.newaxis]
+        lats, lons = geodesic.get_intermediate_points(lat_start, lon_start, lat_end, lon_end, fractions)
+        coords = np.stack((lons.T, lats.T), axis=-1)
+        return self.get_intersecting(shapely.linestrings(coords))
+
+    def print_info(self):
+        logger.info(form.get_log_step('no crossing of ' + str(self.polygons.shape[0]) + ' restricted areas', 1))
@@ -0,0 +1,50 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import warnings
+
+from benchmarks.routing_benchmark import CONSTRAINT_SETS, RoutingBenchmark, compare_results, get_benchmark_matrix
+
+##
+# Runs the routing benchmark on synthetic data (see benchmarks/routing_benchmark.py). Needs neither weather and depth
+# files nor mariPower, hence config.py and its environment variables are not used.
+#
+#   python execute_benchmark.py --output benchmark.json [--reference benchmark_old.json]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark of the isochrone routing on synthetic data')
+    parser.add_argument('--output', default='benchmark.json', help='file for the results (JSON)')
+    parser.add_argument('--reference', default=None, help='results of a previous version to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='tolerated relative slow-down')
+    parser.add_argument('--variant-segments', type=int, nargs='+', default=[10, 30])
+    parser.add_argument('--prune-segments', type=int, nargs='+', default=[20, 40])
+    parser.add_argument('--routing-steps', type=int, nargs='+', default=[10, 20])
+    parser.add_argument('--constraints', nargs='+', default=CONSTRAINT_SETS, choices=CONSTRAINT_SETS)
+    parser.add_argument('--resolution', type=float, default=0.1, help='resolution of the synthetic data (°)')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    ##
+    # initialise logging
+    logger = logging.getLogger('WRT')
+    logger.setLevel(logging.INFO)
+    sh = logging.StreamHandler(sys.stderr)
+    sh.setFormatter(logging.Formatter('%(name)-12s: %(levelname)-8s %(message)s'))
+    logger.addHandler(sh)
+    warnings.filterwarnings("ignore")
+
+    cases = get_benchmark_matrix(args.variant_segments, args.prune_segments, args.routing_steps, args.constraints)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        benchmark = RoutingBenchmark(cases, os.path.join(tmp_dir, 'EnvCache'), args.resolution, args.repeats)
+        results = benchmark.run()
+    benchmark.write_results(results, args.output)
+
+    if args.reference is not None:
+        regressions = compare_results(args.reference, args.output, args.tolerance)
+        for regression in regressions:
+            logger.warning('Regression for ' + str(regression['case']) + ': time ratio ' +
+                           str(round(regression['ratio'], 2)) + ', route changed: ' + str(regression['route_changed']))
+        if len(regressions) > 0:
+            sys.exit(1)
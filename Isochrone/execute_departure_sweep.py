@@ -0,0 +1,57 @@
+import datetime as dt
+import logging
+import warnings
+
+import config
+from algorithms.departuresweep import DepartureSweep, get_departure_grid
+from utils.envcache import write_env_cache
+from weather import WeatherCondCMEMS
+
+if __name__ == "__main__":
+    ##
+    # initialise logging
+    logger = logging.getLogger('WRT')
+    logger.setLevel(logging.INFO)
+    fh = logging.FileHandler(config.PERFORMANCE_LOG_FILE, mode='w')
+    fh.setLevel(logging.WARNING)
+    fhinfo = logging.FileHandler(config.INFO_LOG_FILE, mode='w')
+    fhinfo.setLevel(logging.INFO)
+    formatter = logging.Formatter('%(name)-12s: %(levelname)-8s %(message)s')
+    fh.setFormatter(formatter)
+    fhinfo.setFormatter(formatter)
+    logger.addHandler(fh)
+    logger.addHandler(fhinfo)
+
+    ##
+    # suppress warnings from mariPower
+    warnings.filterwarnings("ignore")
+
+    # *******************************************
+    # basic settings
+    lat1, lon1, lat2, lon2 = config.DEFAULT_MAP
+    first_departure = dt.datetime.strptime(config.START_TIME, '%Y%m%d%H')
+    last_departure = dt.datetime.strptime(config.SWEEP_LAST_DEPARTURE, '%Y%m%d%H')
+    window_hours = int((last_departure - first_departure).total_seconds() / 3600)
+
+    # *******************************************
+    # read weather and depth data once and write them to the memory-mapped cache for the workers
+    wt = WeatherCondCMEMS(config.WEATHER_DATA, config.START_TIME, first_departure, config.TIME_FORECAST + window_hours, 3,
+                          config.WEATHER_CHUNKS)
+    wt.set_map_size(lat1, lon1, lat2, lon2)
+    wt.add_depth_to_EnvData(config.DEPTH_DATA)
+    write_env_cache(wt.ds, config.ENV_CACHE_PATH)
+    wt.close_env_file()
+
+    # *******************************************
+    # routing for all departure times
+    departure_times = get_departure_grid(first_departure, last_departure, config.SWEEP_DELTA_HOURS)
+    sweep = DepartureSweep(departure_times, config.ENV_CACHE_PATH, config.COURSES_FILE, config.SWEEP_WORKERS)
+    results = sweep.run()
+
+    print(results)
+    best_departure = sweep.get_best_departure(results)
+    if best_departure is None:
+        print('no best departure, the routing failed for all departure times')
+    else:
+        print('best departure:', best_departure)
+    results.to_csv(config.ROUTE_PATH + 'departure_sweep.csv', index=False)
@@ -0,0 +1,34 @@
+import datetime as dt
+import logging
+import sys
+import warnings
+
+import config
+from utils.envcache import write_preprocessed_env_cache
+
+##
+# Writes the environment cache for the map DEFAULT_MAP and the forecast from START_TIME for TIME_FORECAST hours (see
+# utils/envcache.py). Weather, waves (optional) and depth are cropped to the map, regridded onto a common grid with the
+# resolution ENV_CACHE_RESOLUTION_DEG and written to ENV_CACHE_PATH. The routing reads the cache if ENV_CACHE_USE is set.
+#
+#   python execute_preprocessing.py
+
+if __name__ == "__main__":
+    ##
+    # initialise logging
+    logger = logging.getLogger('WRT')
+    logger.setLevel(logging.INFO)
+    sh = logging.StreamHandler(sys.stderr)
+    sh.setFormatter(logging.Formatter('%(name)-12s: %(levelname)-8s %(message)s'))
+    logger.addHandler(sh)
+    warnings.filterwarnings("ignore")
+
+    lat1, lon1, lat2, lon2 = config.DEFAULT_MAP
+    start_time = dt.datetime.strptime(config.START_TIME, '%Y%m%d%H')
+
+    # WeatherCond rounds the start and the end of the forecast to its time resolution of 3h
+    time_start = start_time - dt.timedelta(hours=3)
+    time_end = start_time + dt.timedelta(hours=config.TIME_FORECAST + 3)
+
+    write_preprocessed_env_cache(config.WEATHER_DATA, config.DEPTH_DATA, config.ENV_CACHE_PATH, lat1, lon1, lat2, lon2,
+                                 time_start, time_end, config.ENV_CACHE_RESOLUTION_DEG, config.WAVE_DATA)
@@ -12,7 +12,11 @@ import utils.graphics as graphics
 from ship.ship import *
 from weather import *
 from constraints.constraints import *
+from constraints.navigability import HazardDistanceField, Navigability, NavigabilityQuadtree, QuadtreeCrossing, \
+    get_navigability_raster
+from constraints.restrictedareas import RestrictedAreas
 from algorithms.routingalg_factory import *
+from utils.profiling import PerformanceLogFilter, Profiler
 
 def merge_figures_to_gif(path, nof_figures):
     graphics.merge_figs(path, nof_figures)
@@ -23,7 +27,8 @@ if __name__ == "__main__":
     logger = logging.getLogger('WRT')
     logger.setLevel(logging.INFO)
     fh = logging.FileHandler(config.PERFORMANCE_LOG_FILE, mode='w')
-    fh.setLevel(logging.WARNING)
+    fh.setLevel(logging.INFO)
+    fh.addFilter(PerformanceLogFilter())    # warnings and the profiling summary
     fhinfo = logging.FileHandler(config.INFO_LOG_FILE, mode='w')
     fhinfo.setLevel(logging.INFO)
     formatter = logging.Formatter('%(name)-12s: %(levelname)-8s %(message)s')
@@ -71,11 +76,17 @@ if __name__ == "__main__":
 
     # *******************************************
     # initialise weather
-    wt = WeatherCondCMEMS(windfile, model, start_time, hours, 3)
-    wt.set_map_size(lat1, lon1, lat2, lon2)
-    wt.add_depth_to_EnvData(depthfile)
+    if config.ENV_CACHE_USE:
+        # weather and depth have been cropped and regridded by execute_preprocessing.py
+        wt = WeatherCondCMEMS(config.ENV_CACHE_PATH, model, start_time, hours, 3)
+        wt.set_map_size(lat1, lon1, lat2, lon2)
+    else:
+        wt = WeatherCondCMEMS(windfile, model, start_time, hours, 3, config.WEATHER_CHUNKS)
+        wt.set_map_size(lat1, lon1, lat2, lon2)
+        wt.add_depth_to_EnvData(depthfile)
     # wt = WeatherCondNCEP(windfile, model, start_time, hours, 3)
     # wt.check_ds_format()
+    wt.set_max_time_slices(config.WEATHER_MAX_TIME_SLICES)
     wt.init_wind_functions()
     wt.init_wind_vectors()
     # vct_winds = wt.read_wind_vectors(model, hours, lat1, lon1, lat2, lon2)
@@ -83,6 +94,7 @@ if __name__ == "__main__":
     # *******************************************
     # initialise constraints
     pars = ConstraintPars()
+    pars.sample_dist = config.CONSTRAINT_SAMPLE_DIST
     land_crossing = LandCrossing()
     water_depth = WaterDepth(wt)
     water_depth.set_drought(config.BOAT_DROUGHT)
@@ -91,21 +103,52 @@ if __name__ == "__main__":
     on_map.set_map(lat1, lon1, lat2, lon2)
 
     constraint_list = ConstraintsList(pars)
-    constraint_list.add_neg_constraint(land_crossing)
+    if config.CONSTRAINT_NAVIGABILITY_RASTER:
+        raster = get_navigability_raster(wt, config.BOAT_DROUGHT, config.CONSTRAINT_NAVIGABILITY_RESOLUTION_DEG)
+        if config.CONSTRAINT_NAVIGABILITY_QUADTREE:
+            constraint_list.add_neg_constraint(QuadtreeCrossing(NavigabilityQuadtree([raster])))
+        else:
+            distance_field = HazardDistanceField(raster) if config.CONSTRAINT_HAZARD_DISTANCE else None
+            constraint_list.add_neg_constraint(Navigability(raster, config.CONSTRAINT_NAVIGABILITY_LOOKUP,
+                                                            distance_field))
+    else:
+        constraint_list.add_neg_constraint(land_crossing)
+        constraint_list.add_neg_constraint(water_depth)
+    if config.RESTRICTED_AREAS is not None:
+        constraint_list.add_neg_constraint(RestrictedAreas.from_file(config.RESTRICTED_AREAS))
+    if config.CONSTRAINT_MAX_WAVE_HEIGHT is not None:
+        wave_height = WaveHeight(wt)
+        wave_height.set_max_wave_height(config.CONSTRAINT_MAX_WAVE_HEIGHT)
+        constraint_list.add_neg_constraint(wave_height)
+    if config.CONSTRAINT_MAX_WIND_SPEED is not None:
+        wind_speed = WindSpeed(wt)
+        wind_speed.set_max_wind_speed(config.CONSTRAINT_MAX_WIND_SPEED)
+        constraint_list.add_neg_constraint(wind_speed)
     # constraint_list.add_neg_constraint(on_map)
-    constraint_list.add_neg_constraint(water_depth)
     constraint_list.print_settings()
 
     # *******************************************
     # initialise rout
     route_factory = RoutingAlgFactory()
-    min_fuel_route = route_factory.get_routing_alg('ISOFUEL')
+    min_fuel_route = route_factory.get_routing_alg(config.ROUTING_ALGORITHM)
     min_fuel_route.init_fig(wt)
+    profiler = Profiler(config.PROFILING, config.PROFILING_MEMORY)
+    min_fuel_route.set_profiler(profiler)
 
     # *******************************************
     # routing
-    min_fuel_route = min_fuel_route.recursive_routing(boat, wt, constraint_list)
+    if config.CHECKPOINT_INTERVAL is not None:
+        min_fuel_route.set_checkpointing(config.CHECKPOINT_PATH, config.CHECKPOINT_INTERVAL)
+    if config.CHECKPOINT_RESUME and os.path.isfile(config.CHECKPOINT_PATH):
+        min_fuel_route = min_fuel_route.resume_from(config.CHECKPOINT_PATH, boat, wt, constraint_list)
+    else:
+        min_fuel_route = min_fuel_route.recursive_routing(boat, wt, constraint_list)
     min_fuel_route.print_route()
+    if config.PROFILING:
+        profiler.stop()
+        profiler.print_summary()
+        profiler.write_json(config.PROFILING_PATH + '.json')
+        profiler.write_chrome_trace(config.PROFILING_PATH + '_trace.json')
     #min_fuel_route.write_to_file(str(min_fuel_route.route_type) + "route.json")
     min_fuel_route.return_route_to_API(routepath + str(min_fuel_route.route_type) + "route.json")
 
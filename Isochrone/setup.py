@@ -29,8 +29,10 @@ setup(
       'pytest',
       'python-dotenv',
       'Pillow',
+      'pyshp',
       'scipy == 1.9.2',
       'setuptools',
+      'shapely >= 2.0',
       'xarray',
       'netcdf4'
     ]
@@ -2,6 +2,7 @@
 #
 #
 import math
+import os
 import sys
 import time
 
@@ -12,16 +13,25 @@ import pytest
 import xarray as xr
 from scipy.interpolate import RegularGridInterpolator
 
-
-import mariPower
 import utils.formatting as form
 import utils.unit_conversion as units
-from mariPower import ship
-from mariPower import __main__
 from utils.unit_conversion import knots_to_mps  # Convert  knot value in meter per second
 from ship.shipparams import ShipParams
 from weather import WeatherCond
 
+# mariPower is proprietary and only required for the power estimation of Tanker, stand-ins for the power estimation (e.g.
+# benchmarks/synthetic.py) can be used without it
+try:
+    import mariPower
+    from mariPower import ship
+    from mariPower import __main__
+except ImportError:
+    mariPower = None
+
+def check_mariPower():
+    if mariPower is None:
+        raise ImportError('The power estimation of Tanker requires the package mariPower which could not be imported!')
+
 ## Boat: Main class for boats. Classes 'Tanker' and 'SailingBoat' derive from it
 # Tanker: implements interface to mariPower package which is used for power estimation.
 # SailingBoat: implements sailing boat as originally done in wind-router package. Deprecated. ToDo: can be deleted?
@@ -64,7 +74,7 @@ class Tanker(Boat):
     rpm: int                        #propeller revolutions per minute
 
     ## Connection to hydrodynamic modeling
-    hydro_model: mariPower.ship
+    hydro_model: None               # mariPower.ship.CBT
 
     ##additional information
     environment_path: str           #path to netCDF for environmental data
@@ -76,6 +86,7 @@ class Tanker(Boat):
 
     def init_hydro_model_single_pars(self):
         debug = True
+        check_mariPower()
         self.hydro_model = mariPower.ship.CBT()
         # shipSpeed = 13 * 1852 / 3600
         self.hydro_model.WindDirection = math.radians(90)
@@ -107,6 +118,7 @@ class Tanker(Boat):
 
     ## initialise mariPower.ship for communication of courses via netCDF and passing of environmental data as netCDF (current standard)
     def init_hydro_model_Route(self, filepath_env, filepath_courses):
+        check_mariPower()
         self.hydro_model = mariPower.ship.CBT()
         self.environment_path = filepath_env
         self.courses_path = filepath_courses
@@ -264,8 +276,9 @@ class Tanker(Boat):
             form.print_step(course_str, 1)
             form.print_step(speed_str, 1)
 
-        it = np.arange(np.unique(lons, return_counts=True)[1][0])+1
-        it = np.hstack((it,)* np.unique(lons).shape[0])
+        # number the courses per space point, the space points do not need to be sorted or to have the same number of
+        # courses (e.g. for batch routing)
+        it = pd.Series(lats).groupby(lats, sort=False).cumcount().to_numpy() + 1
 
         if(debug):
             form.print_step('it=' + str(it))
@@ -282,11 +295,14 @@ class Tanker(Boat):
         if(debug): print('pandas DataFrame:', df)
 
         ds = df.to_xarray()
-        lon_ind = np.unique(lons, return_index=True)[1]
-        lons = [lons[index] for index in sorted(lon_ind)]
-        time_reshape = time.reshape(ds['lat'].shape[0], ds['it'].shape[0])[:,0]
+        # lon and time are unique per space point, the dataset is sorted by lat
+        lons = pd.Series(lons).groupby(lats).first().to_numpy()
+        time_reshape = pd.Series(time).groupby(lats).first().to_numpy()
 
-        print('Request power calculation for ' + str(courses.shape) + ' courses, consequently ' + str(courses.shape[0]/len(lons)) + ' requests to mariPower')
+        # one request per course index 'it' (see get_fuel_netCDF_loop), the space points with fewer courses are left out
+        print('Request power calculation for ' + str(courses.shape[0]) + ' courses at ' + str(ds['lat'].shape[0]) +
+              ' space points, consequently ' + str(ds['it'].shape[0]) + ' requests to mariPower with up to ' +
+              str(ds['lat'].shape[0]) + ' courses each')
 
         ds["lon"] = (['lat'], lons)
         ds["time"] = (['lat'], time_reshape)
@@ -359,9 +375,12 @@ class Tanker(Boat):
     # several bunchs each one containing an xarray with only one course per space point. The bunches are send to mariPower separately
     # and the returned data sets are merged into one. Will (hopefully) be redundant as soon as mariPower accepts requests with several
     # courses per space-time point and will then be replaced by Tanker.get_fuel_netCDF()
+    #
+    # If the space points have different numbers of courses (e.g. for batch routing), the (lat, it) cells of the missing
+    # courses are NaN. They are left out of the requests (see get_single_course_requests) and are NaN in the merged dataset.
     def get_fuel_netCDF_loop(self):
         debug = False
-        filename_single = '/home/kdemmich/MariData/Code/MariGeoRoute/Isochrone/CoursesRouteSingle.nc'
+        filename_single = os.path.splitext(self.courses_path)[0] + 'Single.nc'
         ds = xr.load_dataset(self.courses_path)
         n_vars = ds['it'].shape[0]
         ds_merged = xr.Dataset()
@@ -371,9 +390,9 @@ class Tanker(Boat):
             form.print_step('get_fuel_netCDF_loop: loop over all variants per space point', 0)
             form.print_step('original dataset: ' + str(ds), 0)
 
+        requests = self.get_single_course_requests(ds)
         for ivar in range(1,n_vars+1):
-            ds_read_temp = ds.isel(it=[ivar-1])
-            ds_read_temp.coords['it'] = [1]
+            ds_read_temp = requests[ivar-1]
             ds_read_temp.to_netcdf(filename_single, mode = 'w')
             ds_read_temp.close()
             ship = mariPower.ship.CBT()
@@ -386,7 +405,7 @@ class Tanker(Boat):
             mariPower.__main__.PredictPowerOrSpeedRoute(ship, filename_single, self.environment_path, None, False, False)
             form.print_current_time('time for mariPower request:', start_time)
 
-            ds_temp = xr.load_dataset(filename_single)
+            ds_temp = xr.load_dataset(filename_single).reindex(lat=ds['lat'])
             ds_temp.coords['it'] = [ivar]
             if ivar == 1:
                 ds_merged = ds_temp.copy()
@@ -400,6 +419,25 @@ class Tanker(Boat):
         ds.close()
         return ds_merged
 
+    ##
+    # returns one dataset per course index 'it' of the 'courses netCDF' with one course per space point. Space points
+    # without a course for this index (NaN) are dropped, such that no NaN courses are sent to mariPower.
+    def get_single_course_requests(self, ds):
+        requests = []
+        for ivar in range(0, ds['it'].shape[0]):
+            ds_single = ds.isel(it=[ivar])
+            ds_single = ds_single.isel(lat=np.flatnonzero(~np.isnan(ds_single['courses'].to_numpy()[:, 0])))
+            ds_single.coords['it'] = [1]
+            requests.append(ds_single)
+        return requests
+
+    ##
+    # returns the indices of the requested courses in the flattened (lat, it) arrays of the 'courses netCDF'
+    def get_netCDF_indices(self, lats):
+        lats_sorted, ilat = np.unique(lats, return_inverse=True)
+        it = pd.Series(lats).groupby(lats, sort=False).cumcount().to_numpy()
+        return ilat * (it.max() + 1) + it
+
     ##
     # main function for communication with mariPower package (see documentation above)
     def get_fuel_per_time_netCDF(self, courses, lats, lons, time, wind):
@@ -409,6 +447,10 @@ class Tanker(Boat):
         ship_params = self.extract_params_from_netCDF(ds)
         ds.close()
 
+        idxs = self.get_netCDF_indices(lats)
+        ship_params = ShipParams(fuel=ship_params.get_fuel()[idxs], power=ship_params.get_power()[idxs],
+                                 rpm=ship_params.get_rpm()[idxs], speed=ship_params.get_speed()[idxs])
+
         return ship_params
 
     ##
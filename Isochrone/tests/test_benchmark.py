@@ -0,0 +1,56 @@
+import datetime
+import json
+
+import numpy as np
+
+from benchmarks.routing_benchmark import RoutingBenchmark, compare_results, get_benchmark_matrix
+from benchmarks.synthetic import AnalyticTanker, get_synthetic_env_dataset
+
+##
+# test whether the synthetic dataset spans the map and the forecast time range in the format of WeatherCondCMEMS
+def test_synthetic_env_dataset():
+    start_time = datetime.datetime(2023, 2, 10, 12)
+    ds = get_synthetic_env_dataset(54, 13, 56, 16, start_time, 12, 0.5)
+
+    assert np.allclose(ds['latitude'].to_numpy(), [54, 54.5, 55, 55.5, 56])
+    assert ds['longitude'].shape[0] == 7
+    assert ds['time'].to_numpy()[0] == np.datetime64('2023-02-10T09:00')
+    assert ds['time'].to_numpy()[-1] == np.datetime64('2023-02-11T03:00')
+    assert ds['u-component_of_wind_height_above_ground'].dims == ('time', 'height_above_ground2', 'latitude',
+                                                                 'longitude')
+    assert (ds['depth'].to_numpy() < 0).all()
+    ds_repeat = get_synthetic_env_dataset(54, 13, 56, 16, start_time, 12, 0.5)
+    assert ds.identical(ds_repeat)
+
+##
+# test whether the analytic power model consumes more fuel for head wind than for following wind
+def test_analytic_tanker():
+    boat = AnalyticTanker(-99)
+    boat.set_boat_speed(7.7)
+    wind = {'tws': np.array([10., 10., 0.]), 'twa': np.array([0., 180., 0.])}
+    ship_params = boat.get_fuel_per_time_netCDF(np.array([0., 0., 0.]), np.array([55., 55., 55.]),
+                                                np.array([14., 14., 14.]), None, wind)
+
+    fuel = ship_params.get_fuel()
+    assert fuel[0] > fuel[1]
+    assert np.isclose(fuel[1], fuel[2])
+    assert np.isclose(fuel[2], boat.fuel_rate_calm)
+
+##
+# test whether a small benchmark arrives at the destination and whether a slow-down is reported as regression
+def test_routing_benchmark(tmp_path):
+    cases = get_benchmark_matrix([10], [20], [20], ['land'])
+    benchmark = RoutingBenchmark(cases, tmp_path / 'EnvCache', 0.2, 1)
+    results = benchmark.run()
+
+    assert len(results) == 1
+    assert results[0]['arrived']
+    assert results[0]['time_min'] > 0
+
+    benchmark.write_results(results, tmp_path / 'reference.json')
+    results[0]['time_min'] = results[0]['time_min'] * 2
+    benchmark.write_results(results, tmp_path / 'results.json')
+    assert compare_results(tmp_path / 'reference.json', tmp_path / 'reference.json') == []
+    regressions = compare_results(tmp_path / 'reference.json', tmp_path / 'results.json')
+    assert len(regressions) == 1
+    assert not regressions[0]['route_changed']
@@ -303,3 +303,130 @@ def test_safe_crossing_shape_return():
     is_constrained = constraint_list.safe_crossing(lat[1,:], lat[0,:], lon[1,:], lon[0,:] , time, is_constrained)
 
     assert is_constrained.shape[0] == lat.shape[1]
+
+class CountingConstraint(NegativeContraint):
+    def __init__(self, lat_max):
+        NegativeContraint.__init__(self, 'CountingConstraint')
+        self.lat_max = lat_max
+        self.npoints = []
+
+    def constraint_on_point(self, lat, lon, time):
+        self.npoints.append(lat.shape[0])
+        return lat > self.lat_max
+
+'''
+    test whether every constraint is checked once for the sample points of all variants, whether variants that are
+    already constrained are skipped and whether the samples are spaced by ConstraintPars.sample_dist
+'''
+def test_safe_crossing_samples():
+    lat_start = np.array([54., 54., 54.])
+    lon_start = np.array([13., 13., 13.])
+    lat_end = np.array([54.5, 55., 54.1])
+    lon_end = np.array([13., 13., 13.])
+
+    first = CountingConstraint(54.8)
+    second = CountingConstraint(90)
+    constraint_list = generate_dummy_constraint_list()
+    constraint_list.add_neg_constraint(first)
+    constraint_list.add_neg_constraint(second)
+    is_constrained = constraint_list.safe_crossing(lat_start, lat_end, lon_start, lon_end, 0, [False, False, False])
+    assert np.array_equal(is_constrained, [False, True, False])
+    assert first.npoints == [30]
+    assert second.npoints == [20]
+
+    # about 111km for the second way, 11km for the third way
+    constraint_list.pars.sample_dist = 5000
+    first.npoints = []
+    is_constrained = constraint_list.safe_crossing(lat_start, lat_end, lon_start, lon_end, 0, [False, False, True])
+    assert np.array_equal(is_constrained, [False, True, True])
+    assert first.npoints == [23 * 2]
+
+    fractions = constraint_list.get_sample_fractions(np.array([111000., 11000.]))
+    assert fractions.shape == (23, 2)
+    assert np.allclose(fractions[:, 0], np.arange(1, 24) / 23)
+    assert np.allclose(fractions[:3, 1], [1 / 3, 2 / 3, 1]) and np.all(fractions[3:, 1] == 1)
+
+def get_synthetic_weather_with_waves(tmp_path):
+    from benchmarks.synthetic import get_synthetic_env_dataset
+    from utils.envcache import write_env_cache
+
+    start_time = datetime.datetime(2023, 2, 10, 12)
+    ds = get_synthetic_env_dataset(54, 13, 56, 16, start_time, 12, 0.5)
+    # waves grow eastwards and with time: 1m at 13°E, 4m at 16°E plus 0.1m per hour
+    hours = (ds['time'] - ds['time'][0]) / np.timedelta64(1, 'h')
+    ds['VHM0'] = 1 + (ds['longitude'] - 13) + 0.1 * hours + 0 * ds['latitude']
+    ds['VHM0'] = ds['VHM0'].transpose('time', 'latitude', 'longitude')
+    write_env_cache(ds, tmp_path / 'EnvCache')
+
+    wt = WeatherCondCMEMS(tmp_path / 'EnvCache', start_time, start_time, 12, 3)
+    wt.set_map_size(54, 13, 56, 16)
+    wt.init_wind_functions()
+    return wt, ds
+
+'''
+    test whether the wave height is looked up at the closest forecast step and grid node, whether the exceedance
+    rasters are read once per forecast step and whether points beyond the grid are not constrained
+'''
+def test_wave_height_from_weather(tmp_path):
+    wt, ds = get_synthetic_weather_with_waves(tmp_path)
+    wave_height = WaveHeight(wt)
+    wave_height.set_max_wave_height(3.5)
+
+    lats = np.array([55., 55., 55., 55., 55.])
+    lons = np.array([14.1, 15.2, 15.6, 14.9, 20.])
+    times = np.array([datetime.datetime(2023, 2, 10, 12), datetime.datetime(2023, 2, 10, 12),
+                      datetime.datetime(2023, 2, 10, 12), datetime.datetime(2023, 2, 10, 16, 40),
+                      datetime.datetime(2023, 2, 10, 12)])
+
+    wave_height.check_weather(lats, lons, times)
+    # closest grid nodes at 14°E, 15°E, 15.5°E and 15°E; 3h after the start of the dataset at 12:00, 9h at 16:40
+    # (closest forecast step at 18:00)
+    assert np.allclose(wave_height.current_wave_height[:4], [2.3, 3.3, 3.8, 3.9], atol=1e-5)
+    assert np.isnan(wave_height.current_wave_height[4])
+    assert np.array_equal(wave_height.constraint_on_point(lats, lons, times), [False, False, True, True, False])
+    assert list(wave_height.exceedance.keys()) == [0, 2]
+
+    wave_height.set_max_wave_height(10)
+    assert not np.any(wave_height.constraint_on_point(lats, lons, times))
+
+    wt.ds = wt.ds.drop_vars('VHM0')
+    with pytest.raises(ValueError, match='VHM0'):
+        WaveHeight(wt)
+
+'''
+    test whether the wind speed exceeds the limit at the same grid nodes as the wind speed of the weather data
+'''
+def test_wind_speed_from_weather(tmp_path):
+    wt, ds = get_synthetic_weather_with_waves(tmp_path)
+    wind_speed = WindSpeed(wt)
+    wind_speed.set_max_wind_speed(8)
+
+    time = datetime.datetime(2023, 2, 10, 15)
+    lats, lons = np.meshgrid(ds['latitude'].to_numpy(), ds['longitude'].to_numpy(), indexing='ij')
+    u = ds['u-component_of_wind_height_above_ground'].sel(time=time, height_above_ground2=10).to_numpy()
+    v = ds['v-component_of_wind_height_above_ground'].sel(time=time, height_above_ground2=10).to_numpy()
+    twa, tws = wt.get_twatws_from_uv(u, v)
+
+    is_constrained = wind_speed.constraint_on_point(lats.flatten(), lons.flatten(), time)
+    assert np.array_equal(is_constrained, tws.flatten() > 8)
+    assert np.any(is_constrained) and not np.all(is_constrained)
+
+'''
+    test whether the wave height of the variants is checked along their ways at the times of the variants
+'''
+def test_safe_crossing_wave_height_from_weather(tmp_path):
+    wt, ds = get_synthetic_weather_with_waves(tmp_path)
+    wave_height = WaveHeight(wt)
+    wave_height.set_max_wave_height(3.5)
+    constraint_list = generate_dummy_constraint_list()
+    constraint_list.add_neg_constraint(wave_height)
+
+    lat_start = np.array([55., 55., 55.])
+    lon_start = np.array([14., 14., 14.])
+    lat_end = np.array([55.5, 55., 55.])
+    lon_end = np.array([14., 15.6, 14.9])
+    times = np.array([datetime.datetime(2023, 2, 10, 12), datetime.datetime(2023, 2, 10, 12),
+                      datetime.datetime(2023, 2, 10, 18)])
+    is_constrained = constraint_list.safe_crossing(lat_start, lat_end, lon_start, lon_end, times,
+                                                   [False, False, False])
+    assert np.array_equal(is_constrained, [False, True, True])
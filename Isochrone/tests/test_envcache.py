@@ -0,0 +1,111 @@
+import datetime
+import os
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from benchmarks.synthetic import get_synthetic_env_dataset
+from utils.envcache import get_env_dataset, is_env_cache, load_env_cache, write_env_cache
+from weather import WeatherCondCMEMS
+
+def get_dummy_env_dataset():
+    time = np.array([np.datetime64('2023-02-10T12:00'), np.datetime64('2023-02-10T15:00')])
+    lat = np.array([54., 55., 56.])
+    lon = np.array([13., 14.])
+    u = np.arange(12.).reshape(2, 3, 2)
+    depth = np.array([[-10., -20.], [-30., -40.], [-50., -60.]])
+
+    data_vars = dict(
+        u=(["time", "latitude", "longitude"], u),
+        depth=(["latitude", "longitude"], depth),
+    )
+    coords = dict(
+        time=(["time"], time),
+        latitude=(["latitude"], lat),
+        longitude=(["longitude"], lon),
+    )
+    return xr.Dataset(data_vars, coords)
+
+'''
+    test whether the environment cache returns the dataset that has been written to it and whether the data variables
+    are opened memory-mapped and read-only
+'''
+def test_env_cache_round_trip(tmp_path):
+    ds = get_dummy_env_dataset()
+    cache_path = os.path.join(tmp_path, 'EnvCache')
+
+    assert not is_env_cache(cache_path)
+    write_env_cache(ds, cache_path)
+    assert is_env_cache(cache_path)
+
+    ds_read = load_env_cache(cache_path)
+    xr.testing.assert_identical(ds, ds_read)
+    assert not ds_read['u'].values.flags.writeable
+
+    depth = ds_read['depth'].interp(latitude=xr.DataArray([54.5], dims="dummy"),
+                                    longitude=xr.DataArray([13.5], dims="dummy"), method='linear')
+    assert np.allclose(depth.to_numpy(), [-25.])
+
+def test_env_cache_object_fail(tmp_path):
+    ds = get_dummy_env_dataset()
+    ds['name'] = (["latitude"], np.array(['a', 'b', 'c'], dtype=object))
+
+    with pytest.raises(ValueError):
+        write_env_cache(ds, os.path.join(tmp_path, 'EnvCache'))
+
+def get_dummy_etopo_dataset():
+    lat = np.linspace(50, 60, 101)
+    lon = np.linspace(10, 20, 201)
+    z = -20 * np.ones((101, 201)) * (lon[np.newaxis, :] - 13.5)
+    return xr.Dataset({'z': (['lat', 'lon'], z)}, {'lat': lat, 'lon': lon})
+
+def get_dummy_waves_dataset():
+    time = np.array([np.datetime64('2023-02-10T00:00') + np.timedelta64(h, 'h') for h in range(0, 48)])
+    lat = np.linspace(52, 58, 61)
+    lon = np.linspace(11, 19, 81)
+    vhm0 = np.ones((48, 61, 81)) * np.arange(48)[:, np.newaxis, np.newaxis] / 10
+    return xr.Dataset({'VHM0': (['time', 'latitude', 'longitude'], vhm0)},
+                      {'time': time, 'latitude': lat, 'longitude': lon})
+
+##
+# test whether the preprocessing crops weather, waves and depth to the map and the time range, regrids them onto a
+# common grid and whether the routing can read the cache that is written from them
+def test_env_dataset_preprocessing(tmp_path):
+    start_time = datetime.datetime(2023, 2, 10, 12)
+    ds_weather = get_synthetic_env_dataset(53, 12, 57, 18, start_time, 24, 0.5).drop_vars('depth')
+
+    ds = get_env_dataset(ds_weather, get_dummy_etopo_dataset(), 54, 13, 56, 16, datetime.datetime(2023, 2, 10, 9),
+                         datetime.datetime(2023, 2, 10, 21), 0.25, get_dummy_waves_dataset())
+
+    assert np.allclose(ds['latitude'].to_numpy(), np.linspace(54, 56, 9))
+    assert np.allclose(ds['longitude'].to_numpy(), np.linspace(13, 16, 13))
+    assert ds['time'].to_numpy()[0] == np.datetime64('2023-02-10T09:00')
+    assert ds['time'].to_numpy()[-1] == np.datetime64('2023-02-10T21:00')
+    for var in ['u-component_of_wind_height_above_ground', 'twa', 'tws', 'VHM0', 'depth']:
+        assert var in ds.data_vars
+
+    u = ds['u-component_of_wind_height_above_ground'].sel(height_above_ground2=10)
+    v = ds['v-component_of_wind_height_above_ground'].sel(height_above_ground2=10)
+    assert np.allclose(ds['tws'], np.sqrt(u ** 2 + v ** 2))
+    assert np.allclose(ds['VHM0'].sel(time='2023-02-10T12:00'), 1.2)
+    assert np.allclose(ds['depth'].sel(longitude=14.5), -20)
+    assert (ds['depth'].sel(longitude=13) == 0).all()
+
+    write_env_cache(ds, tmp_path / 'EnvCache')
+    ds_read = load_env_cache(tmp_path / 'EnvCache')
+    assert ds_read.attrs['map'] == [54, 13, 56, 16]
+    assert not ds_read['VHM0'].values.flags.writeable
+
+    wt = WeatherCondCMEMS(tmp_path / 'EnvCache', start_time, start_time, 6, 3)
+    wt.set_map_size(54, 13, 56, 16)
+    wt.init_wind_functions()
+    wind = wt.get_wind_function((np.array([55.]), np.array([14.])), start_time)
+    assert np.allclose(wind['tws'], ds['tws'].sel(time='2023-02-10T12:00', latitude=55., longitude=14.))
+
+def test_env_dataset_preprocessing_fail():
+    start_time = datetime.datetime(2023, 2, 10, 12)
+    ds_weather = get_synthetic_env_dataset(53, 12, 57, 18, start_time, 24, 0.5).drop_vars('depth')
+
+    with pytest.raises(ValueError):
+        get_env_dataset(ds_weather, get_dummy_etopo_dataset(), 54, 13, 58, 16, start_time, start_time, 0.25)
@@ -0,0 +1,75 @@
+from geovectorslib import geod
+import numpy as np
+import pytest
+
+import utils.geodesic as geodesic
+
+##
+# random geodesics between 1km and 5000km whose end points are outside the polar regions
+def get_random_geodesics(n=2000):
+    rng = np.random.default_rng(42)
+    lats1 = rng.uniform(-80, 80, n)
+    lons1 = rng.uniform(-180, 180, n)
+    azis = rng.uniform(0, 360, n)
+    dists = 10 ** rng.uniform(3, np.log10(5e6), n)
+    is_outside_polar = np.abs(geod.direct(lats1, lons1, azis, dists)['lat2']) < 80
+    return lats1[is_outside_polar], lons1[is_outside_polar], azis[is_outside_polar], dists[is_outside_polar]
+
+def get_azimuth_diff(azi1, azi2):
+    return np.abs((azi1 - azi2 + 180) % 360 - 180)
+
+##
+# test whether the fast modes deviate from the solution of Vincenty by less than the error bounds documented in
+# utils/geodesic.py
+@pytest.mark.parametrize("mode,dist_rel,azi_deg,pos_rel", [('andoyer', 2e-5, 1e-3, 1e-5),
+                                                            ('spherical', 6e-3, 0.6, 6e-3)])
+def test_geodesic_error_bounds(mode, dist_rel, azi_deg, pos_rel):
+    lats1, lons1, azis, dists = get_random_geodesics()
+    ref_direct = geod.direct(lats1, lons1, azis, dists)
+    ref_inverse = geod.inverse(lats1, lons1, ref_direct['lat2'], ref_direct['lon2'])
+
+    inv = geodesic.inverse(lats1, lons1, ref_direct['lat2'], ref_direct['lon2'], mode)
+    assert np.all(np.abs(inv['s12'] / ref_inverse['s12'] - 1) < dist_rel)
+    assert np.all(get_azimuth_diff(inv['azi1'], ref_inverse['azi1']) < azi_deg)
+    assert np.all(get_azimuth_diff(inv['azi2'], ref_inverse['azi2']) < azi_deg)
+
+    move = geodesic.direct(lats1, lons1, azis, dists, mode)
+    pos_error = geod.inverse(ref_direct['lat2'], ref_direct['lon2'], move['lat2'], move['lon2'])['s12']
+    assert np.all(pos_error / dists < pos_rel)
+    assert np.all(get_azimuth_diff(move['azi2'], ref_direct['azi2']) < azi_deg)
+    assert np.all((move['lon2'] >= -180) & (move['lon2'] < 180))
+
+##
+# test whether coincident points return zero distance and whether an unknown mode is refused
+def test_geodesic_coincident_points_and_mode():
+    for mode in geodesic.MODES:
+        inv = geodesic.inverse(np.array([54.]), np.array([13.]), np.array([54.]), np.array([13.]), mode)
+        assert inv['s12'][0] == 0
+        assert inv['azi1'][0] == 0
+
+    with pytest.raises(ValueError):
+        geodesic.inverse(np.array([54.]), np.array([13.]), np.array([55.]), np.array([13.]), 'haversine')
+
+##
+# test whether the intermediate points lie on the great circle at the requested fractions of the distance
+def test_intermediate_points():
+    lats1 = np.array([54., 10., 54.])
+    lons1 = np.array([13., 179., 13.])
+    lats2 = np.array([58., -5., 54.])
+    lons2 = np.array([17., -170., 13.])
+    fractions = np.array([[0.], [0.25], [0.5], [1.]])
+
+    lats, lons = geodesic.get_intermediate_points(lats1, lons1, lats2, lons2, fractions)
+    assert lats.shape == (4, 3)
+    assert np.array_equal(lats[0], lats1) and np.array_equal(lons[0], lons1)
+    assert np.array_equal(lats[-1], lats2) and np.array_equal(lons[-1], lons2)
+    assert np.allclose(lats[:, 2], 54.) and np.allclose(lons[:, 2], 13.)
+
+    dist = geodesic.inverse(lats1[:2], lons1[:2], lats2[:2], lons2[:2], 'spherical')['s12']
+    for ifrac in [1, 2]:
+        dist_part = geodesic.inverse(lats1[:2], lons1[:2], lats[ifrac, :2], lons[ifrac, :2], 'spherical')['s12']
+        dist_rest = geodesic.inverse(lats[ifrac, :2], lons[ifrac, :2], lats2[:2], lons2[:2], 'spherical')['s12']
+        assert np.allclose(dist_part, fractions[ifrac, 0] * dist)
+        assert np.allclose(dist_part + dist_rest, dist)
+    # longitudes are continued across the date line
+    assert 180 < lons[1, 1] < 190
@@ -0,0 +1,214 @@
+import datetime
+
+import numpy as np
+import pytest
+from global_land_mask import globe
+
+from benchmarks.synthetic import get_synthetic_env_dataset
+import utils.geodesic as geodesic
+from constraints.constraints import ConstraintPars, ConstraintsList, LandCrossing, WaterDepth
+from constraints.navigability import HazardDistanceField, Navigability, NavigabilityQuadtree, NavigabilityRaster, \
+    QuadtreeCrossing, RasterGrid, get_box_intersection, get_navigability_raster
+from utils.envcache import write_env_cache
+from weather import WeatherCondCMEMS
+
+def get_synthetic_weather(tmp_path):
+    start_time = datetime.datetime(2023, 2, 10, 12)
+    ds = get_synthetic_env_dataset(54, 12, 56, 16, start_time, 12, 0.1)
+    write_env_cache(ds, tmp_path / 'EnvCache')
+
+    wt = WeatherCondCMEMS(tmp_path / 'EnvCache', start_time, start_time, 12, 3)
+    wt.set_map_size(54, 12, 56, 16)
+    return wt
+
+##
+# test the assignment of points to the grid nodes and the bilinear interpolation by index arithmetic
+def test_raster_grid_lookup():
+    grid = RasterGrid(54, 12, 56, 16, 0.5)
+    assert grid.get_shape() == (5, 9)
+
+    ilat, ilon, is_inside = grid.get_nearest_indices(np.array([54.2, 54.3, 56.2, 53.7]), np.array([12., 15.8, 16., 12.]))
+    assert np.array_equal(ilat, [0, 1, 4, 0])
+    assert np.array_equal(ilon, [0, 8, 8, 0])
+    assert np.array_equal(is_inside, [True, True, True, False])
+
+    values = grid.lats[:, np.newaxis] + 2 * grid.lons[np.newaxis, :]
+    lats = np.array([54.1, 55.33, 56., 57.])
+    lons = np.array([12.2, 15.9, 16., 14.])
+    interpolated, is_inside = grid.get_bilinear(values, lats, lons)
+    assert np.allclose(interpolated[:3], lats[:3] + 2 * lons[:3])
+    assert np.array_equal(is_inside, [True, True, True, False])
+
+    with pytest.raises(ValueError):
+        RasterGrid(54, 12, 56, 16, 0)
+
+##
+# test whether the raster agrees with LandCrossing and WaterDepth at the grid nodes and whether points beyond the
+# raster are constrained
+def test_navigability_raster(tmp_path):
+    wt = get_synthetic_weather(tmp_path)
+    raster = get_navigability_raster(wt, 10)
+    assert raster.mask.dtype == np.uint8
+    assert raster.get_shape() == (21, 41)
+    assert 0 < np.mean(raster.mask) < 1
+
+    lat_grid, lon_grid = np.meshgrid(raster.lats, raster.lons, indexing='ij')
+    lats = lat_grid.ravel()
+    lons = lon_grid.ravel()
+    water_depth = WaterDepth(wt)
+    water_depth.set_drought(10)
+    is_constrained = LandCrossing().constraint_on_point(lats, lons, 0) | water_depth.constraint_on_point(lats, lons, 0)
+
+    navigability = Navigability(raster)
+    assert np.array_equal(navigability.constraint_on_point(lats, lons, 0), is_constrained)
+    assert np.array_equal(Navigability(raster, 'bilinear').constraint_on_point(lats, lons, 0), is_constrained)
+    assert navigability.constraint_on_point(np.array([53.5]), np.array([14.]), 0)[0]
+
+    with pytest.raises(ValueError):
+        raster.is_navigable(lats, lons, 'cubic')
+
+##
+# test whether the raster can replace LandCrossing and WaterDepth in ConstraintsList.safe_crossing
+def test_navigability_safe_crossing(tmp_path):
+    wt = get_synthetic_weather(tmp_path)
+    raster = NavigabilityRaster(54, 12, 56, 16, 0.05, 10)
+    raster.build_from_weather(wt)
+
+    # from the Arkona basin across Rügen and to the east along 55.5°N, north of Bornholm
+    lat_start = np.array([54.8, 55.5])
+    lon_start = np.array([13.2, 14.5])
+    lat_end = np.array([54.3, 55.5])
+    lon_end = np.array([13.4, 15.5])
+
+    constraint_list = ConstraintsList(ConstraintPars())
+    constraint_list.add_neg_constraint(Navigability(raster))
+    is_constrained = constraint_list.safe_crossing(lat_start, lat_end, lon_start, lon_end, 0, [False, False])
+    assert np.array_equal(is_constrained, [True, False])
+    assert globe.is_land(54.45, 13.35)
+
+def get_island_raster():
+    raster = NavigabilityRaster(54, 12, 56, 16, 0.05, 10)
+    raster.mask[:] = 1
+    # island from 54.9°N to 55.1°N and 13.9°E to 14.1°E
+    raster.mask[18:23, 38:43] = 0
+    return raster
+
+##
+# test the signed distance of the grid nodes to the closest hazard and the clearance of points
+def test_hazard_distance_field():
+    raster = get_island_raster()
+    field = HazardDistanceField(raster)
+    assert field.distance.shape == raster.get_shape()
+    assert field.distance.dtype == np.float32
+    assert np.all(field.distance[raster.mask == 0] < 0)
+    assert np.all(field.distance[raster.mask == 1] > 0)
+
+    # distance in latitude from 55.5°N to the island and to the edge of the map
+    spacing_lat = np.radians(0.05) * 6371008.8
+    assert np.isclose(field.distance[30, 40], 8 * spacing_lat)
+    assert np.isclose(field.distance[0, 0], min(spacing_lat, field.min_spacing))
+    assert np.isclose(field.get_clearance(np.array([55.5]), np.array([14.]))[0], 8 * spacing_lat - 1.5 * field.cell_diagonal)
+    assert field.get_clearance(np.array([53.]), np.array([14.]))[0] == -np.inf
+
+##
+# test whether ways in open water are accepted from the clearance at their end points, whether ways across or along
+# the hazards are divided and whether the result agrees with the check at dense sample points (up to ways that touch
+# the corner of a hazard between two checked points)
+def test_navigability_distance_crossing(monkeypatch):
+    raster = get_island_raster()
+    navigability = Navigability(raster, distance_field=HazardDistanceField(raster))
+
+    npoints = []
+    is_navigable = raster.is_navigable
+    def count_navigable(lats, lons, method='nearest'):
+        npoints.append(np.size(lats))
+        return is_navigable(lats, lons, method)
+    monkeypatch.setattr(raster, 'is_navigable', count_navigable)
+
+    # open water, across the island, passing the island closely in the north
+    lat_start = np.array([55.5, 54.7, 55.16])
+    lon_start = np.array([13., 14., 13.5])
+    lat_end = np.array([55.6, 55.3, 55.16])
+    lon_end = np.array([13.3, 14., 14.5])
+    is_constrained = navigability.constraint_on_crossing(lat_start, lat_end, lon_start, lon_end, 0)
+    assert np.array_equal(is_constrained, [False, True, False])
+
+    npoints = []
+    navigability.constraint_on_crossing(lat_start[:1], lat_end[:1], lon_start[:1], lon_end[:1], 0)
+    assert sum(npoints) == 2
+
+    monkeypatch.setattr(raster, 'is_navigable', is_navigable)
+    rng = np.random.default_rng(5)
+    lat_start = rng.uniform(54.5, 55.5, 200)
+    lon_start = rng.uniform(13., 15., 200)
+    azimuth = rng.uniform(0, 360, 200)
+    dist = rng.uniform(1000, 60000, 200)
+    end = geodesic.direct(lat_start, lon_start, azimuth, dist, 'spherical')
+
+    constraint_list = ConstraintsList(ConstraintPars())
+    constraint_list.pars.sample_dist = 200
+    constraint_list.add_neg_constraint(Navigability(raster))
+    is_constrained_samples = constraint_list.safe_crossing(lat_start, end['lat2'], lon_start, end['lon2'], 0,
+                                                           np.zeros(200, dtype=bool))
+    is_constrained = navigability.constraint_on_crossing(lat_start, end['lat2'], lon_start, end['lon2'], 0)
+    assert is_constrained_samples.sum() > 10
+    assert np.mean(is_constrained != is_constrained_samples) < 0.02
+
+##
+# test the intersection of segments with boxes
+def test_box_intersection():
+    x0 = np.array([0., 0., 0., 2.5, 3.])
+    y0 = np.array([0., 0., 3., 0., 0.])
+    x1 = np.array([3., 1., 3., 2.5, 3.])
+    y1 = np.array([3., 0.9, 0., 3., 0.5])
+    is_hit = get_box_intersection(x0, y0, x1, y1, 1.5, 2.5, 1.5, 2.5)
+    assert np.array_equal(is_hit, [True, False, True, True, False])
+
+##
+# test the states of the quadtree nodes and the combination of several rasters
+def test_navigability_quadtree():
+    raster = get_island_raster()
+    shallow = NavigabilityRaster(54, 12, 56, 16, 0.05, 15)
+    shallow.mask[:] = 1
+    shallow.mask[0, 0] = 0
+    quadtree = NavigabilityQuadtree([raster, shallow])
+    assert quadtree.draught == 15
+    assert len(quadtree.levels) == 8
+    assert quadtree.levels[0].shape == (128, 128)
+    assert quadtree.levels[-1].shape == (1, 1)
+    assert quadtree.levels[-1][0, 0] == 2
+    assert quadtree.levels[0][0, 0] == 0
+    # 16x16 cells of open water, of padding and a mixed node that contains the island
+    assert quadtree.levels[4][1, 1] == 1
+    assert quadtree.levels[4][3, 7] == 0
+    assert quadtree.levels[4][1, 2] == 2
+
+    with pytest.raises(ValueError):
+        NavigabilityQuadtree([raster, NavigabilityRaster(54, 12, 56, 16, 0.1, 10)])
+
+##
+# test whether the quadtree finds all ways that cross a blocked grid cell, compared to the check at dense sample points
+def test_quadtree_crossing():
+    raster = get_island_raster()
+    quadtree_crossing = QuadtreeCrossing(NavigabilityQuadtree([raster]))
+
+    lat_start = np.array([55.5, 54.7, 55.16, 55.5])
+    lon_start = np.array([13., 14., 13.5, 15.9])
+    lat_end = np.array([55.6, 55.3, 55.16, 55.5])
+    lon_end = np.array([13.3, 14., 14.5, 16.1])
+    is_constrained = quadtree_crossing.constraint_on_crossing(lat_start, lat_end, lon_start, lon_end, 0)
+    assert np.array_equal(is_constrained, [False, True, False, True])
+
+    rng = np.random.default_rng(5)
+    lat_start = rng.uniform(54.5, 55.5, 200)
+    lon_start = rng.uniform(13., 15., 200)
+    end = geodesic.direct(lat_start, lon_start, rng.uniform(0, 360, 200), rng.uniform(1000, 60000, 200), 'spherical')
+
+    constraint_list = ConstraintsList(ConstraintPars())
+    constraint_list.pars.sample_dist = 50
+    constraint_list.add_neg_constraint(Navigability(raster))
+    is_constrained_samples = constraint_list.safe_crossing(lat_start, end['lat2'], lon_start, end['lon2'], 0,
+                                                           np.zeros(200, dtype=bool))
+    is_constrained = quadtree_crossing.constraint_on_crossing(lat_start, end['lat2'], lon_start, end['lon2'], 0)
+    assert is_constrained_samples.sum() > 10
+    assert np.array_equal(is_constrained, is_constrained_samples)
@@ -0,0 +1,44 @@
+import json
+
+import numpy as np
+
+from utils.profiling import Profiler
+
+##
+# test whether the spans of a profiler are recorded, summarised and written as JSON and Chrome trace events
+def test_profiler_spans(tmp_path):
+    profiler = Profiler(trace_memory=True)
+    for step in range(0, 3):
+        with profiler.span('allocate', step, 10):
+            data = np.ones(100000)
+        with profiler.span('sum', step, 20):
+            np.sum(data)
+    profiler.stop()
+
+    assert len(profiler.spans) == 6
+    summary = profiler.get_summary()
+    assert list(summary.keys()) == ['allocate', 'sum']
+    assert summary['allocate']['calls'] == 3
+    assert summary['allocate']['nvariants'] == 10
+    assert summary['allocate']['bytes'] >= data.nbytes
+
+    profiler.write_json(tmp_path / 'profile.json')
+    with open(tmp_path / 'profile.json') as file:
+        profile = json.load(file)
+    assert len(profile['spans']) == 6
+    assert profile['summary']['sum']['calls'] == 3
+
+    profiler.write_chrome_trace(tmp_path / 'trace.json')
+    with open(tmp_path / 'trace.json') as file:
+        trace = json.load(file)
+    assert len(trace['traceEvents']) == 6
+    assert trace['traceEvents'][1]['ph'] == 'X'
+    assert trace['traceEvents'][1]['args']['step'] == 0
+
+##
+# test whether a disabled profiler does not record anything
+def test_profiler_disabled():
+    profiler = Profiler(False)
+    with profiler.span('sum', 0, 1):
+        np.sum(np.ones(10))
+    assert len(profiler.spans) == 0
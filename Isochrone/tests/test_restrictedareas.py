@@ -0,0 +1,97 @@
+import json
+
+import numpy as np
+import pytest
+import shapefile
+import shapely
+from shapely.geometry import Polygon, box
+
+from constraints.constraints import ConstraintPars, ConstraintsList
+from constraints.restrictedareas import RestrictedAreas, read_polygons
+
+def get_wind_farm():
+    return Polygon([(14., 55.), (14.2, 55.), (14.2, 55.2), (14., 55.2)])
+
+def write_geojson(path):
+    content = {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'properties': {'Name': 'wind farm'},
+             'geometry': get_wind_farm().__geo_interface__},
+            {'type': 'Feature', 'properties': {},
+             'geometry': {'type': 'MultiPolygon', 'coordinates': [box(15., 56., 15.1, 56.1).__geo_interface__['coordinates']]}}
+        ]
+    }
+    with open(path, 'w') as file:
+        json.dump(content, file)
+
+##
+# test whether polygons and their names are read from GeoJSON files and shapefiles and whether other geometries are
+# refused
+def test_read_polygons(tmp_path):
+    write_geojson(tmp_path / 'areas.geojson')
+    polygons, names = read_polygons(tmp_path / 'areas.geojson')
+    assert names == ['wind farm', '1']
+    assert polygons[0].equals(get_wind_farm())
+    assert polygons[1].geom_type == 'MultiPolygon'
+
+    with shapefile.Writer(str(tmp_path / 'areas'), shapeType=shapefile.POLYGON) as writer:
+        writer.field('name', 'C')
+        writer.poly([list(get_wind_farm().exterior.coords)])
+        writer.record('wind farm')
+    polygons, names = read_polygons(tmp_path / 'areas.shp')
+    assert names == ['wind farm']
+    assert polygons[0].equals(get_wind_farm())
+
+    with open(tmp_path / 'point.geojson', 'w') as file:
+        json.dump({'type': 'Point', 'coordinates': [14., 55.]}, file)
+    with pytest.raises(ValueError):
+        read_polygons(tmp_path / 'point.geojson')
+    with pytest.raises(ValueError):
+        read_polygons(tmp_path / 'areas.kml')
+
+##
+# test whether points and ways in restricted areas are constrained, also in ConstraintsList.safe_crossing
+def test_restricted_areas_crossing(tmp_path):
+    write_geojson(tmp_path / 'areas.geojson')
+    areas = RestrictedAreas.from_file(tmp_path / 'areas.geojson')
+
+    assert np.array_equal(areas.constraint_on_point(np.array([55.1, 55.1, 56.05]), np.array([14.1, 14.3, 15.05]), 0),
+                          [True, False, True])
+
+    # across the wind farm, passing it in the north, ending in the second area and in open water
+    lat_start = np.array([54.9, 55.3, 55.9, 54.])
+    lon_start = np.array([13.9, 13.9, 15.05, 13.])
+    lat_end = np.array([55.3, 55.3, 56.05, 54.5])
+    lon_end = np.array([14.3, 14.3, 15.05, 13.5])
+    is_constrained = areas.constraint_on_crossing(lat_start, lat_end, lon_start, lon_end, 0)
+    assert np.array_equal(is_constrained, [True, False, True, False])
+
+    constraint_list = ConstraintsList(ConstraintPars())
+    constraint_list.add_neg_constraint(areas)
+    is_constrained = constraint_list.safe_crossing(lat_start, lat_end, lon_start, lon_end, 0, [False, False, False, True])
+    assert np.array_equal(is_constrained, [True, False, True, True])
+
+##
+# test the bulk check of many ways against many polygons by comparison with the intersection of every pair
+def test_restricted_areas_many_polygons():
+    rng = np.random.default_rng(3)
+    lats = rng.uniform(54., 58., 2000)
+    lons = rng.uniform(12., 20., 2000)
+    polygons = [box(lon, lat, lon + 0.02, lat + 0.02) for lat, lon in zip(lats, lons)]
+    areas = RestrictedAreas(polygons, npoints_way=2)
+
+    lat_start = rng.uniform(54., 58., 300)
+    lon_start = rng.uniform(12., 20., 300)
+    lat_end = lat_start + rng.uniform(-0.3, 0.3, 300)
+    lon_end = lon_start + rng.uniform(-0.3, 0.3, 300)
+    is_constrained = areas.constraint_on_crossing(lat_start, lat_end, lon_start, lon_end, 0)
+
+    lines = shapely.linestrings(np.stack((np.stack((lon_start, lat_start), axis=-1),
+                                          np.stack((lon_end, lat_end), axis=-1)), axis=1))
+    expected = shapely.intersects(lines[:, np.newaxis], np.array(polygons)[np.newaxis, :]).any(axis=1)
+    assert 0 < np.sum(is_constrained) < 300
+    assert np.array_equal(is_constrained, expected)
+
+    with pytest.raises(ValueError):
+        RestrictedAreas(polygons, npoints_way=1)
@@ -3,6 +3,7 @@ import os
 
 from geovectorslib import geod
 import numpy as np
+import pandas as pd
 import pytest
 import xarray as xr
 
@@ -11,8 +12,17 @@ import utils.formatting as form
 from constraints.constraints import *
 from algorithms.isobased import IsoBased
 from algorithms.isofuel import IsoFuel
+from algorithms.isochronestore import IsochroneStore
+from algorithms.corridor import CoarseToFineRouting, RouteCorridor
+from algorithms.departuresweep import DepartureSweep
+from algorithms.pruning import ConvexFrontPruning, get_bin_argmax, get_convex_front_idxs, get_fuel_bound_idxs
+from algorithms.routingalg_factory import RoutingAlgFactory
+from algorithms.routingbatch import RoutingBatch
+from algorithms.variantscheduler import VariantScheduler
 from ship.ship import Tanker
 from ship.shipparams import ShipParams
+from utils.profiling import Profiler
+from routeparams import RouteParams
 
 def generate_dummy_constraint_list():
     pars = ConstraintPars()
@@ -159,6 +169,24 @@ def test_pruning_select_correct_idxs():
 
     #form.print_line()
     #ra.print_ra()
+
+'''
+    test whether the occupancy of the prune bins counts the bins with an unconstrained variant, also if several variants
+    per bin are kept without trimming
+'''
+def test_pruning_occupancy():
+    ra = create_dummy_IsoBased_object()
+    pruning_bins = np.array([10, 20, 40, 60, 80])
+    ra.current_variant = np.array([15, 16, 22, 23, 44, 45, 71, 72, 74])
+    ra.full_dist_traveled = np.array([1, 5, 0, 0, 7, 7, 10, 1, 10])
+
+    idxs, occupancy = ra.get_bin_pruning_idxs(True, pruning_bins)
+    assert np.array_equal(np.array([1, 4, 6]), idxs)
+    assert occupancy == 0.75
+
+    idxs, occupancy = ra.get_bin_pruning_idxs(False, pruning_bins)
+    assert len(idxs) == 7
+    assert occupancy == 0.75
 '''
     test shape and content of 'move' for known distance, start and end points
 '''
@@ -457,3 +485,502 @@ def test_update_ship_params():
 
 
 
+##
+# test whether IsochroneStore writes new routing steps in place and rebuilds the history per variant from the parent
+# indices after branching out and pruning
+def test_isochrone_store_history():
+    store = IsochroneStore({'lats': float}, 3, 2)
+    store.push('lats', 1.)
+    store.repeat_variants(3)
+    store.push('lats', np.array([2., 3., 4.]))
+    store.select_variants([0, 2])
+    store.push('lats', np.array([5., 6.]))
+
+    lats_test = np.array([
+        [5., 6.],
+        [2., 4.],
+        [1., 1.]
+    ])
+
+    assert np.array_equal(lats_test, store.get_history('lats'))
+    assert np.array_equal(np.array([1., 2., 5.]), store.get_route('lats'))
+    assert np.array_equal(np.array([0, 2]), store.parents[2, :2])
+    assert np.array_equal(np.array([5., 6.]), store.get_current('lats'))
+    assert store.max_rows == 3
+
+##
+# test whether the back-tracked entries are shared by the fields and rebuilt after the variants have changed
+def test_isochrone_store_ancestors():
+    store = IsochroneStore({'lats': float, 'lons': float}, 2, 2)
+    store.push('lats', np.array([1., 2.]))
+    store.push('lons', np.array([10., 20.]))
+    store.repeat_variants(2)
+    store.push('lats', np.array([3., 4., 5., 6.]))
+
+    ancestors = store.get_ancestors()
+    assert np.array_equal(np.array([[0, 0, 1, 1], [0, 1, 2, 3]]), ancestors)
+    assert np.array_equal(np.array([10., 10., 20., 20.]), store.get_current('lons'))
+    assert store.get_ancestors() is ancestors
+
+    store.select_variants([3, 0])
+    # the latest row is read without back-tracking the route tree, also for a field that lags behind by one row
+    assert np.array_equal(np.array([6., 3.]), store.get_current('lats'))
+    assert np.array_equal(np.array([20., 10.]), store.get_current('lons'))
+    assert store.ancestors is None
+    assert np.array_equal(np.array([[6., 3.], [2., 1.]]), store.get_history('lats'))
+    assert np.array_equal(np.array([[20., 10.]]), store.get_history('lons'))
+
+##
+# test whether restoring a snapshot truncates the route tree to the rows of the snapshot and the new rows branch out from
+# the variants of the snapshot
+def test_isochrone_store_snapshot():
+    store = IsochroneStore({'lats': float}, 3, 2)
+    store.push('lats', np.array([1., 2.]))
+    store.repeat_variants(2)
+    store.push('lats', np.array([3., 4., 5., 6.]))
+    store.select_variants([1, 2])
+    snapshot = store.get_snapshot()
+
+    store.repeat_variants(2)
+    store.push('lats', np.array([7., 8., 9., 10.]))
+    store.set_snapshot(snapshot)
+    assert store.top_row == 1
+    assert np.array_equal(np.array([[4., 5.], [1., 2.]]), store.get_history('lats'))
+
+    store.push('lats', np.array([11., 12.]))
+    assert np.array_equal(np.array([[11., 12.], [4., 5.], [1., 2.]]), store.get_history('lats'))
+
+    store.set_snapshot(snapshot)
+    with pytest.raises(ValueError):
+        store.set_snapshot({'top_row': 2, 'variant_idx': np.arange(2), 'nrows': {'lats': 3}})
+
+##
+# test whether the pruning kernel selects the maximum per bin even if the same value is the maximum of another bin, and
+# whether NaN and constrained variants are skipped
+def test_get_bin_argmax():
+    bins = np.array([10, 20, 40, 60, 80])
+    azimuth = np.array([15, 16, 22, 23, 44, 45, 71, 72, 74])
+    dist = np.array([7, 5, 6, np.nan, 0, 0, 7, 1, 7])
+
+    idxs_trim = get_bin_argmax(azimuth, dist, bins, True)
+    idxs_no_trim = get_bin_argmax(azimuth, dist, bins, False)
+
+    assert np.array_equal(np.array([0, 2, 6]), idxs_trim)
+    assert np.array_equal(np.array([0, 2, 4, 5, 6, 8]), idxs_no_trim)
+
+class DummyBoat():
+    speed = 10.
+    ncalls = 0
+    ncourses = 0
+
+    def boat_speed_function(self, wind):
+        return np.repeat(self.speed, wind['twa'].shape)
+
+    def get_fuel_per_time_netCDF(self, courses, lats, lons, time, wind):
+        self.ncalls += 1
+        self.ncourses += courses.shape[0]
+        fuel = 0.2 + 0.06 * np.cos(np.radians(courses) - 0.5) + 0.01 * (lats - 55)
+        return ShipParams(fuel=fuel, power=fuel * 1e6, rpm=np.full(fuel.shape, 2.), speed=np.full(fuel.shape, self.speed))
+
+class DummyWeather():
+    def get_wind_function(self, coordinate, time):
+        return {'twa': np.full(coordinate[0].shape, 45.), 'tws': np.full(coordinate[0].shape, 5.)}
+
+def create_dummy_IsoFuel_voyage(start, finish, departure, variant_segments=30, variant_increments_deg=6):
+    ra = IsoFuel(start, finish, departure, 1500, "")
+    ra.set_steps(6)
+    ra.set_pruning_settings(91, 20)
+    ra.set_variant_segments(variant_segments, variant_increments_deg)
+    ra.update_fig = lambda status: None
+    return ra
+
+##
+# test whether the batch routing returns the same routes as the routing of every voyage on its own while requesting the
+# power for all voyages at once
+def test_routing_batch_matches_single_routes():
+    voyages = [
+        ((54.87, 13.33), (58.28, 17.06), datetime.datetime(2023, 2, 10, 12)),
+        ((54.95, 13.5), (57.0, 19.0), datetime.datetime(2023, 2, 10, 18)),
+        ((55.2, 13.9), (55.3, 14.1), datetime.datetime(2023, 2, 11, 0))
+    ]
+    constraint_list = generate_dummy_constraint_list()
+
+    boat = DummyBoat()
+    batch = RoutingBatch([create_dummy_IsoFuel_voyage(*voyage) for voyage in voyages])
+    routes_batch = batch.recursive_routing(boat, DummyWeather(), constraint_list)
+    ncalls_batch = boat.ncalls
+
+    boat.ncalls = 0
+    for iroute in range(0, len(voyages)):
+        ra = create_dummy_IsoFuel_voyage(*voyages[iroute])
+        route = ra.recursive_routing(boat, DummyWeather(), constraint_list)
+
+        assert route.count == routes_batch[iroute].count
+        assert np.array_equal(route.lats_per_step, routes_batch[iroute].lats_per_step)
+        assert np.array_equal(route.lons_per_step, routes_batch[iroute].lons_per_step)
+        assert np.array_equal(route.ship_params_per_step.get_fuel(), routes_batch[iroute].ship_params_per_step.get_fuel())
+
+    assert ncalls_batch == 6
+    assert boat.ncalls > ncalls_batch
+
+def test_routing_batch_variant_segments_fail():
+    ra1 = create_dummy_IsoFuel_voyage((54.87, 13.33), (58.28, 17.06), datetime.datetime(2023, 2, 10, 12))
+    ra2 = create_dummy_IsoFuel_voyage((54.87, 13.33), (58.28, 17.06), datetime.datetime(2023, 2, 10, 12))
+    ra2.set_variant_segments(20, 6)
+
+    with pytest.raises(ValueError):
+        RoutingBatch([ra1, ra2])
+
+##
+# test distance of points to the polyline of a route corridor: points next to a segment, behind the end points and on
+# the polyline
+def test_route_corridor_distance():
+    route = RouteParams(count=2, start=(54., 13.), finish=(55., 14.), gcr=None, route_type='min_time_route', time=None,
+                        lats_per_step=np.array([54., 55., 55.]), lons_per_step=np.array([13., 13., 14.]),
+                        azimuths_per_step=None, dists_per_step=np.array([0., 111000., 64000.]), starttime_per_step=None,
+                        ship_params_per_step=None)
+    corridor = RouteCorridor(route, 20000)
+
+    lats = np.array([54.5, 53.9, 55.1, 55., 54.5])
+    lons = np.array([13.1, 13., 13.5, 13.5, 13.5])
+    dist = corridor.get_distance(lats, lons)
+    dist_test = np.array([6457, 11120, 11120, 0, 32286])
+
+    assert np.allclose(dist, dist_test, rtol=0.01, atol=1)
+    assert np.array_equal(corridor.contains(lats, lons), np.array([True, True, True, True, False]))
+    assert corridor.nominal_dist == 87500.
+
+##
+# test whether the fine pass of the coarse-to-fine routing stays in the corridor around the coarse route and requests
+# fewer courses from the power estimation than the fine routing without corridor
+def test_coarse_to_fine_routing():
+    voyage = ((54.87, 13.33), (55.6, 14.6), datetime.datetime(2023, 2, 10, 12))
+    constraint_list = generate_dummy_constraint_list()
+
+    boat = DummyBoat()
+    create_dummy_IsoFuel_voyage(*voyage).recursive_routing(boat, DummyWeather(), constraint_list)
+    ncourses_fine = boat.ncourses
+
+    boat.ncourses = 0
+    coarse = create_dummy_IsoFuel_voyage(*voyage, variant_segments=10, variant_increments_deg=12)
+    ra = CoarseToFineRouting(coarse, create_dummy_IsoFuel_voyage(*voyage), 10000)
+    route = ra.recursive_routing(boat, DummyWeather(), constraint_list)
+
+    corridor = RouteCorridor(ra.coarse_route, 10000)
+    assert corridor.get_distance(route.lats_per_step, route.lons_per_step).max() < 10000 + corridor.nominal_dist
+    assert route.lats_per_step[-1] == voyage[1][0]
+    assert boat.ncourses < ncourses_fine
+
+##
+# test whether the routing algorithm of execute_routing.py can be chosen by its name and whether the profiler is passed
+# to both passes of the coarse-to-fine routing
+def test_routing_alg_factory():
+    ra = RoutingAlgFactory().get_routing_alg('ISOFUEL_COARSE_TO_FINE')
+    assert isinstance(ra, CoarseToFineRouting)
+    profiler = Profiler(False)
+    ra.set_profiler(profiler)
+    assert (ra.coarse.profiler is profiler) and (ra.fine.profiler is profiler)
+
+    assert isinstance(RoutingAlgFactory().get_routing_alg(config.ROUTING_ALGORITHM), IsoFuel)
+    with pytest.raises(ValueError):
+        RoutingAlgFactory().get_routing_alg('ISOTIME')
+
+##
+# test whether the heading fan is narrowed in open water (high occupancy, stable spread), widened if many prune bins are
+# constrained and whether it always stays within the prune sector with an even number of segments
+def test_variant_scheduler():
+    scheduler = VariantScheduler(12, 90, 2, 6)
+    assert scheduler.init(30, 6, 91) == (30, 6)
+
+    assert scheduler.update(1., 100.) == (22, 6)
+    assert scheduler.update(0.9, 95.) == (16, 6)
+    assert scheduler.update(0.7, 70.) == (20, 5)
+    assert scheduler.update(0.3, 70.) == (26, 6)
+
+    for i in range(0, 5):
+        variant_segments, variant_increments_deg = scheduler.update(0., 100. * (i % 2 + 1))
+        assert (variant_segments % 2) == 0
+        assert variant_segments / 2 * variant_increments_deg < 91
+    assert variant_segments <= scheduler.get_max_variant_segments()
+
+##
+# test whether the routing with adaptive heading fan reaches the destination with fewer variants
+def test_routing_adaptive_variants():
+    voyage = ((54.87, 13.33), (55.6, 14.6), datetime.datetime(2023, 2, 10, 12))
+    constraint_list = generate_dummy_constraint_list()
+
+    boat = DummyBoat()
+    create_dummy_IsoFuel_voyage(*voyage).recursive_routing(boat, DummyWeather(), constraint_list)
+    ncourses_fixed = boat.ncourses
+
+    boat.ncourses = 0
+    ra = create_dummy_IsoFuel_voyage(*voyage)
+    ra.set_variant_scheduler(VariantScheduler(12, 90, 2, 6))
+    route = ra.recursive_routing(boat, DummyWeather(), constraint_list)
+
+    assert route.lats_per_step[-1] == voyage[1][0]
+    assert route.lons_per_step[-1] == voyage[1][1]
+    assert boat.ncourses < ncourses_fixed
+
+##
+# test whether the fuel-bound filter keeps all variants whose lower bound does not exceed the incumbent
+def test_get_fuel_bound_idxs():
+    fuel = np.array([100., 100., 100., 120., 90.])
+    dist_remaining = np.array([1000., 1500., 2000., 1100., 3000.])
+
+    # lower bounds: fuel + dist * 0.05 = [150, 175, 200, 175, 240]
+    idxs = get_fuel_bound_idxs(fuel, dist_remaining, 0.05, 175.)
+    assert np.array_equal(idxs, np.array([0, 1, 3]))
+
+    idxs = get_fuel_bound_idxs(fuel, dist_remaining, 0., 95.)
+    assert np.array_equal(idxs, np.array([4]))
+
+    with pytest.raises(ValueError):
+        get_fuel_bound_idxs(fuel, dist_remaining, -0.05, 175.)
+
+##
+# test whether the routing with fuel-bound filter finds the same route as the routing without filter while requesting
+# fewer courses from the power estimation if the fuel of this route is known, and whether the filter keeps all variants
+# without incumbent or if the incumbent can not be reached
+def test_routing_fuel_bound():
+    voyage = ((54.87, 13.33), (55.6, 14.6), datetime.datetime(2023, 2, 10, 12))
+    constraint_list = generate_dummy_constraint_list()
+    # the fuel rate of DummyBoat is at least 0.2 - 0.06 - 0.0013 kg/s on this voyage at 10 m/s
+    min_fuel_per_dist = 0.013
+
+    boat = DummyBoat()
+    ra_test = create_dummy_IsoFuel_voyage(*voyage)
+    route_test = ra_test.recursive_routing(boat, DummyWeather(), constraint_list)
+    ncourses_test = boat.ncourses
+    incumbent = float(ra_test.full_fuel_consumed)
+
+    for incumbent_pass, fewer_courses in [(None, False), (incumbent, True), (incumbent / 10, False)]:
+        boat.ncourses = 0
+        ra = create_dummy_IsoFuel_voyage(*voyage)
+        ra.set_fuel_bound(min_fuel_per_dist, incumbent_pass)
+        route = ra.recursive_routing(boat, DummyWeather(), constraint_list)
+
+        assert np.array_equal(route.lats_per_step, route_test.lats_per_step)
+        assert np.array_equal(route.lons_per_step, route_test.lons_per_step)
+        assert (boat.ncourses < ncourses_test) == fewer_courses
+    assert ra.fuel_incumbent is None
+
+##
+# test whether the outer envelope of the front is returned: interior variants, variants below the envelope and invalid
+# variants are skipped; duplicates and variants on an edge of the envelope are only returned if trim=False
+def test_get_convex_front_idxs():
+    x = np.array([-2., -1., 0., 1., 2., 0., 0., 0.5, -2., 3.])
+    y = np.array([0., 2., 2.5, 2., 0., 1., 2.5, 2.25, -1., 5.])
+    valid = np.array([True, True, True, True, True, True, True, True, True, False])
+
+    idxs = get_convex_front_idxs(x, y, valid, True)
+    assert np.array_equal(idxs, np.array([0, 1, 2, 3, 4]))
+
+    idxs = get_convex_front_idxs(x, y, valid, False)
+    assert np.array_equal(idxs, np.array([0, 1, 2, 3, 4, 6, 7]))
+
+    # only the highest of several variants with the same x, the end points of a front on a line
+    assert np.array_equal(get_convex_front_idxs([1., 1., 1.], [-3., 0., 0.], [True, True, True], True), [1])
+    assert np.array_equal(get_convex_front_idxs([1., 1., 1.], [-3., 0., 0.], [True, True, True], False), [1, 2])
+    assert np.array_equal(get_convex_front_idxs([0., 2., 1.], [0., 2., 1.], [True, True, True], True), [0, 1])
+    assert np.array_equal(get_convex_front_idxs([0., 2., 1.], [0., 2., 1.], [True, True, True], False), [0, 1, 2])
+
+##
+# test whether the routing with the convex-front pruning arrives at the destination
+def test_routing_convex_front():
+    voyage = ((54.87, 13.33), (55.6, 14.6), datetime.datetime(2023, 2, 10, 12))
+    constraint_list = generate_dummy_constraint_list()
+
+    ra = create_dummy_IsoFuel_voyage(*voyage)
+    ra.set_pruning_strategy(ConvexFrontPruning())
+    route = ra.recursive_routing(DummyBoat(), DummyWeather(), constraint_list)
+
+    assert route.lats_per_step[-1] == voyage[1][0]
+    assert route.lons_per_step[-1] == voyage[1][1]
+    assert route.ship_params_per_step.get_full_fuel() > 0
+
+##
+# test whether all phases of the routing steps are recorded
+def test_routing_profiling():
+    voyage = ((54.87, 13.33), (55.6, 14.6), datetime.datetime(2023, 2, 10, 12))
+    ra = create_dummy_IsoFuel_voyage(*voyage)
+    profiler = Profiler()
+    ra.set_profiler(profiler)
+    ra.recursive_routing(DummyBoat(), DummyWeather(), generate_dummy_constraint_list())
+
+    summary = profiler.get_summary()
+    for name in ['weather', 'boat_speed_function', 'power', 'check_bearing', 'safe_crossing', 'pruning', 'figure']:
+        assert name in summary
+    assert summary['weather']['calls'] == ra.count
+
+##
+# test whether the geodesics to the destination are calculated once per parent and follow the selection of variants
+def test_dest_geodesics_cache():
+    ra = create_dummy_IsoBased_object()
+    ra.define_variants()
+
+    lats = ra.get_current_lats()
+    lons = ra.get_current_lons()
+    dest = geod.inverse(lats, lons, np.full(lats.shape, ra.finish[0]), np.full(lons.shape, ra.finish[1]))
+    assert np.allclose(ra.dest_geodesics['s12'], dest['s12'])
+    assert np.allclose(ra.dest_geodesics['azi1'], dest['azi1'])
+
+    ra.select_variants(np.array([1, 3]))
+    assert np.allclose(ra.get_dest_geodesics()['s12'], dest['s12'][[1, 3]])
+
+    move = ra.check_bearing(np.array([1000., 1000.]))
+    ra.update_position(move, np.array([False, False]), np.array([1000., 1000.]))
+    assert ra.dest_geodesics is None
+
+##
+# test whether the routing with the fast geodesics finds the route of the routing with the geodesics of Vincenty
+def test_routing_geodesic_mode():
+    voyage = ((54.87, 13.33), (55.6, 14.6), datetime.datetime(2023, 2, 10, 12))
+    constraint_list = generate_dummy_constraint_list()
+
+    route_vincenty = create_dummy_IsoFuel_voyage(*voyage).recursive_routing(DummyBoat(), DummyWeather(),
+                                                                             constraint_list)
+    ra = create_dummy_IsoFuel_voyage(*voyage)
+    ra.set_geodesic_mode('andoyer')
+    route_andoyer = ra.recursive_routing(DummyBoat(), DummyWeather(), constraint_list)
+
+    assert route_andoyer.count == route_vincenty.count
+    assert route_andoyer.lats_per_step[-1] == voyage[1][0]
+    assert np.isclose(route_andoyer.ship_params_per_step.get_full_fuel(),
+                      route_vincenty.ship_params_per_step.get_full_fuel(), rtol=1e-3)
+
+    with pytest.raises(ValueError):
+        ra.set_geodesic_mode('haversine')
+
+class FailingBoat(DummyBoat):
+    nfail = 4
+
+    def get_fuel_per_time_netCDF(self, courses, lats, lons, time, wind):
+        if self.ncalls + 1 == self.nfail:
+            raise Exception('power estimation failed')
+        return DummyBoat.get_fuel_per_time_netCDF(self, courses, lats, lons, time, wind)
+
+##
+# test whether a routing that crashed in step 3 and is resumed from the checkpoint of step 2 finds the same route as an
+# uninterrupted routing
+def test_routing_resume_from_checkpoint(tmp_path):
+    voyage = ((54.87, 13.33), (58.28, 17.06), datetime.datetime(2023, 2, 10, 12))
+    constraint_list = generate_dummy_constraint_list()
+    checkpoint = str(tmp_path / 'checkpoint.npz')
+
+    route_test = create_dummy_IsoFuel_voyage(*voyage).recursive_routing(DummyBoat(), DummyWeather(), constraint_list)
+
+    ra = create_dummy_IsoFuel_voyage(*voyage)
+    ra.set_checkpointing(checkpoint, 2)
+    with pytest.raises(Exception):
+        ra.recursive_routing(FailingBoat(), DummyWeather(), constraint_list)
+    assert os.path.isfile(checkpoint)
+
+    ra = create_dummy_IsoFuel_voyage(*voyage)
+    boat = DummyBoat()
+    route = ra.resume_from(checkpoint, boat, DummyWeather(), constraint_list)
+
+    assert boat.ncalls == route_test.count - 2
+    assert route.count == route_test.count
+    assert np.array_equal(route.lats_per_step, route_test.lats_per_step)
+    assert np.array_equal(route.lons_per_step, route_test.lons_per_step)
+    assert np.array_equal(route.starttime_per_step, route_test.starttime_per_step)
+    assert np.allclose(route.ship_params_per_step.get_fuel(), route_test.ship_params_per_step.get_fuel())
+
+    ra = create_dummy_IsoFuel_voyage((54.87, 13.33), (55.6, 14.6), voyage[2])
+    with pytest.raises(ValueError):
+        ra.resume_from(checkpoint, DummyBoat(), DummyWeather(), constraint_list)
+
+##
+# test whether the state of the adaptive heading fan and non-integer heading increments are restored from a checkpoint
+# such that the resumed routing finds the same route as an uninterrupted routing
+def test_routing_resume_with_variant_scheduler(tmp_path):
+    voyage = ((54.87, 13.33), (58.28, 17.06), datetime.datetime(2023, 2, 10, 12))
+    constraint_list = generate_dummy_constraint_list()
+    checkpoint = str(tmp_path / 'checkpoint.npz')
+
+    ra_test = create_dummy_IsoFuel_voyage(*voyage)
+    ra_test.set_variant_scheduler(VariantScheduler(12, 90, 2, 6))
+    route_test = ra_test.recursive_routing(DummyBoat(), DummyWeather(), constraint_list)
+
+    ra = create_dummy_IsoFuel_voyage(*voyage)
+    ra.set_variant_scheduler(VariantScheduler(12, 90, 2, 6))
+    ra.set_checkpointing(checkpoint, 2)
+    with pytest.raises(Exception):
+        ra.recursive_routing(FailingBoat(), DummyWeather(), constraint_list)
+
+    ra = create_dummy_IsoFuel_voyage(*voyage)
+    ra.set_variant_scheduler(VariantScheduler(12, 90, 2, 6))
+    route = ra.resume_from(checkpoint, DummyBoat(), DummyWeather(), constraint_list)
+    assert np.array_equal(route.lats_per_step, route_test.lats_per_step)
+    assert np.array_equal(route.lons_per_step, route_test.lons_per_step)
+
+    ra = create_dummy_IsoFuel_voyage(*voyage)
+    with pytest.raises(ValueError):
+        ra.resume_from(checkpoint, DummyBoat(), DummyWeather(), constraint_list)
+
+    ra.variant_increments_deg = 2.5
+    ra.write_checkpoint(checkpoint)
+    ra = create_dummy_IsoFuel_voyage(*voyage)
+    ra.read_checkpoint(checkpoint)
+    assert ra.variant_increments_deg == 2.5
+
+class WindBoat(DummyBoat):
+    def get_fuel_per_time_netCDF(self, courses, lats, lons, time, wind):
+        ship_params = DummyBoat.get_fuel_per_time_netCDF(self, courses, lats, lons, time, wind)
+        fuel = ship_params.get_fuel() * (1 + 0.01 * wind['tws'] * np.cos(np.radians(wind['twa'])))
+        return ShipParams(fuel=fuel, power=fuel * 1e6, rpm=ship_params.get_rpm(), speed=ship_params.get_speed())
+
+class ChangedWeather(DummyWeather):
+    time_res = datetime.timedelta(hours=3)
+
+    def __init__(self, changed_from):
+        self.changed_from = changed_from
+
+    def get_wind_function(self, coordinate, time):
+        wind = DummyWeather.get_wind_function(self, coordinate, time)
+        if self.changed_from is not None:
+            is_changed = np.asarray(time) + self.time_res > self.changed_from
+            wind['twa'] = np.where(is_changed, 200. - coordinate[1] * 10, wind['twa'])
+            wind['tws'] = np.where(is_changed, 15., wind['tws'])
+        return wind
+
+##
+# test whether re-routing with an updated forecast reuses the routing steps before the change and finds the same route
+# as a routing from scratch with the updated forecast
+def test_reroute():
+    voyage = ((54.87, 13.33), (58.28, 17.06), datetime.datetime(2023, 2, 10, 12))
+    constraint_list = generate_dummy_constraint_list()
+
+    ra = create_dummy_IsoFuel_voyage(*voyage)
+    ra.set_keep_snapshots(True)
+    route_old = ra.recursive_routing(WindBoat(), ChangedWeather(None), constraint_list)
+    assert len(ra.snapshots) == route_old.count + 1
+    # snapshots only keep the position of the variants in the route tree, not their history
+    assert not any(key.startswith('store_') for key in ra.snapshots[-1])
+    assert ra.snapshots[3]['store']['top_row'] == 3
+
+    changed_from = route_old.starttime_per_step[3] + datetime.timedelta(hours=2)
+    route_test = create_dummy_IsoFuel_voyage(*voyage).recursive_routing(WindBoat(), ChangedWeather(changed_from),
+                                                                         constraint_list)
+    assert not np.array_equal(route_test.lons_per_step, route_old.lons_per_step)
+
+    boat = WindBoat()
+    route = ra.reroute(boat, ChangedWeather(changed_from), constraint_list, changed_from)
+    assert boat.ncalls < route_test.count
+    assert np.array_equal(route.lats_per_step, route_test.lats_per_step)
+    assert np.array_equal(route.lons_per_step, route_test.lons_per_step)
+    assert np.allclose(route.ship_params_per_step.get_fuel(), route_test.ship_params_per_step.get_fuel())
+
+##
+# test whether the departure with the lowest fuel is selected and whether no departure is selected if the routing failed
+# for all departure times
+def test_get_best_departure():
+    departures = [datetime.datetime(2023, 2, 10, 12), datetime.datetime(2023, 2, 10, 18)]
+    sweep = DepartureSweep(departures, '', '')
+    results = pd.DataFrame({'departure': departures, 'arrival': [None, None], 'fuel': [np.nan, 12.],
+                            'time': [np.nan, 3.], 'count': [-99, 4]})
+    assert sweep.get_best_departure(results)['departure'] == departures[1]
+
+    results['fuel'] = np.nan
+    assert sweep.get_best_departure(results) is None
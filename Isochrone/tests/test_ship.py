@@ -71,6 +71,56 @@ def test_get_netCDF_courses():
 
     ds.close()
 
+'''
+    test whether courses of space points that are not sorted by latitude (e.g. stacked requests of several routes) are
+    written to the correct space point and whether the indices map the flattened netCDF arrays back to the request order
+'''
+def test_get_netCDF_courses_unsorted():
+    lat = np.array([2., 2., 1., 1., 3., 3.])
+    lon = np.array([3., 3., 4., 4., 5., 5.])
+    courses = np.array([0.1, 0.2, 0.3, 0.4, 0.5, 0.6])
+    time = np.array([datetime.datetime(2022, 12, 19) + datetime.timedelta(hours=int(lat[i])) for i in range(0, 6)])
+
+    pol = get_default_Tanker()
+    pol.write_netCDF_courses(courses, lat, lon,  time)
+    ds = xr.open_dataset(pol.courses_path)
+
+    assert np.array_equal(ds['lat'].to_numpy(), [1., 2., 3.])
+    assert np.array_equal(ds['lon'].to_numpy(), [4., 3., 5.])
+    compare_times(ds['time'].to_numpy(), np.array([datetime.datetime(2022, 12, 19, 1),
+                                                   datetime.datetime(2022, 12, 19, 2),
+                                                   datetime.datetime(2022, 12, 19, 3)]))
+
+    idxs = pol.get_netCDF_indices(lat)
+    assert np.array_equal(ds['courses'].to_numpy().flatten()[idxs], courses)
+
+    ds.close()
+
+'''
+    test whether the space points without a course for a course index (e.g. two courses for one space point and one
+    for another) are left out of the single-course requests to mariPower
+'''
+def test_get_single_course_requests():
+    lat = np.array([2., 2., 1.])
+    lon = np.array([3., 3., 4.])
+    courses = np.array([0.1, 0.2, 0.3])
+    time = np.array([datetime.datetime(2022, 12, 19) + datetime.timedelta(hours=int(lat[i])) for i in range(0, 3)])
+
+    pol = get_default_Tanker()
+    pol.write_netCDF_courses(courses, lat, lon,  time)
+    ds = xr.open_dataset(pol.courses_path)
+    requests = pol.get_single_course_requests(ds)
+
+    assert len(requests) == 2
+    assert np.array_equal(requests[0]['lat'].to_numpy(), [1., 2.])
+    assert np.array_equal(requests[0]['courses'].to_numpy().flatten(), [0.3, 0.1])
+    assert np.array_equal(requests[1]['lat'].to_numpy(), [2.])
+    assert np.array_equal(requests[1]['lon'].to_numpy(), [3.])
+    assert np.array_equal(requests[1]['courses'].to_numpy().flatten(), [0.2])
+    assert np.array_equal(requests[1]['it'].to_numpy(), [1])
+
+    ds.close()
+
 '''
     test whether power is correctly extracted from courses netCDF
 '''
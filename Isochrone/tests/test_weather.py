@@ -0,0 +1,181 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import get_synthetic_env_dataset
+from utils.envcache import write_env_cache
+from weather import WeatherCondCMEMS
+
+def get_synthetic_weather(tmp_path):
+    start_time = datetime.datetime(2023, 2, 10, 12)
+    ds = get_synthetic_env_dataset(54, 13, 56, 16, start_time, 12, 0.5)
+    write_env_cache(ds, tmp_path / 'EnvCache')
+
+    wt = WeatherCondCMEMS(tmp_path / 'EnvCache', start_time, start_time, 12, 3)
+    wt.set_map_size(54, 13, 56, 16)
+    wt.init_wind_functions()
+    return wt, ds
+
+def get_wind_at_node(wt, ds, time, ilat, ilon):
+    u = ds['u-component_of_wind_height_above_ground'].sel(time=time, height_above_ground2=10).to_numpy()[ilat, ilon]
+    v = ds['v-component_of_wind_height_above_ground'].sel(time=time, height_above_ground2=10).to_numpy()[ilat, ilon]
+    return wt.get_twatws_from_uv(u, v)
+
+##
+# test whether the wind is read at the individual time of every variant and interpolated linearly in time between the
+# forecast steps
+def test_wind_function_per_variant_time(tmp_path):
+    wt, ds = get_synthetic_weather(tmp_path)
+    lats = np.array([55., 55., 55.5])
+    lons = np.array([14., 14., 15.])
+    times = np.array([datetime.datetime(2023, 2, 10, 12), datetime.datetime(2023, 2, 10, 15),
+                      datetime.datetime(2023, 2, 10, 13, 30)])
+
+    wind = wt.get_wind_function((lats, lons), times)
+
+    twa, tws = get_wind_at_node(wt, ds, '2023-02-10T12:00', 2, 2)
+    assert np.isclose(wind['tws'][0], tws)
+    assert np.isclose(wind['twa'][0], twa)
+    twa, tws = get_wind_at_node(wt, ds, '2023-02-10T15:00', 2, 2)
+    assert np.isclose(wind['tws'][1], tws)
+
+    comp = []
+    for name in ['u-component_of_wind_height_above_ground', 'v-component_of_wind_height_above_ground']:
+        values = ds[name].sel(height_above_ground2=10, latitude=55.5, longitude=15.)
+        comp.append((values.sel(time='2023-02-10T12:00') + values.sel(time='2023-02-10T15:00')).to_numpy() / 2)
+    twa, tws = wt.get_twatws_from_uv(*comp)
+    assert np.isclose(wind['tws'][2], tws)
+    assert np.isclose(wind['twa'][2], twa)
+
+    for i in range(0, 3):
+        wind_single = wt.get_wind_function((lats[i:i + 1], lons[i:i + 1]), times[i])
+        assert np.isclose(wind_single['tws'][0], wind['tws'][i])
+
+##
+# test whether requests beyond the forecast are refused
+def test_wind_function_out_of_range(tmp_path):
+    wt, ds = get_synthetic_weather(tmp_path)
+    lats = np.array([55.])
+    lons = np.array([14.])
+
+    wind = wt.get_wind_function((lats, lons), datetime.datetime(2023, 2, 10, 10, 30))
+    assert np.isfinite(wind['tws']).all()
+    with pytest.raises(ValueError):
+        wt.get_wind_function((lats, lons), datetime.datetime(2023, 2, 10, 8))
+    with pytest.raises(ValueError):
+        wt.get_wind_function((lats, lons), datetime.datetime(2023, 2, 11, 12))
+
+##
+# test whether the forecast step of a single time and of an array of times is found by index arithmetic on the time
+# axis
+def test_time_step_index(tmp_path):
+    wt, ds = get_synthetic_weather(tmp_path)
+    assert wt.time_axis.dtype == np.dtype('datetime64[s]')
+    assert wt.time_axis[0] == np.datetime64('2023-02-10T12:00')
+    assert wt.time_axis.shape[0] == wt.time_steps
+
+    step = wt.get_time_step_index(datetime.datetime(2023, 2, 10, 16, 31))
+    assert step['idx'] == 2
+    assert step['rounded_time'] == np.datetime64('2023-02-10T18:00')
+
+    times = np.array([datetime.datetime(2023, 2, 10, 12), datetime.datetime(2023, 2, 10, 13, 29),
+                      datetime.datetime(2023, 2, 10, 13, 30), datetime.datetime(2023, 2, 10, 22, 10)])
+    assert np.array_equal(wt.get_time_step_index(times)['idx'], [0, 0, 1, 3])
+    assert np.array_equal(wt.get_time_step_index(times.astype('datetime64[ns]'))['idx'], [0, 0, 1, 3])
+
+    with pytest.raises(ValueError, match='forecast only available from 2023-02-10T12:00:00 to 2023-02-11T00:00:00'):
+        wt.get_time_step_index(np.append(times, datetime.datetime(2023, 2, 11, 2)))
+
+##
+# test whether the wind of a forecast step is only read when it is requested and whether at most max_time_slices
+# forecast steps are kept in memory
+def test_wind_functions_lazy(tmp_path):
+    wt, ds = get_synthetic_weather(tmp_path)
+    wt.set_max_time_slices(2)
+    assert len(wt.wind_functions) == 0
+
+    lats = np.array([55., 55.5])
+    lons = np.array([14., 15.])
+    wind = wt.get_wind_function((lats, lons), datetime.datetime(2023, 2, 10, 12))
+    assert list(wt.wind_functions.keys()) == [0]
+
+    wt.get_wind_function((lats, lons), np.array([datetime.datetime(2023, 2, 10, 16), datetime.datetime(2023, 2, 10, 17)]))
+    assert list(wt.wind_functions.keys()) == [1, 2]
+
+    wind_reread = wt.get_wind_function((lats, lons), datetime.datetime(2023, 2, 10, 12))
+    assert list(wt.wind_functions.keys()) == [2, 0]
+    assert np.allclose(wind_reread['tws'], wind['tws'])
+
+    with pytest.raises(ValueError):
+        wt.set_max_time_slices(1)
+
+##
+# test whether the wind of variants at times in different forecast steps is interpolated by one interpolator over the
+# enclosing forecast steps and whether the interpolator is reused for requests within the same forecast steps
+def test_wind_cube(tmp_path):
+    wt, ds = get_synthetic_weather(tmp_path)
+    lats = np.array([55., 55.5, 55.])
+    lons = np.array([14., 15., 14.])
+    times = np.array([datetime.datetime(2023, 2, 10, 12), datetime.datetime(2023, 2, 10, 13, 30),
+                      datetime.datetime(2023, 2, 10, 18)])
+
+    wind = wt.get_wind_function((lats, lons), times)
+    cube = wt.wind_cube
+    assert cube['steps'] == (0, 2)
+    assert list(wt.wind_functions.keys()) == [0, 1, 2]
+
+    twa, tws = get_wind_at_node(wt, ds, '2023-02-10T18:00', 2, 2)
+    assert np.isclose(wind['tws'][2], tws)
+
+    wt.get_wind_function((lats[:2], lons[:2]), np.array([datetime.datetime(2023, 2, 10, 12),
+                                                         datetime.datetime(2023, 2, 10, 17)]))
+    assert wt.wind_cube is cube
+
+##
+# test whether a netCDF file that is larger than the map and the forecast is restricted to the map and the forecast time
+# range (plus one grid point and one time step on every side) and whether the wind is read at the right grid points
+# from the restricted file
+def test_read_dataset_window(tmp_path):
+    start_time = datetime.datetime(2023, 2, 10, 12)
+    ds = get_synthetic_env_dataset(50, 10, 60, 20, start_time - datetime.timedelta(hours=12), 48, 0.5)
+    ds = ds.sortby('latitude', ascending=False)
+    ds.to_netcdf(tmp_path / 'large.nc')
+
+    wt = WeatherCondCMEMS(tmp_path / 'large.nc', start_time, start_time, 12, 3)
+    assert wt.ds['time'].to_numpy()[0] == np.datetime64('2023-02-10T09:00')
+    assert wt.ds['time'].to_numpy()[-1] == np.datetime64(wt.time_end + wt.time_res)
+    assert wt.ds['time'].shape[0] < ds['time'].shape[0]
+    wt.set_map_size(54, 13, 56, 16)
+    assert np.allclose(wt.ds['latitude'].to_numpy(), np.arange(53.5, 56.6, 0.5))
+    assert np.allclose(wt.ds['longitude'].to_numpy(), np.arange(12.5, 16.6, 0.5))
+    wt.init_wind_functions()
+
+    wind = wt.get_wind_function((np.array([55.5]), np.array([14.])), datetime.datetime(2023, 2, 10, 15))
+    values = ds.sel(time='2023-02-10T15:00', height_above_ground2=10, latitude=55.5, longitude=14.)
+    twa, tws = wt.get_twatws_from_uv(values['u-component_of_wind_height_above_ground'].to_numpy(),
+                                     values['v-component_of_wind_height_above_ground'].to_numpy())
+    assert np.isclose(wind['tws'][0], tws)
+    assert np.isclose(wind['twa'][0], twa)
+
+    vectors = wt.read_wind_vectors(datetime.datetime(2023, 2, 10, 15))
+    assert vectors['u'].shape == (5, 7)
+    assert np.allclose(vectors['lats_u'][:, 0], np.arange(54, 56.1, 0.5))
+    assert np.allclose(vectors['lons_u'][0, :], np.arange(13, 16.1, 0.5))
+    wt.close_env_file()
+
+##
+# test whether the variables are read lazily as dask arrays if chunk sizes are given
+def test_read_dataset_chunks(tmp_path):
+    pytest.importorskip('dask')
+    start_time = datetime.datetime(2023, 2, 10, 12)
+    ds = get_synthetic_env_dataset(50, 10, 60, 20, start_time, 12, 0.5)
+    ds.to_netcdf(tmp_path / 'large.nc')
+
+    wt = WeatherCondCMEMS(tmp_path / 'large.nc', start_time, start_time, 12, 3, {'time': 1})
+    wt.set_map_size(54, 13, 56, 16)
+    assert wt.ds['u-component_of_wind_height_above_ground'].chunks is not None
+    wt.init_wind_functions()
+    wind = wt.get_wind_function((np.array([55.5]), np.array([14.])), start_time)
+    assert np.isfinite(wind['tws']).all()
+    wt.close_env_file()
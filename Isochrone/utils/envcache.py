@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+
+import numpy as np
+import xarray as xr
+
+import utils.formatting as form
+
+logger = logging.getLogger('WRT.envcache')
+
+##
+# Binary cache of the environmental data (weather + depth) which can be opened memory-mapped and read-only by several
+# processes.
+#
+# The cache is a directory that contains one .npy file per coordinate and data variable of the xarray dataset
+# (WeatherCond.ds) and a metadata sidecar (env_cache.json) with the dimensions of all arrays and the attributes of the
+# dataset. Opening the cache does not read any data, the pages of the arrays are shared between all processes that open
+# the same cache. The arrays are stored in C order with time as the first dimension, thus the data of every forecast step
+# is one contiguous chunk of the file and reading a forecast step only touches the pages of this step.
+#
+# The cache is written by 'execute_preprocessing.py' (see get_env_dataset) or from the dataset of a WeatherCond object.
+
+META_FILE = 'env_cache.json'
+
+WIND_VARS = ['u-component_of_wind_height_above_ground', 'v-component_of_wind_height_above_ground']
+WAVE_VARS = ['VHM0', 'VMDR', 'VTPK']    # significant wave height, mean wave direction, peak wave period (CMEMS)
+
+def is_env_cache(path):
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+def write_env_cache(ds: xr.Dataset, path):
+    logger.info(form.get_log_step('Writing environment cache to ' + str(path), 1))
+    os.makedirs(path, exist_ok=True)
+
+    meta = {'coords': {}, 'data_vars': {}, 'attrs': dict(ds.attrs)}
+    for kind, variables in (('coords', ds.coords), ('data_vars', ds.data_vars)):
+        for name, var in variables.items():
+            if 'time' in var.dims:
+                var = var.transpose('time', ...)
+            values = np.ascontiguousarray(var.to_numpy())
+            if values.dtype == object:
+                raise ValueError('Can not write variable ' + str(name) + ' of type object to the environment cache!')
+            filename = kind + '_' + str(name) + '.npy'
+            np.save(os.path.join(path, filename), values, allow_pickle=False)
+            meta[kind][name] = {'dims': list(var.dims), 'file': filename}
+
+    with open(os.path.join(path, META_FILE), 'w') as meta_file:
+        json.dump(meta, meta_file, indent=1)
+
+def load_env_cache(path):
+    logger.info(form.get_log_step('Opening environment cache ' + str(path), 1))
+    if not is_env_cache(path):
+        raise ValueError('No environment cache found at ' + str(path))
+
+    with open(os.path.join(path, META_FILE)) as meta_file:
+        meta = json.load(meta_file)
+
+    variables = {}
+    for kind in ('coords', 'data_vars'):
+        variables[kind] = {}
+        for name, var in meta[kind].items():
+            values = np.load(os.path.join(path, var['file']), mmap_mode='r', allow_pickle=False)
+            variables[kind][name] = (var['dims'], values)
+
+    return xr.Dataset(variables['data_vars'], variables['coords'], meta.get('attrs', {}))
+
+##
+# returns the slice of a coordinate that contains the range [low, high] and 'npoints' more grid points on every side,
+# for ascending and descending coordinates
+def get_coord_slice(coord, low, high, npoints=1):
+    values = coord.to_numpy()
+    if values.shape[0] < 2:
+        return slice(None)
+    margin = npoints * np.abs(values[1] - values[0])
+    if values[0] > values[-1]:
+        return slice(high + margin, low - margin)
+    return slice(low - margin, high + margin)
+
+def get_common_grid(lat1, lon1, lat2, lon2, resolution_deg):
+    nlat = int(round((lat2 - lat1) / resolution_deg)) + 1
+    nlon = int(round((lon2 - lon1) / resolution_deg)) + 1
+    return np.linspace(lat1, lat2, nlat), np.linspace(lon1, lon2, nlon)
+
+def get_env_dataset(ds_weather, ds_depth, lat1, lon1, lat2, lon2, time_start, time_end, resolution_deg=None,
+                    ds_waves=None):
+    """
+        Return weather, waves and depth for the map (lat1, lon1, lat2, lon2) on a common grid.
+
+        The input datasets are cropped to the map and the time range by index slices before any data is read and are
+        interpolated linearly onto a regular grid that spans the map. True wind angle and speed are added for the wind
+        at 10m height.
+
+            Parameters:
+                ds_weather (xr.Dataset): wind in the format of WeatherCondCMEMS
+                ds_depth (xr.Dataset): depth in the format of ETOPO ('z' on 'lat', 'lon') or with 'depth' on
+                    'latitude', 'longitude'
+                time_start, time_end (datetime): time range of the forecast steps that are kept
+                resolution_deg (float): resolution of the common grid (°), default: resolution of the weather data
+                ds_waves (xr.Dataset): CMEMS wave data (VHM0, VMDR, VTPK), optional
+    """
+    ds_weather = ds_weather.sel(
+        time=slice(np.datetime64(time_start), np.datetime64(time_end)),
+        latitude=get_coord_slice(ds_weather['latitude'], lat1, lat2),
+        longitude=get_coord_slice(ds_weather['longitude'], lon1, lon2))
+    if ds_weather['time'].shape[0] == 0:
+        raise ValueError('No weather data between ' + str(time_start) + ' and ' + str(time_end))
+    if resolution_deg is None:
+        resolution_deg = float(np.abs(ds_weather['latitude'][1] - ds_weather['latitude'][0]))
+    lats, lons = get_common_grid(lat1, lon1, lat2, lon2, resolution_deg)
+
+    ds_weather = ds_weather[WIND_VARS].sel(height_above_ground2=[10])
+    ds = ds_weather.interp(latitude=lats, longitude=lons)
+
+    u = ds[WIND_VARS[0]].isel(height_above_ground2=0)
+    v = ds[WIND_VARS[1]].isel(height_above_ground2=0)
+    ds['tws'] = np.sqrt(u ** 2 + v ** 2)
+    ds['twa'] = 180.0 / np.pi * np.arctan2(u, v) + 180.0    # as WeatherCond.get_twatws_from_uv
+
+    if ds_waves is not None:
+        ds_waves = ds_waves.sel(latitude=get_coord_slice(ds_waves['latitude'], lat1, lat2),
+                                longitude=get_coord_slice(ds_waves['longitude'], lon1, lon2))
+        ds_waves = ds_waves[[var for var in WAVE_VARS if var in ds_waves.data_vars]]
+        # the interpolation in time requires equal units of the time coordinates
+        ds_waves = ds_waves.assign_coords(time=ds_waves['time'].astype(ds['time'].dtype))
+        ds = ds.merge(ds_waves.interp(time=ds['time'], latitude=lats, longitude=lons))
+
+    if 'z' in ds_depth.data_vars:
+        ds_depth = ds_depth[['z']].rename(lat='latitude', lon='longitude', z='depth')
+    ds_depth = ds_depth[['depth']].sel(latitude=get_coord_slice(ds_depth['latitude'], lat1, lat2),
+                                       longitude=get_coord_slice(ds_depth['longitude'], lon1, lon2))
+    ds['depth'] = ds_depth['depth'].interp(latitude=lats, longitude=lons)
+
+    if any(ds[var].isnull().any() for var in ds.data_vars):
+        raise ValueError('The weather, wave or depth data do not cover the map ' + str([lat1, lon1, lat2, lon2]) + '!')
+
+    ds.attrs = {
+        'map': [lat1, lon1, lat2, lon2],
+        'resolution_deg': resolution_deg,
+        'time_start': str(ds['time'].to_numpy()[0]),
+        'time_end': str(ds['time'].to_numpy()[-1])
+    }
+    # land is assigned a depth of 0 like in WeatherCond.add_depth_to_EnvData
+    ds['depth'] = ds['depth'].where(ds['depth'] < 0, 0)
+    return ds
+
+def write_preprocessed_env_cache(weather_path, depth_path, path, lat1, lon1, lat2, lon2, time_start, time_end,
+                                 resolution_deg=None, waves_path=None):
+    ds_weather = xr.open_dataset(weather_path)
+    ds_depth = xr.open_dataset(depth_path)
+    ds_waves = xr.open_dataset(waves_path) if waves_path is not None else None
+
+    ds = get_env_dataset(ds_weather, ds_depth, lat1, lon1, lat2, lon2, time_start, time_end, resolution_deg, ds_waves)
+    ds.attrs['weather'] = str(weather_path)
+    ds.attrs['depth'] = str(depth_path)
+    if waves_path is not None:
+        ds.attrs['waves'] = str(waves_path)
+    write_env_cache(ds, path)
+
+    for ds_input in (ds_weather, ds_depth, ds_waves):
+        if ds_input is not None:
+            ds_input.close()
+    return ds
@@ -0,0 +1,198 @@
+import numpy as np
+from geovectorslib import geod
+
+##
+# Vectorised geodesics for the routing.
+#
+# The functions 'inverse' and 'direct' return the same dictionaries as geovectorslib.geod.inverse (s12, azi1, azi2) and
+# geovectorslib.geod.direct (lat2, lon2, azi2), azimuths in [0, 360), for one of the following modes:
+#   'vincenty':  Vincenty's iterative solution on the WGS84 ellipsoid (geovectorslib). Default.
+#   'andoyer':   first-order corrections for the flattening of WGS84 without iterations. The inverse distance is the one
+#                of Andoyer-Lambert, the azimuths and the direct solution are those of Vincenty after a single
+#                iteration. Compared to 'vincenty' distances deviate by less than 2e-5 (relative), azimuths by less
+#                than 0.001° and positions of the direct solution by less than 1e-5 of the distance.
+#   'spherical': great circles on a sphere with the mean radius of the earth. Compared to 'vincenty' distances and
+#                positions of the direct solution deviate by less than 0.6% of the distance, azimuths by less than 0.6°.
+# The error bounds hold for distances between 1km and 5000km outside the polar regions (|lat| < 80°) and have been
+# determined by comparison with 'vincenty' for random point pairs (tests/test_geodesic.py). The fast modes take about half
+# of the time of 'vincenty' as they do not iterate until convergence and are meant for the inner loop of the routing.
+
+MODES = ['vincenty', 'andoyer', 'spherical']
+
+EARTH_RADIUS = 6371008.8        # mean radius of the earth (m)
+WGS84_A = 6378137.0             # semi-major axis of WGS84 (m)
+WGS84_F = 1 / 298.257223563     # flattening of WGS84
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+def check_mode(mode):
+    if mode not in MODES:
+        raise ValueError('Unknown geodesic mode ' + str(mode) + ', choose from ' + str(MODES))
+
+def get_radians(*values):
+    return [np.radians(np.asarray(value, dtype=float)) for value in values]
+
+def get_azimuth_deg(y, x):
+    return np.degrees(np.arctan2(y, x)) % 360
+
+def get_andoyer_distance(lat1, lon1, lat2, lon2):
+    # all angles in radians
+    F = (lat1 + lat2) / 2
+    G = (lat1 - lat2) / 2
+    L = (lon1 - lon2) / 2
+
+    S = np.sin(G) ** 2 * np.cos(L) ** 2 + np.cos(F) ** 2 * np.sin(L) ** 2
+    C = np.cos(G) ** 2 * np.cos(L) ** 2 + np.sin(F) ** 2 * np.sin(L) ** 2
+    is_zero = (S == 0) | (C == 0)
+    S = np.where(is_zero, 1, S)
+    C = np.where(is_zero, 1, C)
+
+    omega = np.arctan(np.sqrt(S / C))
+    R = np.sqrt(S * C) / omega
+    H1 = (3 * R - 1) / (2 * C)
+    H2 = (3 * R + 1) / (2 * S)
+    dist = 2 * omega * WGS84_A * (1 + WGS84_F * H1 * np.sin(F) ** 2 * np.cos(G) ** 2 -
+                                  WGS84_F * H2 * np.cos(F) ** 2 * np.sin(G) ** 2)
+    return np.where(is_zero, 0, dist)
+
+def get_reduced_latitude(lat):
+    tan_U = (1 - WGS84_F) * np.tan(lat)
+    cos_U = 1 / np.sqrt(1 + tan_U * tan_U)
+    return tan_U * cos_U, cos_U
+
+##
+# azimuths of Vincenty's inverse solution after a single iteration of the longitude on the auxiliary sphere
+def get_andoyer_azimuths(lat1, lon1, lat2, lon2):
+    sin_U1, cos_U1 = get_reduced_latitude(lat1)
+    sin_U2, cos_U2 = get_reduced_latitude(lat2)
+    L = lon2 - lon1
+
+    sin_L = np.sin(L)
+    cos_L = np.cos(L)
+    sin_sigma = np.sqrt((cos_U2 * sin_L) ** 2 + (cos_U1 * sin_U2 - sin_U1 * cos_U2 * cos_L) ** 2)
+    cos_sigma = sin_U1 * sin_U2 + cos_U1 * cos_U2 * cos_L
+    sigma = np.arctan2(sin_sigma, cos_sigma)
+    sin_azi = np.divide(cos_U1 * cos_U2 * sin_L, sin_sigma, out=np.zeros(sigma.shape), where=sin_sigma > 0)
+    cos_sq_azi = 1 - sin_azi * sin_azi
+    cos_2_sigma_m = np.divide(2 * sin_U1 * sin_U2, cos_sq_azi, out=np.zeros(sigma.shape), where=cos_sq_azi > 0)
+    cos_2_sigma_m = np.where(cos_sq_azi > 0, cos_sigma - cos_2_sigma_m, 0)
+    C = WGS84_F / 16 * cos_sq_azi * (4 + WGS84_F * (4 - 3 * cos_sq_azi))
+    lambda_ = L + (1 - C) * WGS84_F * sin_azi * (
+            sigma + C * sin_sigma * (cos_2_sigma_m + C * cos_sigma * (-1 + 2 * cos_2_sigma_m * cos_2_sigma_m)))
+
+    sin_lambda = np.sin(lambda_)
+    cos_lambda = np.cos(lambda_)
+    azi1 = get_azimuth_deg(cos_U2 * sin_lambda, cos_U1 * sin_U2 - sin_U1 * cos_U2 * cos_lambda)
+    azi2 = get_azimuth_deg(cos_U1 * sin_lambda, -sin_U1 * cos_U2 + cos_U1 * sin_U2 * cos_lambda)
+    return azi1, azi2
+
+def inverse(lats1, lons1, lats2, lons2, mode='vincenty'):
+    check_mode(mode)
+    if mode == 'vincenty':
+        return geod.inverse(lats1, lons1, lats2, lons2)
+
+    lat1, lon1, lat2, lon2 = get_radians(lats1, lons1, lats2, lons2)
+    if mode == 'andoyer':
+        dist = get_andoyer_distance(lat1, lon1, lat2, lon2)
+        azi1, azi2 = get_andoyer_azimuths(lat1, lon1, lat2, lon2)
+    else:
+        dlon = lon2 - lon1
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+        dist = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+        azi1 = get_azimuth_deg(np.sin(dlon) * np.cos(lat2),
+                               np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon))
+        azi2 = get_azimuth_deg(np.sin(dlon) * np.cos(lat1),
+                               -np.sin(lat1) * np.cos(lat2) + np.cos(lat1) * np.sin(lat2) * np.cos(dlon))
+
+    # coincident points, consistent with geovectorslib
+    azi1 = np.where(dist > 0, azi1, 0)
+    azi2 = np.where(dist > 0, azi2, 0)
+    return {'s12': dist, 'azi1': azi1, 'azi2': azi2, 'iterations': 0}
+
+##
+# Vincenty's direct solution with a single correction of the angular distance on the auxiliary sphere
+def get_andoyer_direct(lat1, lon1, azi1, dist):
+    sin_azi1 = np.sin(azi1)
+    cos_azi1 = np.cos(azi1)
+    sin_U1, cos_U1 = get_reduced_latitude(lat1)
+
+    sigma1 = np.arctan2(sin_U1 / cos_U1, cos_azi1)
+    sin_azi = cos_U1 * sin_azi1
+    cos_sq_azi = 1 - sin_azi * sin_azi
+    u_sq = cos_sq_azi * (WGS84_A * WGS84_A - WGS84_B * WGS84_B) / (WGS84_B * WGS84_B)
+    A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+
+    sigma = dist / (WGS84_B * A)
+    cos_2_sigma_m = np.cos(2 * sigma1 + sigma)
+    sin_sigma = np.sin(sigma)
+    cos_sigma = np.cos(sigma)
+    delta_sigma = B * sin_sigma * (cos_2_sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2_sigma_m * cos_2_sigma_m) -
+            B / 6 * cos_2_sigma_m * (-3 + 4 * sin_sigma * sin_sigma) * (-3 + 4 * cos_2_sigma_m * cos_2_sigma_m)))
+    sigma = dist / (WGS84_B * A) + delta_sigma
+
+    cos_2_sigma_m = np.cos(2 * sigma1 + sigma)
+    sin_sigma = np.sin(sigma)
+    cos_sigma = np.cos(sigma)
+    x = sin_U1 * sin_sigma - cos_U1 * cos_sigma * cos_azi1
+    lat2 = np.arctan2(sin_U1 * cos_sigma + cos_U1 * sin_sigma * cos_azi1,
+                      (1 - WGS84_F) * np.sqrt(sin_azi * sin_azi + x * x))
+    lambda_ = np.arctan2(sin_sigma * sin_azi1, cos_U1 * cos_sigma - sin_U1 * sin_sigma * cos_azi1)
+    C = WGS84_F / 16 * cos_sq_azi * (4 + WGS84_F * (4 - 3 * cos_sq_azi))
+    lon2 = lon1 + lambda_ - (1 - C) * WGS84_F * sin_azi * (
+            sigma + C * sin_sigma * (cos_2_sigma_m + C * cos_sigma * (-1 + 2 * cos_2_sigma_m * cos_2_sigma_m)))
+    return lat2, lon2, np.arctan2(sin_azi, -x)
+
+def get_spherical_direct(lat1, lon1, azi1, dist):
+    delta = dist / EARTH_RADIUS
+    lat2 = np.arcsin(np.clip(np.sin(lat1) * np.cos(delta) + np.cos(lat1) * np.sin(delta) * np.cos(azi1), -1, 1))
+    lon2 = lon1 + np.arctan2(np.sin(azi1) * np.sin(delta) * np.cos(lat1), np.cos(delta) - np.sin(lat1) * np.sin(lat2))
+    dlon = lon1 - lon2
+    azi2 = np.arctan2(np.sin(dlon) * np.cos(lat1),
+                      np.cos(lat2) * np.sin(lat1) - np.sin(lat2) * np.cos(lat1) * np.cos(dlon)) + np.pi
+    return lat2, lon2, azi2
+
+def direct(lats1, lons1, azis1, dists, mode='vincenty'):
+    check_mode(mode)
+    if mode == 'vincenty':
+        return geod.direct(lats1, lons1, azis1, dists)
+
+    lat1, lon1, azi1 = get_radians(lats1, lons1, azis1)
+    dist = np.asarray(dists, dtype=float)
+    if mode == 'andoyer':
+        lat2, lon2, azi2 = get_andoyer_direct(lat1, lon1, azi1, dist)
+    else:
+        lat2, lon2, azi2 = get_spherical_direct(lat1, lon1, azi1, dist)
+
+    lon2 = (np.degrees(lon2) + 180) % 360 - 180
+    return {'lat2': np.degrees(lat2), 'lon2': lon2, 'azi2': np.degrees(azi2) % 360, 'iterations': 0}
+
+##
+# returns points on the great circles from (lats1, lons1) to (lats2, lons2) at the fractions 'fractions' of the distance
+# (spherical linear interpolation). 'fractions' is broadcast against the points, e.g. an array of shape (nsamples,
+# nvariants) for nvariants great circles. The points for fractions 0 and 1 are the end points, longitudes are continued
+# from lons1 without wrapping.
+def get_intermediate_points(lats1, lons1, lats2, lons2, fractions):
+    lat1, lon1, lat2, lon2 = get_radians(lats1, lons1, lats2, lons2)
+    fractions = np.asarray(fractions, dtype=float)
+
+    x1, y1, z1 = np.cos(lat1) * np.cos(lon1), np.cos(lat1) * np.sin(lon1), np.sin(lat1)
+    x2, y2, z2 = np.cos(lat2) * np.cos(lon2), np.cos(lat2) * np.sin(lon2), np.sin(lat2)
+    omega = np.arccos(np.clip(x1 * x2 + y1 * y2 + z1 * z2, -1, 1))
+    sin_omega = np.sin(omega)
+    is_point = sin_omega < 1e-12
+
+    sin_omega = np.where(is_point, 1, sin_omega)
+    weight1 = np.where(is_point, 1 - fractions, np.sin((1 - fractions) * omega) / sin_omega)
+    weight2 = np.where(is_point, fractions, np.sin(fractions * omega) / sin_omega)
+    x = weight1 * x1 + weight2 * x2
+    y = weight1 * y1 + weight2 * y2
+    z = weight1 * z1 + weight2 * z2
+
+    lats = np.degrees(np.arctan2(z, np.sqrt(x * x + y * y)))
+    lons = np.degrees(np.arctan2(y, x))
+    lons = np.asarray(lons1) + (lons - np.asarray(lons1) + 180) % 360 - 180
+
+    lats = np.where(fractions == 1, lats2, np.where(fractions == 0, lats1, lats))
+    lons = np.where(fractions == 1, lons2, np.where(fractions == 0, lons1, lons))
+    return lats, lons
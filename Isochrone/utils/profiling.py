@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+import utils.formatting as form
+
+logger = logging.getLogger('WRT.Performance')
+
+##
+# Timing instrumentation of the routing.
+#
+# The routing algorithms wrap the phases of every routing step (weather lookup, boat speed, power estimation, bearing,
+# constraints, pruning, figures) in named spans of a Profiler. Every span records the routing step, the wall time, the
+# number of variants and, if memory tracing is enabled, the peak of the memory allocated during the span (tracemalloc).
+# As the peak is reset at the start of every span, spans should not be nested if memory is traced.
+#
+# The spans can be written as JSON, as Chrome trace events (chrome://tracing, https://ui.perfetto.dev) and summarised per
+# span name in the performance log. A disabled Profiler (default) does not record anything.
+
+class Profiler():
+    enabled: bool
+    trace_memory: bool      # record the memory allocated per span, slows down the routing considerably
+    spans: list             # recorded spans, dicts with name, step, start (s), duration (s), nvariants, bytes
+    start_time: float       # reference time of the spans (s, time.perf_counter)
+
+    def __init__(self, enabled=True, trace_memory=False):
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.spans = []
+        self.start_time = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, step=-99, nvariants=0):
+        if not self.enabled:
+            yield
+            return
+
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            nbytes = 0
+            if self.trace_memory:
+                nbytes = tracemalloc.get_traced_memory()[1] - memory_start
+            self.spans.append({
+                'name': name,
+                'step': int(step),
+                'start': start - self.start_time,
+                'duration': duration,
+                'nvariants': int(nvariants),
+                'bytes': int(nbytes)
+            })
+
+    def stop(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    ##
+    # returns the number of calls, the total, mean and maximum wall time (s), the mean number of variants and the maximum
+    # of the allocated memory (bytes) per span name
+    def get_summary(self):
+        summary = {}
+        names = list(dict.fromkeys([span['name'] for span in self.spans]))
+        for name in names:
+            spans = [span for span in self.spans if span['name'] == name]
+            durations = np.array([span['duration'] for span in spans])
+            summary[name] = {
+                'calls': len(spans),
+                'total': float(np.sum(durations)),
+                'mean': float(np.mean(durations)),
+                'max': float(np.max(durations)),
+                'nvariants': float(np.mean([span['nvariants'] for span in spans])),
+                'bytes': int(np.max([span['bytes'] for span in spans]))
+            }
+        return summary
+
+    def print_summary(self):
+        summary = self.get_summary()
+        total = sum([span['total'] for span in summary.values()])
+        logger.info('Profiling summary (' + str(round(total, 3)) + 's in spans):')
+        for name, span in sorted(summary.items(), key=lambda item: -item[1]['total']):
+            share = span['total'] / total * 100 if total > 0 else 0
+            logger.info(form.get_log_step(name + ': ' + str(span['calls']) + ' calls, total ' +
+                                          str(round(span['total'], 3)) + 's (' + str(round(share, 1)) + '%), mean ' +
+                                          str(round(span['mean'] * 1000, 2)) + 'ms, max ' +
+                                          str(round(span['max'] * 1000, 2)) + 'ms, variants ' +
+                                          str(round(span['nvariants'], 1)) + ', max bytes ' + str(span['bytes']), 1))
+
+    def write_json(self, filename):
+        with open(filename, 'w') as file:
+            json.dump({'spans': self.spans, 'summary': self.get_summary()}, file, indent=1)
+
+    ##
+    # writes the spans as complete events ('ph': 'X') of the Chrome trace-event format, times in microseconds
+    def write_chrome_trace(self, filename):
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            events.append({
+                'name': span['name'],
+                'cat': 'routing',
+                'ph': 'X',
+                'ts': span['start'] * 1e6,
+                'dur': span['duration'] * 1e6,
+                'pid': pid,
+                'tid': 0,
+                'args': {'step': span['step'], 'nvariants': span['nvariants'], 'bytes': span['bytes']}
+            })
+        with open(filename, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+##
+# passes the messages of the performance logger in addition to warnings and errors, used for the handler of
+# PERFORMANCE_LOG_FILE
+class PerformanceLogFilter(logging.Filter):
+    def filter(self, record):
+        return (record.levelno >= logging.WARNING) or record.name.startswith(logger.name)
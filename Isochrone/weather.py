@@ -2,6 +2,7 @@
 import datetime as dt
 import logging
 import sys
+from collections import OrderedDict
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -10,6 +11,7 @@ from scipy.interpolate import RegularGridInterpolator
 
 import utils.graphics as graphics
 import utils.formatting as form
+from utils.envcache import get_coord_slice, is_env_cache, load_env_cache
 from utils.unit_conversion import round_time
 
 logger = logging.getLogger('WRT.weather')
@@ -32,17 +34,20 @@ class WeatherCond():
     time_res: dt.timedelta
     time_start: dt.datetime
     time_end: dt.timedelta
+    time_axis: np.ndarray   # times of the forecast steps (datetime64)
     map_size: Map
-    ds: xr.Dataset
-    wind_functions: None
-    wind_vectors: None
-
-    def __init__(self, filepath, model, time, hours, time_res):
+    ds: xr.Dataset          # environmental data restricted to the forecast time range and the map (see read_dataset)
+    chunks: dict            # chunk sizes per dimension for the lazy reading with dask, None: no dask
+    wind_functions: OrderedDict     # wind components per forecast step, read on demand
+    wind_cube: dict                 # interpolators of the wind components in (time, lat, lon) for the forecast steps
+                                    # of the latest request
+    wind_vectors: OrderedDict       # u-v components per forecast step for the figures, read on demand
+    max_time_slices: int            # maximum number of forecast steps that are kept in memory per cache
+
+    def __init__(self, filepath, model, time, hours, time_res, chunks=None):
         form.print_line()
         logger.info('Initialising weather')
 
-        self.read_dataset(filepath)
-
         self.model = model
         self.time_res = time_res
         self.time_start = time
@@ -50,6 +55,15 @@ class WeatherCond():
 
         time_passed = self.time_end - self.time_start
         self.time_steps = int(time_passed.total_seconds()/self.time_res.total_seconds())
+        self.time_axis = np.datetime64(self.time_start, 's') + np.arange(self.time_steps) * np.timedelta64(
+            int(self.time_res.total_seconds()), 's')
+        self.max_time_slices = 16
+        self.wind_functions = OrderedDict()
+        self.wind_cube = None
+        self.wind_vectors = OrderedDict()
+        self.chunks = chunks
+
+        self.read_dataset(filepath)
 
         logger.info(form.get_log_step('forecast from ' + str(self.time_start) + ' to ' + str(self.time_end), 1))
         logger.info(form.get_log_step('nof time steps ' + str(self.time_steps),1))
@@ -85,8 +99,9 @@ class WeatherCond():
             raise Exception('Need to initialise weather data bounding box before adding depth data!')
 
         ds_depth = xr.open_dataset(depth_path)
-        ds_depth = ds_depth.where((ds_depth.lat > lat_start) & (ds_depth.lat < lat_end) & (ds_depth.lon > lon_start) & (
-                    ds_depth.lon < lon_end) & (ds_depth.z < 0), drop=True)
+        ds_depth = ds_depth.sel(lat=get_coord_slice(ds_depth['lat'], lat_start, lat_end, 0),
+                                lon=get_coord_slice(ds_depth['lon'], lon_start, lon_end, 0))
+        ds_depth['z'] = ds_depth['z'].where(ds_depth.z < 0)
 
         #depth_lat = ds_depth['latitude'].to_numpy()
         #depth_lon = ds_depth['longitude'].to_numpy()
@@ -150,23 +165,93 @@ class WeatherCond():
         rounded_time = round_time(rounded_time, int(self.time_res.total_seconds()))
         self._time_end = rounded_time
 
+    ##
+    # returns the time passed since the first forecast step (s) for a time or an array of times (datetime or datetime64)
+    def get_time_passed(self, time):
+        time = np.asarray(time).astype('datetime64[us]')
+        return (time - self.time_axis[0]) / np.timedelta64(1, 's')
+
+    def check_time_passed(self, time, time_passed, tolerance=0):
+        time_max = (self.time_axis.shape[0] - 1) * self.time_res.total_seconds()
+        out_of_range = (time_passed < -tolerance) | (time_passed > time_max + tolerance)
+        if out_of_range.any():
+            raise ValueError('Requesting weather data for ' + str(np.atleast_1d(time)[np.atleast_1d(out_of_range)][0]) +
+                             ' but forecast only available from ' + str(self.time_axis[0]) + ' to ' +
+                             str(self.time_axis[-1]))
+
+    ##
+    # returns the index of the forecast step closest to a time or an array of times and the time of this step
     def get_time_step_index(self, time):
-        rounded_time = round_time(time, int(self.time_res.total_seconds()))
-        time_passed = rounded_time - self.time_start
-        idx = (time_passed.total_seconds() / self.time_res.total_seconds())
-        return {'rounded_time' : rounded_time, 'idx' : idx}
+        time_passed = self.get_time_passed(time)
+        self.check_time_passed(time, time_passed, self.time_res.total_seconds() / 2)
+        idx = np.floor(time_passed / self.time_res.total_seconds() + 0.5).astype(int)
+        idx = np.minimum(idx, self.time_axis.shape[0] - 1)[()]
+        return {'rounded_time' : self.time_axis[idx], 'idx' : idx}
+
+    def set_max_time_slices(self, max_time_slices):
+        if max_time_slices < 2:
+            raise ValueError('At least two forecast steps need to be kept in memory for the interpolation in time, got '
+                             + str(max_time_slices))
+        self.max_time_slices = max_time_slices
+        logger.info(form.get_log_step('keeping up to ' + str(max_time_slices) + ' forecast steps in memory', 1))
+
+    ##
+    # returns the entry of forecast step 'idx' from a cache of the recently used forecast steps. The entry is read by
+    # 'read' if it is not cached, the least recently used entry is dropped if the cache exceeds max_time_slices.
+    def get_cached_time_slice(self, cache, idx, read):
+        idx = int(idx)
+        if idx in cache:
+            cache.move_to_end(idx)
+            return cache[idx]
+
+        entry = read(idx)
+        cache[idx] = entry
+        while len(cache) > self.max_time_slices:
+            cache.popitem(last=False)
+        return entry
 
     def set_map_size(self, lat1, lon1, lat2, lon2):
         self.map_size=Map(lat1, lon1, lat2, lon2)
+        self.crop_dataset_map()
 
     def get_map_size(self):
         return self.map_size
 
+    ##
+    # returns the selection of the map by slices of latitude and longitude with a margin of 'npoints' grid points
+    def get_map_selection(self, ds, npoints=0):
+        return {
+            'latitude': get_coord_slice(ds['latitude'], self.map_size.x1, self.map_size.x2, npoints),
+            'longitude': get_coord_slice(ds['longitude'], self.map_size.y1, self.map_size.y2, npoints)
+        }
+
+    ##
+    # The dataset is opened lazily and restricted to the forecast time range (on opening) and to the map (set_map_size)
+    # by index slices with a margin of one time step and one grid point on every side. Only the coordinates are read for
+    # this, the data of a forecast step is read from the remaining hyperslab when it is requested. With 'chunks' the
+    # variables are read as dask arrays with the given chunk sizes, e.g. {'time': 1}.
     def read_dataset(self, filepath):
         logger.info(form.get_log_step('Reading dataset from' + str(filepath),1))
-        self.ds = xr.open_dataset(filepath)
+        if is_env_cache(filepath):
+            self.ds = load_env_cache(filepath)
+        else:
+            self.ds = xr.open_dataset(filepath, chunks=self.chunks)
+        self.crop_dataset_time()
         print(self.ds)
 
+    def crop_dataset_time(self):
+        if 'time' not in self.ds.dims:
+            return
+        self.ds = self.ds.sel(time=slice(np.datetime64(self.time_start - self.time_res),
+                                         np.datetime64(self.time_end + self.time_res)))
+
+    def crop_dataset_map(self):
+        self.ds = self.ds.sel(self.get_map_selection(self.ds, 1))
+        # the interpolators of the wind need ascending latitudes
+        if self.ds['latitude'].shape[0] > 1 and self.ds['latitude'][0] > self.ds['latitude'][-1]:
+            self.ds = self.ds.isel(latitude=slice(None, None, -1))
+        logger.info(form.get_log_step('restricted dataset to ' + str(dict(self.ds.sizes)), 1))
+
     def check_ds_format(self):
         print('Printing dataset', self.ds)
     '''
@@ -201,160 +286,145 @@ class WeatherCond():
         return twa, tws
 
     def init_wind_vectors(self):
-        """Return wind vectors for given number of hours.
-            Parameters:
-                    model (dict): available forecast wind functions
-                    hours_ahead (int): number of hours looking ahead
-                    lats, lons: rectange defining forecast area
-            Returns:
-                    wind_vectors (dict):
-                        model: model timestamp
-                        hour: function for given forecast hour
-            """
-
-        wind_vectors = {}
-        wind_vectors['model'] = self.model
-
-        for i in range(self.time_steps):
-            time = self.time_start + self.time_res * i
-            wind_vectors[i] = self.read_wind_vectors(time)
-            #print('reading wind vector time', time)
-
-        self.wind_vectors = wind_vectors
-
+        """
+        Reset the wind vectors. The u-v components of a forecast step are read when they are requested for the
+        first time (see get_wind_vector).
+        """
+        self.wind_vectors = OrderedDict()
+
+    ##
+    # The wind of a forecast step is read when the step is requested for the first time and kept in the cache
+    # 'wind_functions'. For a request, the cached forecast steps between the earliest and the latest time of the variants
+    # are stacked into a (time, lat, lon) cube and the wind of all variants is obtained at their individual times and
+    # positions by a single trilinear interpolation of this cube. The interpolators are kept for the following requests
+    # within the same forecast steps. The wind components are interpolated instead of the wind angle to avoid jumps at the
+    # transition from 360° to 0°.
     def init_wind_functions(self):
         """
-        Read wind functions.
-            Parameters:
-                    model (dict): available forecast wind functions
+        Reset the wind functions.
             Returns:
-                    wind_functions (dict):
-                        model: model timestamp
-                        model+hour: function for given forecast hour
+                    wind_functions (OrderedDict):
+                        forecast step: wind components u and v on the grid (lats, lons)
          """
-        wind_function = {}
-        wind_function['model'] = self.model
-
-        for i in range(self.time_steps):
-            wind_function[i] = self.read_wind_functions(i)
-
-        self.wind_functions = wind_function
+        self.wind_functions = OrderedDict()
+        self.wind_cube = None
+
+    def read_wind_function(self, idx):
+        wind = self.read_wind_components(idx)
+        if not (wind['u'].shape == wind['v'].shape): raise ValueError('Shape of u and v not matching!')
+        return wind
+
+    ##
+    # returns the interpolators of the wind components in (time, lat, lon) for the forecast steps 'first' to 'last', the
+    # time is measured in seconds since time_start
+    def get_wind_cube(self, first, last):
+        if (self.wind_cube is not None) and (self.wind_cube['steps'] == (first, last)):
+            return self.wind_cube
+
+        wind_slices = [self.get_cached_time_slice(self.wind_functions, idx, self.read_wind_function)
+                       for idx in range(first, last + 1)]
+        times = np.arange(first, last + 1) * self.time_res.total_seconds()
+        if len(wind_slices) == 1:
+            # a single forecast step is valid for the whole time step
+            wind_slices = wind_slices * 2
+            times = np.array([times[0], times[0] + self.time_res.total_seconds()])
+
+        self.wind_cube = {'steps': (first, last)}
+        for comp in ['u', 'v']:
+            cube = np.stack([wind_slice[comp] for wind_slice in wind_slices])
+            self.wind_cube[comp] = RegularGridInterpolator((times, wind_slices[0]['lats'], wind_slices[0]['lons']),
+                                                           cube)
+        return self.wind_cube
+
+    ##
+    # returns the time in seconds since time_start that is used by the wind functions. Times up to half a time step
+    # beyond the first and last forecast step are assigned to these steps, like for the rounding of the time.
+    def get_wind_function_time(self, time):
+        time_passed = self.get_time_passed(time)
+        self.check_time_passed(time, time_passed, self.time_res.total_seconds() / 2)
+        return np.clip(time_passed, 0, (self.time_axis.shape[0] - 1) * self.time_res.total_seconds())
 
     def get_wind_function(self, coordinate, time):
         """
         Vectorized TWA and TWS function from forecast.
             Parameters:
-                    winds (dict): available forecast wind functions
                     coordinate (array): array of tuples (lats, lons)
-                    time (datetime): time to forecast
+                    time (datetime or array of datetimes): time to forecast, either one time for all coordinates or
+                        one time per coordinate
             Returns:
                     forecast (dict):
                         twa (array): array of TWA
                         tws (array): array of TWS
         """
-        debug = True
-        time_passed = self.get_time_step_index(time)
-        rounded_time= time_passed['rounded_time']
-        idx = time_passed['idx']
-
+        lats, lons = coordinate
+        lats = np.atleast_1d(lats)
+        lons = np.atleast_1d(lons)
+        time_passed = np.broadcast_to(self.get_wind_function_time(time), lats.shape)
+
+        # forecast steps that enclose the times of all coordinates
+        time_pos = time_passed / self.time_res.total_seconds()
+        first = int(np.floor(np.min(time_pos)))
+        last = int(np.ceil(np.max(time_pos)))
+        wind_cube = self.get_wind_cube(first, last)
+
+        points = np.column_stack((time_passed, lats, lons))
         try:
-            wind_timestamp = self.wind_functions[idx]['timestamp']
+            u = wind_cube['u'](points)
+            v = wind_cube['v'](points)
         except ValueError:
-            print('Requesting weather data for ' + str(time) + ' at index ' + str(idx) + ' but only ' + str(self.time_steps) + ' available')
-
-        if not (rounded_time==self.wind_functions[idx]['timestamp']):
-            ex = 'Accessing wrong weather forecast. Accessing element ' + str(self.wind_functions[idx]['timestamp']) + ' but current rounded time is ' + str(rounded_time)
-            raise Exception(ex)
-
-        wind = self.wind_functions[idx]
-        try:
-            twa = wind['twa'](coordinate)
-            tws = wind['tws'](coordinate)
-        except:
-            raise Exception('Running out of weather map! Asking for time' + str(rounded_time) + ' wind:' + str(wind))
+            raise Exception('Running out of weather map! Asking for lats ' + str(lats) + ', lons ' + str(lons) +
+                            ' between ' + str(self.time_axis[first]) + ' and ' + str(self.time_axis[last]))
 
+        twa, tws = self.get_twatws_from_uv(u, v)
         return {'twa': twa, 'tws': tws}
 
     def get_wind_vector(self, time):
-        time_passed = self.get_time_step_index(time)
-        rounded_time = time_passed['rounded_time']
-        idx = time_passed['idx']
-
-        try:
-            wind_timestamp = self.wind_vectors[idx]['timestamp']
-        except KeyError:
-            print('Requesting weather data for ' + str(time) + ' at index ' + str(idx) + ' but only ' + str(self.time_steps) + ' available')
-            raise
-
-        if not (rounded_time == wind_timestamp):
-            ex = 'Accessing wrong weather forecast. Accessing element ' + str(
-                self.wind_vectors[idx]['timestamp']) + ' but current rounded time is ' + str(rounded_time)
-            raise Exception(ex)
-
-        return self.wind_vectors[idx]
+        return self.get_cached_time_slice(self.wind_vectors, self.get_time_step_index(time)['idx'],
+                                          lambda idx: self.read_wind_vectors(self.time_start + self.time_res * idx))
 
 
 class WeatherCondNCEP(WeatherCond):
-    def __init__(self, filepath, model, time, hours, time_res):
-        WeatherCond.__init__(self, filepath, model, time, hours, time_res)
+    def __init__(self, filepath, model, time, hours, time_res, chunks=None):
+        WeatherCond.__init__(self, filepath, model, time, hours, time_res, chunks)
         print('WARNING: not well maintained. Currently one data file for one particular times is read several times')
 
-    def calculate_wind_function(self):
-        """Vectorized wind functions from NetCDF file."""
-
-        twa, tws = self.get_twatws_from_uv(self.ds.u10, self.ds.v10)
-        tws = tws.to_numpy()
-        twa = twa.to_numpy()
-
-        return {'twa': twa, 'tws': tws}
-
-    def read_wind_functions(self, iTime):
+    def read_wind_components(self, iTime):
+        """Wind components on a global grid from NetCDF file."""
         time = self.time_start + self.time_res*iTime
 
-        wind = self.calculate_wind_function()
-
         lats_grid = np.linspace(-90, 90, 181)
         lons_grid = np.linspace(0, 360, 361)
 
-        f_twa = RegularGridInterpolator(
-            (lats_grid, lons_grid),
-            np.flip(np.hstack((wind['twa'], wind['twa'][:, 0].reshape(181, 1))), axis=0),
-        )
-
-        f_tws = RegularGridInterpolator(
-            (lats_grid, lons_grid),
-            np.flip(np.hstack((wind['tws'], wind['tws'][:, 0].reshape(181, 1))), axis=0),
-        )
+        wind = {'lats': lats_grid, 'lons': lons_grid, 'timestamp': time}
+        for comp, var in [('u', 'u10'), ('v', 'v10')]:
+            values = self.ds[var].to_numpy()
+            wind[comp] = np.flip(np.hstack((values, values[:, 0].reshape(181, 1))), axis=0)
+        return wind
 
-        return {'twa': f_twa, 'tws': f_tws, 'timestamp': time}
+    ##
+    # the wind functions are built on the global grid, the dataset is not restricted to the map
+    def crop_dataset_map(self):
+        pass
 
     def read_wind_vectors(self, time):
         """Return u-v components for given rect for visualization."""
-        lat1 = self.map_size.x1
-        lat2 = self.map_size.x2
-        lon1 = self.map_size.y1
-        lon2 = self.map_size.y2
-
-        u = self.ds['u10'].where(
-            (self.ds.latitude >= lat1) & (self.ds.latitude <= lat2) & (self.ds.longitude >= lon1) & (
-                    self.ds.longitude <= lon2), drop=True)
-        v = self.ds['v10'].where(
-            (self.ds.latitude >= lat1) & (self.ds.latitude <= lat2) & (self.ds.longitude >= lon1) & (
-                    self.ds.longitude <= lon2), drop=True)
-        lats_u_1D = self.ds['latitude'].where((self.ds.latitude >= lat1) & (self.ds.latitude <= lat2), drop=True)
-        lons_u_1D = self.ds['longitude'].where((self.ds.longitude >= lon1) & (self.ds.longitude <= lon2), drop=True)
+        map_selection = self.get_map_selection(self.ds)
+
+        u = self.ds['u10'].sel(map_selection)
+        v = self.ds['v10'].sel(map_selection)
 
+        lats_u_1D = u['latitude'].to_numpy()
+        lons_u_1D = u['longitude'].to_numpy()
         u = u.to_numpy()
         v = v.to_numpy()
-        lats_u_1D = lats_u_1D.to_numpy()
-        lons_u_1D = lons_u_1D.to_numpy()
         lats_u = np.tile(lats_u_1D[:, np.newaxis], u.shape[1])
         lons_u = np.tile(lons_u_1D, (u.shape[0], 1))
 
         return {'u': u,'v': v, 'lats_u': lats_u, 'lons_u': lons_u, 'timestamp': time}
 
 class WeatherCondCMEMS(WeatherCond):
-    def calculate_wind_function(self, time):
+    def read_wind_components(self, iTime):
+        time = self.time_start + self.time_res*iTime
         time_str=time.strftime('%Y-%m-%d %H:%M:%S')
         #print('Reading time', time_str)
 
@@ -366,62 +436,25 @@ class WeatherCondCMEMS(WeatherCond):
             print('time: ', time.to_numpy())
             raise Exception('Please make sure that time stamps of environmental data match full hours: time = ' + time_str)
 
-        twa, tws = self.get_twatws_from_uv(u,v)
-
-        tws = tws.to_numpy()
-        twa = twa.to_numpy()
-
-        return {'twa': twa, 'tws': tws}
-
-    def read_wind_functions(self, iTime):
-        time = self.time_start + self.time_res*iTime
-        #wind = self.nc_to_wind_function_old_format()
-        wind = self.calculate_wind_function(time)
-
-        if not (wind['twa'].shape==wind['tws'].shape): raise ValueError('Shape of twa and tws not matching!')
-
-        lat_shape = wind['twa'].shape[0]
-        lon_shape = wind['twa'].shape[1]
-        #print('lat_shape', lat_shape)
-        #print('long_shape', lon_shape)
-        lats_grid = np.linspace(self.map_size.x1, self.map_size.x2, lat_shape)
-        lons_grid = np.linspace(self.map_size.y1, self.map_size.y2, lon_shape)
-        #print('lons shape', lons_grid.shape)
-
-        f_twa = RegularGridInterpolator(
-            (lats_grid, lons_grid), wind['twa'],
-        )
+        u = u.to_numpy()
+        v = v.to_numpy()
+        if not (u.shape==v.shape): raise ValueError('Shape of u and v not matching!')
 
-        f_tws = RegularGridInterpolator(
-            (lats_grid, lons_grid), wind['tws'],
-        )
+        lats_grid = self.ds['latitude'].to_numpy()
+        lons_grid = self.ds['longitude'].to_numpy()
 
-        return {'twa': f_twa, 'tws': f_tws, 'timestamp': time}
+        return {'u': u, 'v': v, 'lats': lats_grid, 'lons': lons_grid, 'timestamp': time}
 
     def read_wind_vectors(self, time):
         """Return u-v components for given rect for visualization."""
-
-        lat1 = self.map_size.x1
-        lat2 = self.map_size.x2
-        lon1 = self.map_size.y1
-        lon2 = self.map_size.y2
         time_str = time.strftime('%Y-%m-%d %H:%M:%S')
 
-        ds_time=self.ds.sel(time = time_str)
+        ds_time = self.ds.sel(time=time_str, height_above_ground2=10).sel(self.get_map_selection(self.ds))
 
-        u = ds_time['u-component_of_wind_height_above_ground'].where(
-            (ds_time.latitude >= lat1) & (ds_time.latitude <= lat2) & (ds_time.longitude >= lon1) & (
-                    ds_time.longitude <= lon2) & (ds_time.height_above_ground2 == 10), drop=True)
-        v = ds_time['v-component_of_wind_height_above_ground'].where(
-            (ds_time.latitude >= lat1) & (ds_time.latitude <= lat2) & (ds_time.longitude >= lon1) & (
-                    ds_time.longitude <= lon2) & (ds_time.height_above_ground2 == 10), drop=True)
-        lats_u_1D = ds_time['latitude'].where((ds_time.latitude >= lat1) & (ds_time.latitude <= lat2), drop=True)
-        lons_u_1D = ds_time['longitude'].where((ds_time.longitude >= lon1) & (ds_time.longitude <= lon2), drop=True)
-
-        u = u.to_numpy()
-        v = v.to_numpy()
-        lats_u_1D = lats_u_1D.to_numpy()
-        lons_u_1D = lons_u_1D.to_numpy()
+        u = ds_time['u-component_of_wind_height_above_ground'].to_numpy()
+        v = ds_time['v-component_of_wind_height_above_ground'].to_numpy()
+        lats_u_1D = ds_time['latitude'].to_numpy()
+        lons_u_1D = ds_time['longitude'].to_numpy()
         lats_u = np.tile(lats_u_1D[:, np.newaxis], u.shape[1])
         lons_u = np.tile(lons_u_1D, (u.shape[0], 1))
 